@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Limits accepted in the 'budget' and 'endpoint_budget' configuration objects
+BUDGET_LIMITS = ("max_requests", "max_bytes", "max_items", "max_seconds")
+
+# endpoint_runs.status values
+RUN_COMPLETE = "complete"
+RUN_BUDGET_EXHAUSTED = "budget_exhausted"
+RUN_SKIPPED = "skipped"
+RUN_FAILED = "failed"
+
+_shared_limiters: Dict[float, "BandwidthLimiter"] = {}
+_shared_lock = threading.Lock()
+
+
+def validate_limits(limits: Optional[Dict[str, Any]], name: str = "budget"):
+    """Raises ValueError for unknown or negative budget limits."""
+    for key, value in (limits or {}).items():
+        if key not in BUDGET_LIMITS:
+            raise ValueError(f"Configuration Error: unknown {name} limit '{key}'. Choose from: {', '.join(BUDGET_LIMITS)}")
+        if value is not None and (not isinstance(value, (int, float)) or value < 0):
+            raise ValueError(f"Configuration Error: {name} limit '{key}' must be a non-negative number.")
+
+
+class CrawlBudget:
+    """
+    Usage counters checked against optional limits (requests, bytes on the wire, items,
+    wall-clock seconds). An endpoint budget has the target budget as parent: usage is
+    counted in both, and either running out stops the endpoint. Safe to share between threads.
+    """
+    def __init__(self, max_requests: Optional[int] = None, max_bytes: Optional[int] = None, max_items: Optional[int] = None,
+                 max_seconds: Optional[float] = None, name: str = "target", parent: Optional["CrawlBudget"] = None):
+        self.limits = {"max_requests": max_requests, "max_bytes": max_bytes, "max_items": max_items, "max_seconds": max_seconds}
+        self.name = name
+        self.parent = parent
+        self.requests = 0
+        self.bytes = 0
+        self.items = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_limits(cls, limits: Optional[Dict[str, Any]], name: str = "target", parent: Optional["CrawlBudget"] = None) -> Optional["CrawlBudget"]:
+        """Builds a budget from a limits dict; returns the parent (or None) when no limit is set."""
+        limits = {k: v for k, v in (limits or {}).items() if v is not None}
+        if not limits:
+            return parent
+        return cls(name=name, parent=parent, **limits)
+
+    def record(self, requests: int = 0, bytes_received: int = 0, items: int = 0):
+        with self._lock:
+            self.requests += requests
+            self.bytes += bytes_received
+            self.items += items
+        if self.parent is not None:
+            self.parent.record(requests, bytes_received, items)
+
+    def exhausted(self) -> Optional[str]:
+        """Returns which limit has been reached (e.g. 'target max_requests 1000'), or None."""
+        limits = self.limits
+        usage = {
+            "max_requests": self.requests,
+            "max_bytes": self.bytes,
+            "max_items": self.items,
+            "max_seconds": time.monotonic() - self.started,
+        }
+        for key in BUDGET_LIMITS:
+            if limits[key] is not None and usage[key] >= limits[key]:
+                return f"{self.name} {key} {limits[key]}"
+        return self.parent.exhausted() if self.parent is not None else None
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "items": self.items,
+            "seconds": round(time.monotonic() - self.started, 3),
+        }
+
+
+class BandwidthLimiter:
+    """
+    Token bucket capping the average transfer rate of every crawler that shares it.
+    Bytes are charged after each response arrives; a caller that overdraws the bucket
+    sleeps until the debt is paid back.
+    """
+    def __init__(self, bytes_per_second: float, burst: Optional[float] = None):
+        if bytes_per_second <= 0:
+            raise ValueError("bytes_per_second must be positive")
+        self.rate = float(bytes_per_second)
+        self.capacity = float(burst) if burst is not None else self.rate
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int) -> float:
+        """Charges amount bytes and sleeps as long as needed. Returns the seconds slept."""
+        if amount <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= amount
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+def shared_bandwidth_limiter(bytes_per_second: Optional[float]) -> Optional[BandwidthLimiter]:
+    """Process-wide limiter for a rate, so all crawlers and worker threads draw from one bucket."""
+    if not bytes_per_second:
+        return None
+    with _shared_lock:
+        limiter = _shared_limiters.get(bytes_per_second)
+        if limiter is None:
+            limiter = _shared_limiters[bytes_per_second] = BandwidthLimiter(bytes_per_second)
+        return limiter
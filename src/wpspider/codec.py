@@ -0,0 +1,120 @@
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Optional accelerated codecs, tried in this order
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the installation
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover - depends on the installation
+    ujson = None
+
+# Payload shapes decoders must return exactly: WordPress items carry unicode titles,
+# HTML with escaped slashes and quotes, floats, nulls and nested _links
+VALIDATION_SAMPLES: List[Any] = [
+    {
+        "id": 123,
+        "date_gmt": "2024-01-05T10:00:00",
+        "guid": {"rendered": "https://example.com/?p=123"},
+        "title": {"rendered": "Café – “Quotes” & <b>tags</b> \U0001F600"},
+        "content": {"rendered": "<p class=\"x\">Line\nbreak\ttab \\ back</p> ", "protected": False},
+        "categories": [1, 2, 3],
+        "meta": {"rating": 4.5, "views": 1e21, "ratio": 0.1, "empty": [], "none": None},
+        "_links": {"self": [{"href": "https://example.com/wp-json/wp/v2/posts/123"}]},
+    },
+    {"per_page": 100, "page": 1, "_embed": "author,wp:term"},
+    {"User-Agent": "WPSpider/1.0", "Accept-Encoding": "gzip, deflate"},
+]
+
+
+# Fast decoders raise on integers beyond 64 bits or silently turn them into floats, which
+# are then at least 2**63 in magnitude. Results holding such a float are decoded again by
+# json.loads; walking the result costs a fraction of scanning the payload text.
+_LOSSY_FLOAT = 2.0 ** 63
+
+
+def _stdlib_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+def _decoder_candidates() -> List[Tuple[str, Callable[[Union[bytes, str]], Any]]]:
+    candidates: List[Tuple[str, Callable[[Union[bytes, str]], Any]]] = []
+    if orjson is not None:
+        candidates.append(("orjson", orjson.loads))
+    if ujson is not None:
+        candidates.append(("ujson", ujson.loads))
+    candidates.append(("json", _stdlib_loads))
+    return candidates
+
+
+def decoder_problem(decode: Callable[[Union[bytes, str]], Any]) -> Optional[str]:
+    """Why a decoder cannot replace json.loads, or None if it can."""
+    try:
+        # Compared re-encoded, so an int decoded as an equal float is caught too
+        for sample in VALIDATION_SAMPLES:
+            if json.dumps(decode(json.dumps(sample).encode("utf-8"))) != json.dumps(sample):
+                return "decoded objects differ"
+    except Exception as e:
+        return f"failed on samples: {e}"
+    return None
+
+
+def _select_decoder() -> Tuple[str, Callable[[Union[bytes, str]], Any]]:
+    """First decoder that returns the same objects as json.loads."""
+    for name, decode in _decoder_candidates():
+        problem = decoder_problem(decode)
+        if problem is None:
+            return name, decode
+        logger.debug(f"JSON decoder {name} rejected: {problem}")
+    return "json", _stdlib_loads
+
+
+DECODER_NAME, _decode = _select_decoder()
+
+
+def _may_have_lost_integers(obj: Any) -> bool:
+    """True if a decoded value holds a float a big integer may have turned into."""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        kind = type(value)
+        if kind is dict:
+            stack.extend(value.values())
+        elif kind is list:
+            stack.extend(value)
+        elif kind is float and (value >= _LOSSY_FLOAT or value <= -_LOSSY_FLOAT):
+            return True
+    return False
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decodes JSON with the fastest validated decoder. Results that may have lost integers
+    beyond 64 bits, and input the fast decoder refuses (a BOM, NaN), are decoded with
+    json.loads, which also provides the error raised for invalid JSON (a ValueError).
+    """
+    if _decode is not _stdlib_loads:
+        try:
+            result = _decode(data)
+        except Exception:
+            pass
+        else:
+            if not _may_have_lost_integers(result):
+                return result
+    return json.loads(data)
+
+
+# Fast encoders cannot reproduce json.dumps' ", " / ": " separators, and stored data
+# must not depend on which packages are installed
+dumps = json.dumps
+
+
+def codec_info() -> Dict[str, Optional[str]]:
+    """Name of the selected decoder."""
+    return {"decoder": DECODER_NAME}
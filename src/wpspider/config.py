@@ -2,9 +2,11 @@ import json
 import os
 import argparse
 import re
-from typing import List, Optional
+from typing import List, Dict, Any, Optional
 from urllib.parse import urlparse
 
+from wpspider.budget import BUDGET_LIMITS, validate_limits
+
 DEFAULT_ENDPOINTS = [
     "categories",
     "comments",
@@ -16,14 +18,38 @@ DEFAULT_ENDPOINTS = [
 ]
 
 class Config:
-    def __init__(self, config_path: str = "config.json", args: Optional[argparse.Namespace] = None):
+    def __init__(self, config_path: str = "config.json", args: Optional[argparse.Namespace] = None, require_target: bool = True):
         self.config_path = config_path
+        self.require_target = require_target
         self.target: Optional[str] = None
+        self.targets: List[str] = []
         self.endpoints: List[str] = DEFAULT_ENDPOINTS
         self.db_name: Optional[str] = None
         self.output_directory: Optional[str] = None
         self.user_agent: str = "WPSpider/1.0 (Nebula Crawler; +https://wpspider.local)"
         self.log_file: str = "wpspider.log"
+        self.log_format: str = "text"
+        self.log_level: str = "INFO"
+        self.shard_output: bool = False
+        self.workers: int = 1
+        self.pool_connections: int = 10
+        self.pool_maxsize: int = 10
+        self.connect_timeout: float = 10.0
+        self.read_timeout: float = 10.0
+        self.dns_cache_ttl: float = 300.0
+        self.prewarm_connections: int = 0
+        self.download_media: bool = False
+        self.media_directory: Optional[str] = None
+        self.media_workers: int = 4
+        self.media_per_host: int = 2
+        self.media_sizes: Optional[List[str]] = None
+        self.embed: bool = False
+        self.date_partitions: int = 0
+        self.partition_workers: int = 4
+        self.budget: Dict[str, Any] = {}
+        self.endpoint_budget: Dict[str, Any] = {}
+        self.max_bytes_per_second: Optional[float] = None
+        self.max_rss_mb: Optional[float] = None
         
         # Load from file
         self._load_from_file()
@@ -45,11 +71,34 @@ class Config:
                 data = json.load(f)
                 
             self.target = data.get("target", self.target)
+            self.targets = data.get("targets", self.targets)
             self.endpoints = data.get("endpoints", self.endpoints)
             self.db_name = data.get("db_name", data.get("output", self.db_name))
             self.output_directory = data.get("output_directory", data.get("directory", self.output_directory))
             self.user_agent = data.get("user_agent", self.user_agent)
             self.log_file = data.get("log_file", self.log_file)
+            self.log_format = data.get("log_format", self.log_format)
+            self.log_level = data.get("log_level", self.log_level)
+            self.shard_output = bool(data.get("shard_output", self.shard_output))
+            self.workers = int(data.get("workers", self.workers))
+            self.pool_connections = int(data.get("pool_connections", self.pool_connections))
+            self.pool_maxsize = int(data.get("pool_maxsize", self.pool_maxsize))
+            self.connect_timeout = float(data.get("connect_timeout", self.connect_timeout))
+            self.read_timeout = float(data.get("read_timeout", self.read_timeout))
+            self.dns_cache_ttl = float(data.get("dns_cache_ttl", self.dns_cache_ttl))
+            self.prewarm_connections = int(data.get("prewarm_connections", self.prewarm_connections))
+            self.download_media = bool(data.get("download_media", self.download_media))
+            self.media_directory = data.get("media_directory", self.media_directory)
+            self.media_workers = int(data.get("media_workers", self.media_workers))
+            self.media_per_host = int(data.get("media_per_host", self.media_per_host))
+            self.media_sizes = data.get("media_sizes", self.media_sizes)
+            self.embed = bool(data.get("embed", self.embed))
+            self.date_partitions = int(data.get("date_partitions", self.date_partitions))
+            self.partition_workers = int(data.get("partition_workers", self.partition_workers))
+            self.budget = dict(data.get("budget") or self.budget)
+            self.endpoint_budget = dict(data.get("endpoint_budget") or self.endpoint_budget)
+            self.max_bytes_per_second = data.get("max_bytes_per_second", self.max_bytes_per_second)
+            self.max_rss_mb = data.get("max_rss_mb", self.max_rss_mb)
             
         except json.JSONDecodeError:
             print(f"Warning: Could not decode {self.config_path}. Using defaults.")
@@ -59,6 +108,9 @@ class Config:
     def _apply_args(self, args: argparse.Namespace):
         if hasattr(args, 'target') and args.target:
             self.target = args.target
+
+        if hasattr(args, 'targets') and args.targets:
+            self.targets = args.targets
         
         if hasattr(args, 'output') and args.output:
             self.db_name = args.output
@@ -68,18 +120,103 @@ class Config:
 
         if hasattr(args, 'user_agent') and args.user_agent:
             self.user_agent = args.user_agent
+
+        if hasattr(args, 'log_format') and args.log_format:
+            self.log_format = args.log_format
+
+        if hasattr(args, 'log_level') and args.log_level:
+            self.log_level = args.log_level
+
+        if hasattr(args, 'shard_output') and args.shard_output:
+            self.shard_output = True
+
+        if hasattr(args, 'workers') and args.workers:
+            self.workers = args.workers
+
+        if hasattr(args, 'connect_timeout') and args.connect_timeout:
+            self.connect_timeout = args.connect_timeout
+
+        if hasattr(args, 'read_timeout') and args.read_timeout:
+            self.read_timeout = args.read_timeout
+
+        # 0 is meaningful here (disables the cache)
+        if hasattr(args, 'dns_ttl') and args.dns_ttl is not None:
+            self.dns_cache_ttl = args.dns_ttl
+
+        if hasattr(args, 'prewarm') and args.prewarm:
+            self.prewarm_connections = args.prewarm
+
+        if hasattr(args, 'download_media') and args.download_media:
+            self.download_media = True
+
+        if hasattr(args, 'media_directory') and args.media_directory:
+            self.media_directory = args.media_directory
+
+        if hasattr(args, 'media_workers') and args.media_workers:
+            self.media_workers = args.media_workers
+
+        if hasattr(args, 'media_per_host') and args.media_per_host:
+            self.media_per_host = args.media_per_host
+
+        if hasattr(args, 'embed') and args.embed:
+            self.embed = True
+
+        if hasattr(args, 'partitions') and args.partitions:
+            self.date_partitions = args.partitions
+
+        if hasattr(args, 'partition_workers') and args.partition_workers:
+            self.partition_workers = args.partition_workers
+
+        for limit in BUDGET_LIMITS:
+            if hasattr(args, limit) and getattr(args, limit):
+                self.budget[limit] = getattr(args, limit)
+
+        if hasattr(args, 'max_bytes_per_second') and args.max_bytes_per_second:
+            self.max_bytes_per_second = args.max_bytes_per_second
+
+        if hasattr(args, 'max_rss') and args.max_rss:
+            self.max_rss_mb = args.max_rss
+
+        if hasattr(args, 'media_sizes') and args.media_sizes:
+            self.media_sizes = [size.strip() for size in args.media_sizes.split(",") if size.strip()]
             
         # Add more arg overrides as needed
 
     def validate(self):
+        validate_limits(self.budget, "budget")
+        validate_limits(self.endpoint_budget, "endpoint_budget")
+        if self.max_bytes_per_second is not None and self.max_bytes_per_second <= 0:
+            raise ValueError("Configuration Error: 'max_bytes_per_second' must be positive.")
+        if self.max_rss_mb is not None and (not isinstance(self.max_rss_mb, (int, float)) or self.max_rss_mb <= 0):
+            raise ValueError("Configuration Error: 'max_rss_mb' must be a positive number.")
+
         if not self.target:
-            raise ValueError("Configuration Error: 'target' URL is required. Please provide it via the --target command-line argument.")
+            if self.require_target:
+                raise ValueError("Configuration Error: 'target' URL is required. Please provide it via the --target command-line argument.")
+            if not self.db_name and not self.targets:
+                raise ValueError("Configuration Error: An output database is required. Please provide it via the --output command-line argument.")
+            return
 
         self.target = self._normalize_target(self.target)
         
         if not self.endpoints:
             raise ValueError("Configuration Error: No endpoints specified.")
 
+        if self.workers < 1:
+            raise ValueError("Configuration Error: 'workers' must be at least 1.")
+
+        if self.pool_connections < 1 or self.pool_maxsize < 1:
+            raise ValueError("Configuration Error: 'pool_connections' and 'pool_maxsize' must be at least 1.")
+
+        if self.date_partitions < 0 or self.partition_workers < 1:
+            raise ValueError("Configuration Error: 'date_partitions' must not be negative and 'partition_workers' must be at least 1.")
+
+        if self.dns_cache_ttl < 0 or self.prewarm_connections < 0:
+            raise ValueError("Configuration Error: 'dns_cache_ttl' and 'prewarm_connections' must not be negative.")
+
+        if self.media_workers < 1 or self.media_per_host < 1:
+            raise ValueError("Configuration Error: 'media_workers' and 'media_per_host' must be at least 1.")
+
         # Resolve output path
         if self.db_name and self.output_directory:
             # Mutually exclusive: output file wins
@@ -122,5 +259,29 @@ class Config:
         base_dir = output_directory if output_directory is not None else os.getcwd()
         return os.path.join(base_dir, filename)
 
+    @property
+    def max_rss(self) -> Optional[int]:
+        """The max_rss_mb ceiling in bytes, or None when memory-bounded mode is off."""
+        return int(self.max_rss_mb * 2**20) if self.max_rss_mb else None
+
+    def crawler_options(self) -> Dict[str, Any]:
+        """Keyword arguments for WPCrawler derived from this configuration."""
+        return {
+            "user_agent": self.user_agent,
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "dns_cache_ttl": self.dns_cache_ttl,
+            "embed": self.embed,
+            "full_endpoints": self.endpoints,
+            "date_partitions": self.date_partitions,
+            "partition_workers": self.partition_workers,
+            "budget_limits": self.budget,
+            "endpoint_limits": self.endpoint_budget,
+            "max_bytes_per_second": self.max_bytes_per_second,
+            "max_rss": self.max_rss,
+        }
+
     def __repr__(self):
         return f"<Config target={self.target} db={self.db_name} endpoints={len(self.endpoints)}>"
@@ -1,12 +1,109 @@
+import heapq
 import logging
+import queue
+import threading
 import time
 import requests
-from datetime import datetime
-from typing import List, Dict, Any, Generator, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.util.request import ACCEPT_ENCODING
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Generator, Optional, Set, Tuple
 from urllib.parse import urljoin, urlparse
 
+from wpspider.codec import loads
+from wpspider.memory import DECODE_OVERHEAD, MemorySlot, SpillQueue, SPILL_RATIO, shared_memory_watchdog
+from wpspider.transport import DEFAULT_DNS_TTL, prewarm, shared_adapter
+from wpspider.budget import CrawlBudget, shared_bandwidth_limiter, RUN_COMPLETE, RUN_BUDGET_EXHAUSTED, RUN_SKIPPED, RUN_FAILED
+
 logger = logging.getLogger(__name__)
 
+# Link relations requested with _embed and the endpoint table their objects belong to
+EMBED_RELATIONS = {
+    "author": "users",
+    "wp:featuredmedia": "media",
+    "wp:term": None,  # Resolved per object from its taxonomy
+    "replies": "comments",
+}
+
+# Endpoints requested with _embed; their items carry the relations above
+EMBED_ENDPOINTS = ("posts", "pages")
+
+TAXONOMY_ENDPOINTS = {
+    "category": "categories",
+    "post_tag": "tags",
+}
+
+TYPE_ENDPOINTS = {
+    "post": "posts",
+    "page": "pages",
+    "attachment": "media",
+}
+
+# Date partitions are not split below one full page of items
+MIN_PARTITION_ITEMS = 100
+
+# Format of the after/before query parameters
+PARTITION_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# Status of an endpoint crawled in partitions: the most severe partition status wins
+RUN_STATUS_SEVERITY = [RUN_COMPLETE, RUN_SKIPPED, RUN_BUDGET_EXHAUSTED, RUN_FAILED]
+
+def unpack_embedded(items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Removes '_embedded' from each item and returns the embedded objects grouped by endpoint.
+    Error objects (e.g. embeds the client may not view) are dropped.
+    """
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        embedded = item.pop('_embedded', None)
+        if not isinstance(embedded, dict):
+            continue
+
+        for relation, objects in embedded.items():
+            if relation not in EMBED_RELATIONS or not isinstance(objects, list):
+                continue
+
+            # wp:term and replies nest one list per taxonomy / thread
+            flat: List[Any] = []
+            for obj in objects:
+                flat.extend(obj if isinstance(obj, list) else [obj])
+
+            for obj in flat:
+                if not isinstance(obj, dict) or not isinstance(obj.get('id'), int):
+                    continue
+                endpoint = EMBED_RELATIONS[relation]
+                if relation == "wp:term":
+                    taxonomy = obj.get('taxonomy')
+                    endpoint = TAXONOMY_ENDPOINTS.get(taxonomy, taxonomy) if isinstance(taxonomy, str) else None
+                if endpoint:
+                    grouped.setdefault(endpoint, []).append(obj)
+    return grouped
+
+def merge_endpoint_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combines the endpoint_runs entries of an endpoint's partitions into one entry."""
+    worst = max(runs, key=lambda run: RUN_STATUS_SEVERITY.index(run["status"]))
+    return {
+        "status": worst["status"],
+        "reason": worst["reason"],
+        "requests": sum(run["requests"] for run in runs),
+        "items": sum(run["items"] for run in runs),
+        "bytes_received": sum(run["bytes_received"] for run in runs),
+        "started_at": min(run["started_at"] for run in runs),
+        "completed_at": max((run["completed_at"] for run in runs if run["completed_at"]), default=None),
+    }
+
+def date_range_params(after: Optional[datetime], before: Optional[datetime]) -> Dict[str, Any]:
+    """
+    Query parameters selecting items with after <= date_gmt < before (None leaves that side open).
+    WordPress compares both bounds exclusively at one-second resolution, so 'after' is moved back a second.
+    """
+    params: Dict[str, Any] = {'dates_are_gmt': 'true'}
+    if after is not None:
+        params['after'] = (after - timedelta(seconds=1)).strftime(PARTITION_DATE_FORMAT)
+    if before is not None:
+        params['before'] = before.strftime(PARTITION_DATE_FORMAT)
+    return params
+
 class UrlBuilder:
     """Helper to construct WordPress API URLs."""
     
@@ -42,21 +139,104 @@ class UrlBuilder:
             base_url += '/'
         return urljoin(base_url, endpoint)
 
+def supported_encodings() -> str:
+    """
+    Content encodings this process can decode, for the Accept-Encoding header.
+    urllib3 adds br and zstd when brotli/zstandard are installed.
+    """
+    return ACCEPT_ENCODING
+
+class SeenObjects:
+    """Thread-safe set of (endpoint, id) pairs stored during one crawl, shared by the crawlers of a sharded crawl."""
+    def __init__(self):
+        self._keys: Set[Tuple[str, int]] = set()
+        self._lock = threading.Lock()
+
+    def add(self, key: Tuple[str, int]) -> bool:
+        """Records key; returns False if it was already seen."""
+        with self._lock:
+            if key in self._keys:
+                return False
+            self._keys.add(key)
+            return True
+
 class WPCrawler:
     """
     Handles the crawling logic for WordPress endpoints using pagination.
     """
-    def __init__(self, target_url: str, user_agent: Optional[str] = None):
+    def __init__(self, target_url: str, user_agent: Optional[str] = None, pool_connections: int = 10, pool_maxsize: int = 10,
+                 connect_timeout: float = 10.0, read_timeout: float = 10.0, dns_cache_ttl: float = DEFAULT_DNS_TTL, embed: bool = False,
+                 budget_limits: Optional[Dict[str, Any]] = None, endpoint_limits: Optional[Dict[str, Any]] = None,
+                 max_bytes_per_second: Optional[float] = None, budget: Optional[CrawlBudget] = None,
+                 date_partitions: int = 0, partition_workers: int = 4, max_rss: Optional[int] = None,
+                 full_endpoints: Optional[List[str]] = None, seen_objects: Optional[SeenObjects] = None):
         self.base_url = UrlBuilder.normalize_base_url(target_url)
+        self.timeout = (connect_timeout, read_timeout)
+        # With embed, related objects arrive inline and are stored via extract_embedded()
+        self.embed = embed
+        # Endpoints crawled in full: their embedded copies lack most fields and are never stored
+        self.full_endpoints: Set[str] = set(full_endpoints or [])
+        # With date_partitions > 1, crawl_partitioned() splits endpoints into date ranges
+        self.date_partitions = date_partitions
+        self.partition_workers = partition_workers
+        # Embedded objects already stored (pass a shared one when several crawlers write the same crawl)
+        self.seen_objects = seen_objects if seen_objects is not None else SeenObjects()
+
+        # Target budget (pass a shared one when several crawlers work on the same target),
+        # limits applied to each endpoint, and the process-wide bandwidth cap
+        self.budget = budget or CrawlBudget.from_limits(budget_limits, name="target")
+        self.endpoint_limits = endpoint_limits
+        self.bandwidth = shared_bandwidth_limiter(max_bytes_per_second)
+        # Memory-bounded mode: page fetches of all crawlers in the process share one RSS ceiling (bytes)
+        self.memory = shared_memory_watchdog(max_rss)
+        # Outcome of the latest crawl_endpoint() run per endpoint, for the endpoint_runs table
+        self.endpoint_runs: Dict[str, Dict[str, Any]] = {}
         self.session = requests.Session()
+
+        # Keep-alive pools sized for concurrent use and shared with every other crawler in
+        # the process, so later endpoints, shards and recrawls skip the TCP/TLS handshakes;
+        # host lookups are cached by the adapter's pools only
+        adapter = shared_adapter(pool_connections, pool_maxsize, dns_cache_ttl)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
         self.session.headers.update({
-            'User-Agent': user_agent or 'WPSpider/1.0 (Nebula Crawler; +https://wpspider.local)'
+            'User-Agent': user_agent or 'WPSpider/1.0 (Nebula Crawler; +https://wpspider.local)',
+            'Accept-Encoding': supported_encodings()
         })
+
+    def prewarm(self, connections: int) -> int:
+        """Opens connections to the target ahead of the first requests. Returns the number opened."""
+        try:
+            return prewarm(self.session, self.base_url, connections)
+        except Exception as e:
+            logger.warning(f"Could not pre-warm connections to {self.base_url}: {e}")
+            return 0
+
+    @staticmethod
+    def _transfer_sizes(response: requests.Response) -> Tuple[Optional[int], Optional[int]]:
+        """Returns (bytes on the wire, decoded bytes) for a fully read response."""
+        content = response.content
+        decoded = len(content) if isinstance(content, bytes) else None
+
+        received = None
+        raw = getattr(response, 'raw', None)
+        tell = getattr(raw, 'tell', None)
+        if callable(tell):
+            try:
+                # urllib3 counts bytes read from the socket, before decompression
+                received = tell()
+            except Exception:
+                received = None
+        if not isinstance(received, int) or (received == 0 and decoded):
+            content_length = response.headers.get('Content-Length')
+            received = int(content_length) if content_length and content_length.isdigit() else decoded
+        return received, decoded
     
     def fetch_page(self, url: str, params: Dict[str, Any]) -> requests.Response:
         """Wrapper for requests to handle basic errors/timeouts."""
         try:
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.session.get(url, params=params, timeout=self.timeout)
             response.raise_for_status()
             return response
         except requests.exceptions.HTTPError as e:
@@ -67,123 +247,401 @@ class WPCrawler:
             logger.error(f"Request failed for {url}: {e}")
             raise
 
-    def crawl_endpoint(self, endpoint: str) -> Generator[Tuple[List[Dict[str, Any]], Dict[str, Any]], None, None]:
+    def extract_embedded(self, endpoint: str, items: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Unpacks embedded objects from a batch, skipping objects already seen during this crawl.
+        Objects of endpoints crawled in full (full_endpoints) are dropped, so an embed-context
+        copy never stands in for, or sits next to, the complete object.
+        """
+        fresh: Dict[str, List[Dict[str, Any]]] = {}
+        for embedded_endpoint, objects in unpack_embedded(items).items():
+            if embedded_endpoint == endpoint or embedded_endpoint in self.full_endpoints:
+                continue
+            for obj in objects:
+                if not self.seen_objects.add((embedded_endpoint, obj['id'])):
+                    continue
+                fresh.setdefault(embedded_endpoint, []).append(obj)
+        return fresh
+
+    def probe_total_pages(self, endpoint: str, per_page: int = 100) -> Optional[int]:
+        """
+        Returns the X-WP-TotalPages value for an endpoint, or None if the server does not report it.
+        """
+        url = UrlBuilder.build_endpoint_url(self.base_url, endpoint)
+        try:
+            response = self.fetch_page(url, {'per_page': per_page, 'page': 1})
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Could not probe page count for {endpoint}: {e}")
+            return None
+
+        total_pages = response.headers.get('X-WP-TotalPages')
+        try:
+            return int(total_pages) if total_pages is not None else None
+        except ValueError:
+            return None
+
+    def probe_total(self, endpoint: str, extra_params: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        Returns the X-WP-Total item count for an endpoint and filters (one-item request),
+        or None if the request fails or the server does not report it.
+        """
+        url = UrlBuilder.build_endpoint_url(self.base_url, endpoint)
+        params = {'per_page': 1, '_fields': 'id', **(extra_params or {})}
+        try:
+            response = self.fetch_page(url, params)
+            return int(response.headers['X-WP-Total'])
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            logger.warning(f"Could not probe item count for {endpoint} {extra_params or ''}: {e}")
+            return None
+
+    def probe_date_bounds(self, endpoint: str) -> Optional[Tuple[datetime, datetime, int]]:
+        """
+        Returns (oldest date_gmt, newest date_gmt, X-WP-Total) of an endpoint, or None when it
+        cannot be ordered by date (users, taxonomies) or reports no dates.
+        """
+        url = UrlBuilder.build_endpoint_url(self.base_url, endpoint)
+        dates: List[datetime] = []
+        total = None
+        for order in ("asc", "desc"):
+            params = {'per_page': 1, 'orderby': 'date', 'order': order, '_fields': 'id,date_gmt'}
+            try:
+                response = self.fetch_page(url, params)
+                data = loads(response.content)
+                dates.append(datetime.strptime(data[0]['date_gmt'][:19], PARTITION_DATE_FORMAT))
+                total = int(response.headers['X-WP-Total'])
+            except (requests.exceptions.RequestException, ValueError, KeyError, IndexError, TypeError) as e:
+                logger.info(f"Endpoint {endpoint} cannot be partitioned by date: {e!r}")
+                return None
+        return min(dates), max(dates), total
+
+    def plan_date_partitions(self, endpoint: str, partitions: int) -> List[Dict[str, Any]]:
+        """
+        Splits an endpoint into about `partitions` date_gmt ranges of similar item counts.
+
+        The largest range is halved until every range holds at most total/partitions items
+        (and at least MIN_PARTITION_ITEMS); each split costs one X-WP-Total probe. The first
+        and last ranges are open-ended, so items older than the first probe or published
+        during the crawl are still covered. Returns dicts with after, before (datetime or
+        None) and total; an empty list when the endpoint is too small or has no dates.
+        """
+        bounds = self.probe_date_bounds(endpoint)
+        if bounds is None:
+            return []
+        oldest, newest, total = bounds
+        size = max(MIN_PARTITION_ITEMS, -(-total // max(1, partitions)))
+        if total <= size:
+            return []
+
+        # Heap entries: (-total, start, end, open_start, open_end); end is exclusive
+        ranges = [(-total, oldest, newest + timedelta(seconds=1), True, True)]
+        done = []
+        probes = 0
+        while ranges:
+            count, start, end, open_start, open_end = heapq.heappop(ranges)
+            count = -count
+            middle = start + timedelta(seconds=(end - start).total_seconds() // 2)
+            if count <= size or middle <= start or probes >= partitions * 4:
+                done.append((start, end, count, open_start, open_end))
+                continue
+
+            probes += 1
+            left = self.probe_total(endpoint, date_range_params(None if open_start else start, middle))
+            if left is None:
+                done.append((start, end, count, open_start, open_end))
+                continue
+            heapq.heappush(ranges, (-left, start, middle, open_start, False))
+            heapq.heappush(ranges, (-max(0, count - left), middle, end, False, open_end))
+
+        plan = [
+            {"after": None if open_start else start, "before": None if open_end else end, "total": count}
+            for start, end, count, open_start, open_end in sorted(done, key=lambda r: r[0])
+            # Closed ranges without items are dropped; the open ends catch late arrivals
+            if count or open_start or open_end
+        ]
+        logger.info(f"Endpoint {endpoint}: {total} items in {len(plan)} date partitions ({probes} probes)")
+        return plan
+
+    def crawl_endpoint(self, endpoint: str, start_page: int = 1, end_page: Optional[int] = None,
+                       extra_params: Optional[Dict[str, Any]] = None, run_key: Optional[str] = None,
+                       endpoint_budget: Optional[CrawlBudget] = None) -> Generator[Tuple[List[Dict[str, Any]], Dict[str, Any]], None, None]:
         """
         Yields batches of items from a specific endpoint, handling pagination.
+        Crawls from start_page until the end of the endpoint, or through end_page (inclusive) when given.
+        extra_params (e.g. include, slug) are sent with every page request.
+        run_key and endpoint_budget let several crawls of one endpoint (partitions) keep separate
+        endpoint_runs entries while drawing from one endpoint budget.
         """
         url = UrlBuilder.build_endpoint_url(self.base_url, endpoint)
-        page = 1
+        page = start_page
         per_page = 100
         
         logger.info(f"Starting crawl for endpoint: {endpoint} at {url}")
+        total_received = 0
+        total_decoded = 0
+        budget = endpoint_budget or CrawlBudget.from_limits(self.endpoint_limits, name=f"endpoint {endpoint}", parent=self.budget)
+        run: Dict[str, Any] = {
+            "status": RUN_COMPLETE,
+            "reason": None,
+            "requests": 0,
+            "items": 0,
+            "bytes_received": 0,
+            "started_at": datetime.now().astimezone().isoformat(),
+            "completed_at": None,
+        }
+        self.endpoint_runs[run_key or endpoint] = run
+        # Memory slot of the previous page, released once its batch has been handed on
+        slot: Optional[MemorySlot] = None
         
-        while True:
-            params = {
-                'per_page': per_page,
-                'page': page
-            }
-            
-            started_at = datetime.now().astimezone().isoformat()
-            try:
-                response = self.fetch_page(url, params)
-                completed_at = datetime.now().astimezone().isoformat()
-                request_meta = {
-                    "method": "GET",
-                    "url": response.url,
-                    "params": params,
-                    "request_headers": dict(response.request.headers) if response.request else dict(self.session.headers),
-                    "response_headers": dict(response.headers),
-                    "status_code": response.status_code,
-                    "error": None,
-                    "started_at": started_at,
-                    "completed_at": completed_at,
-                    "remote_host": urlparse(response.url).netloc
+        try:
+            while True:
+                if slot is not None:
+                    self.memory.release(slot)
+                    slot = None
+
+                exhausted = budget.exhausted() if budget else None
+                if exhausted:
+                    logger.warning(f"Endpoint {endpoint}: budget exhausted ({exhausted}) at page {page}. Stopping with partial results.")
+                    run["status"] = RUN_BUDGET_EXHAUSTED
+                    run["reason"] = exhausted
+                    break
+
+                params = {
+                    'per_page': per_page,
+                    'page': page
                 }
+                if self.embed and endpoint in EMBED_ENDPOINTS:
+                    params['_embed'] = ','.join(EMBED_RELATIONS)
+                if extra_params:
+                    params.update(extra_params)
+            
+                if self.memory is not None:
+                    slot = self.memory.acquire()
+
+                started_at = datetime.now().astimezone().isoformat()
+                request_started = time.monotonic()
+                run["requests"] += 1
+                if budget:
+                    budget.record(requests=1)
+                try:
+                    response = self.fetch_page(url, params)
+                    latency = time.monotonic() - request_started
+                    completed_at = datetime.now().astimezone().isoformat()
+                    bytes_received, bytes_decoded = self._transfer_sizes(response)
+                    if slot is not None:
+                        self.memory.track(slot, bytes_decoded or 0)
+                    content_encoding = response.headers.get('Content-Encoding')
+                    total_received += bytes_received or 0
+                    total_decoded += bytes_decoded or 0
+                    run["bytes_received"] += bytes_received or 0
+                    if budget:
+                        budget.record(bytes_received=bytes_received or 0)
+                    if self.bandwidth:
+                        self.bandwidth.consume(bytes_received or 0)
+                    request_meta = {
+                        "method": "GET",
+                        "url": response.url,
+                        "params": params,
+                        "request_headers": dict(response.request.headers) if response.request else dict(self.session.headers),
+                        "response_headers": dict(response.headers),
+                        "status_code": response.status_code,
+                        "error": None,
+                        "started_at": started_at,
+                        "completed_at": completed_at,
+                        "remote_host": urlparse(response.url).netloc,
+                        "content_encoding": content_encoding,
+                        "bytes_received": bytes_received,
+                        "bytes_decoded": bytes_decoded
+                    }
                 
-                # Check if response provides JSON content type roughly
-                content_type = response.headers.get('Content-Type', '')
-                if 'json' not in content_type:
-                    logger.warning(f"Endpoint {endpoint} returned non-JSON content type: {content_type}")
-                    # Try parsing anyway, some servers are misconfigured
+                    # Check if response provides JSON content type roughly
+                    content_type = response.headers.get('Content-Type', '')
+                    if 'json' not in content_type:
+                        logger.warning(f"Endpoint {endpoint} returned non-JSON content type: {content_type}")
+                        # Try parsing anyway, some servers are misconfigured
                 
-                try:
-                    data = response.json()
-                except ValueError:
-                    logger.error(f"Endpoint {endpoint} returned invalid JSON.")
-                    yield [], request_meta
-                    break
+                    try:
+                        data = loads(response.content)
+                    except ValueError:
+                        logger.error(f"Endpoint {endpoint} returned invalid JSON.")
+                        run["status"], run["reason"] = RUN_FAILED, "invalid JSON"
+                        yield [], request_meta
+                        break
                 
-                # Check termination conditions
-                if not data:
-                    logger.info(f"Endpoint {endpoint}: Empty response at page {page}. Finished.")
-                    yield [], request_meta
-                    break
+                    # Check termination conditions
+                    if not data:
+                        logger.info(f"Endpoint {endpoint}: Empty response at page {page}. Finished.")
+                        yield [], request_meta
+                        break
                 
-                if isinstance(data, dict) and ('code' in data or 'message' in data):
-                    # Some inputs might return an error object instead of list
-                    # e.g. {'code': 'rest_post_invalid_page_number', 'message': '...'}
-                    logger.info(f"Endpoint {endpoint}: Received API message at page {page}: {data.get('code', 'unknown')}. Finished.")
-                    yield [], request_meta
-                    break
+                    if isinstance(data, dict) and ('code' in data or 'message' in data):
+                        # Some inputs might return an error object instead of list
+                        # e.g. {'code': 'rest_post_invalid_page_number', 'message': '...'}
+                        logger.info(f"Endpoint {endpoint}: Received API message at page {page}: {data.get('code', 'unknown')}. Finished.")
+                        yield [], request_meta
+                        break
                 
-                if not isinstance(data, list):
-                    logger.error(f"Endpoint {endpoint} returned unexpected format (not list): {type(data)}")
-                    yield [], request_meta
-                    break
+                    if not isinstance(data, list):
+                        logger.error(f"Endpoint {endpoint} returned unexpected format (not list): {type(data)}")
+                        run["status"], run["reason"] = RUN_FAILED, "unexpected response format"
+                        yield [], request_meta
+                        break
 
-                yield data, request_meta
+                    logger.debug(
+                        f"Endpoint {endpoint} page {page}: {len(data)} items in {latency:.3f}s, "
+                        f"{bytes_received} bytes transferred ({content_encoding or 'identity'}), {bytes_decoded} bytes decoded",
+                        extra={"endpoint": endpoint, "page": page, "items": len(data), "latency": round(latency, 3), "bytes": bytes_received}
+                    )
+                    run["items"] += len(data)
+                    if budget:
+                        budget.record(items=len(data))
+                    yield data, request_meta
                 
-                # Check headers for total pages to anticipate end
-                total_pages = response.headers.get('X-WP-TotalPages')
-                if total_pages and page >= int(total_pages):
-                    logger.info(f"Endpoint {endpoint}: Reached X-WP-TotalPages ({total_pages}). Finished.")
-                    break
+                    # Check headers for total pages to anticipate end
+                    total_pages = response.headers.get('X-WP-TotalPages')
+                    if total_pages and page >= int(total_pages):
+                        logger.info(f"Endpoint {endpoint}: Reached X-WP-TotalPages ({total_pages}). Finished.")
+                        break
+
+                    if end_page is not None and page >= end_page:
+                        logger.info(f"Endpoint {endpoint}: Reached end of page range ({end_page}). Finished.")
+                        break
                 
-                page += 1
+                    page += 1
                 
-                # Simple rate limiting
-                time.sleep(0.2)
+                    # Simple rate limiting
+                    time.sleep(0.2)
                 
-            except requests.exceptions.HTTPError as e:
-                status = e.response.status_code if e.response is not None else None
-                error_meta = {
-                    "method": "GET",
-                    "url": url,
-                    "params": params,
-                    "request_headers": dict(e.response.request.headers) if e.response is not None and e.response.request else dict(self.session.headers),
-                    "response_headers": dict(e.response.headers) if e.response is not None else {},
-                    "status_code": status,
-                    "error": str(e),
-                    "started_at": started_at,
-                    "completed_at": datetime.now().astimezone().isoformat(),
-                    "remote_host": urlparse(url).netloc
-                }
-                yield [], error_meta
-                if e.response.status_code == 400:
-                    logger.info(f"Endpoint {endpoint}: Received 400 Bad Request at page {page}. Assuming end of pagination.")
-                    break
-                elif e.response.status_code in [401, 403]:
-                    logger.warning(f"Endpoint {endpoint}: Access denied ({e.response.status_code}). Skipping.")
-                    break
-                elif e.response.status_code == 404:
-                    logger.warning(f"Endpoint {endpoint}: Not found. Skipping.")
-                    break
-                else:
-                    logger.error(f"Stopping {endpoint} due to HTTP error: {e}")
+                except requests.exceptions.HTTPError as e:
+                    status = e.response.status_code if e.response is not None else None
+                    error_meta = {
+                        "method": "GET",
+                        "url": url,
+                        "params": params,
+                        "request_headers": dict(e.response.request.headers) if e.response is not None and e.response.request else dict(self.session.headers),
+                        "response_headers": dict(e.response.headers) if e.response is not None else {},
+                        "status_code": status,
+                        "error": str(e),
+                        "started_at": started_at,
+                        "completed_at": datetime.now().astimezone().isoformat(),
+                        "remote_host": urlparse(url).netloc
+                    }
+                    yield [], error_meta
+                    if e.response.status_code == 400:
+                        logger.info(f"Endpoint {endpoint}: Received 400 Bad Request at page {page}. Assuming end of pagination.")
+                        break
+                    elif e.response.status_code in [401, 403]:
+                        logger.warning(f"Endpoint {endpoint}: Access denied ({e.response.status_code}). Skipping.")
+                        run["status"], run["reason"] = RUN_SKIPPED, f"HTTP {status}"
+                        break
+                    elif e.response.status_code == 404:
+                        logger.warning(f"Endpoint {endpoint}: Not found. Skipping.")
+                        run["status"], run["reason"] = RUN_SKIPPED, f"HTTP {status}"
+                        break
+                    else:
+                        logger.error(f"Stopping {endpoint} due to HTTP error: {e}")
+                        run["status"], run["reason"] = RUN_FAILED, str(e)
+                        break
+                except Exception as e:
+                    error_meta = {
+                        "method": "GET",
+                        "url": url,
+                        "params": params,
+                        "request_headers": dict(self.session.headers),
+                        "response_headers": {},
+                        "status_code": None,
+                        "error": str(e),
+                        "started_at": started_at,
+                        "completed_at": datetime.now().astimezone().isoformat(),
+                        "remote_host": urlparse(url).netloc
+                    }
+                    yield [], error_meta
+                    logger.error(f"Stopping {endpoint} due to unexpected error: {e}")
+                    run["status"], run["reason"] = RUN_FAILED, str(e)
                     break
+        finally:
+            if slot is not None:
+                self.memory.release(slot)
+            run["completed_at"] = datetime.now().astimezone().isoformat()
+            if total_decoded:
+                saved = 100 - (100 * total_received // total_decoded) if total_received else 0
+                logger.info(f"Endpoint {endpoint}: {total_received} bytes transferred, {total_decoded} bytes decoded ({saved}% saved by compression)")
+
+    def crawl_partitioned(self, endpoint: str, partitions: Optional[int] = None,
+                          workers: Optional[int] = None) -> Generator[Tuple[List[Dict[str, Any]], Dict[str, Any]], None, None]:
+        """
+        Yields the same (batch, request_meta) pairs as crawl_endpoint(), but crawls the endpoint
+        as non-overlapping date_gmt ranges (see plan_date_partitions) in parallel threads.
+        Unlike page numbers, the ranges do not shift when items are added mid-crawl.
+        Batches arrive in completion order on the calling thread, so a single writer can store them.
+        Endpoints without dates, or too small to split, are crawled with crawl_endpoint().
+        """
+        partitions = partitions or self.date_partitions
+        workers = max(1, workers or self.partition_workers)
+        plan = self.plan_date_partitions(endpoint, partitions) if partitions > 1 else []
+        if len(plan) < 2:
+            yield from self.crawl_endpoint(endpoint)
+            return
+
+        # One endpoint budget for all partitions. A bounded queue keeps threads from racing ahead
+        # of the writer; in memory-bounded mode, batches the writer has not taken yet are spilled
+        # to disk instead, so fetch threads keep going without holding them in memory.
+        budget = CrawlBudget.from_limits(self.endpoint_limits, name=f"endpoint {endpoint}", parent=self.budget)
+        results: Any
+        if self.memory is not None:
+            results = SpillQueue(
+                int(self.memory.max_rss * SPILL_RATIO),
+                size_of=lambda item: (item[1].get("bytes_decoded") or 0) * DECODE_OVERHEAD if item else 0,
+                watchdog=self.memory,
+            )
+        else:
+            results = queue.Queue(maxsize=workers * 2)
+        stop = threading.Event()
+        # JSON-serializable, so it survives a trip through the spill file
+        done = None
+        run_keys = [f"{endpoint}#{index}" for index in range(len(plan))]
+
+        def put(item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def crawl_partition(index: int):
+            partition = plan[index]
+            # Oldest first, so items published during the crawl land on the last page instead of shifting pages
+            params = {'orderby': 'date', 'order': 'asc', **date_range_params(partition["after"], partition["before"])}
+            try:
+                for result in self.crawl_endpoint(endpoint, extra_params=params, run_key=run_keys[index], endpoint_budget=budget):
+                    if not put(result):
+                        break
             except Exception as e:
-                error_meta = {
-                    "method": "GET",
-                    "url": url,
-                    "params": params,
-                    "request_headers": dict(self.session.headers),
-                    "response_headers": {},
-                    "status_code": None,
-                    "error": str(e),
-                    "started_at": started_at,
-                    "completed_at": datetime.now().astimezone().isoformat(),
-                    "remote_host": urlparse(url).netloc
-                }
-                yield [], error_meta
-                logger.error(f"Stopping {endpoint} due to unexpected error: {e}")
-                break
+                logger.error(f"Endpoint {endpoint}: partition {index} failed: {e}")
+            finally:
+                put(done)
+
+        logger.info(f"Endpoint {endpoint}: crawling {len(plan)} date partitions with {workers} threads")
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for index in range(len(plan)):
+                executor.submit(crawl_partition, index)
+            remaining = len(plan)
+            while remaining:
+                item = results.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                batch, request_meta = item
+                yield batch, request_meta
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+            if isinstance(results, SpillQueue):
+                if results.spilled_total:
+                    logger.info(f"Endpoint {endpoint}: {results.spilled_total} batches ({results.spilled_bytes} bytes) went through the spill file")
+                results.close()
+            runs = [self.endpoint_runs.pop(key) for key in run_keys if key in self.endpoint_runs]
+            if runs:
+                self.endpoint_runs[endpoint] = merge_endpoint_runs(runs)
@@ -1,9 +1,10 @@
 import sqlite3
-import json
 import logging
 from datetime import datetime
 from urllib.parse import urlparse
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from wpspider.codec import dumps
 
 logger = logging.getLogger(__name__)
 
@@ -12,8 +13,10 @@ class DatabaseManager:
     Manages SQLite database connections and operations for WPSpider.
     Handles schema creation and data insertion for WordPress endpoints.
     """
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, timeout: float = 5.0):
         self.db_path = db_path
+        # Seconds to wait on a locked database (shared job databases have several writers)
+        self.timeout = timeout
         self.conn: Optional[sqlite3.Connection] = None
         
     def __enter__(self):
@@ -26,7 +29,7 @@ class DatabaseManager:
     def connect(self):
         """Establishes connection to the SQLite database."""
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            self.conn = sqlite3.connect(self.db_path, timeout=self.timeout)
             logger.debug(f"Connected to database: {self.db_path}")
             self._init_metadata_tables()
         except sqlite3.Error as e:
@@ -72,16 +75,41 @@ class DatabaseManager:
                 started_at TEXT NOT NULL,
                 completed_at TEXT,
                 remote_host TEXT,
+                content_encoding TEXT,
+                bytes_received INTEGER,
+                bytes_decoded INTEGER,
+                FOREIGN KEY(target_id) REFERENCES targets(id)
+            )
+        """)
+        # Outcome of each endpoint crawl; 'budget_exhausted' marks partial results
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS endpoint_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                target_id INTEGER NOT NULL,
+                endpoint TEXT NOT NULL,
+                status TEXT NOT NULL,
+                reason TEXT,
+                requests INTEGER,
+                items INTEGER,
+                bytes_received INTEGER,
+                started_at TEXT,
+                completed_at TEXT,
                 FOREIGN KEY(target_id) REFERENCES targets(id)
             )
         """)
+        self._ensure_columns("http_requests", {
+            "content_encoding": "TEXT",
+            "bytes_received": "INTEGER",
+            "bytes_decoded": "INTEGER"
+        })
         
         self.conn.commit()
 
-    def log_target(self, url: str) -> Optional[int]:
+    def log_target(self, url: str, date_crawled: Optional[str] = None) -> Optional[int]:
         """
         Logs the target URL and returns the row ID.
         Extracts domain from the URL.
+        An explicit date_crawled ties shard databases of one crawl to the same target row when merged.
         """
         if not self.conn:
             raise RuntimeError("Database not connected")
@@ -96,12 +124,24 @@ class DatabaseManager:
         cursor = self.conn.cursor()
         cursor.execute(
             "INSERT INTO targets (url, domain, date_crawled) VALUES (?, ?, ?)",
-            (url, domain, datetime.now().astimezone().isoformat())
+            (url, domain, date_crawled or datetime.now().astimezone().isoformat())
         )
         self.conn.commit()
         logger.info(f"Logged target: {url} (ID: {cursor.lastrowid})")
         return cursor.lastrowid
 
+    def get_target(self, target_id: int) -> Optional[Dict[str, Any]]:
+        """Returns a targets row as a dict, or None if it does not exist."""
+        if not self.conn:
+            raise RuntimeError("Database not connected")
+
+        row = self.conn.execute(
+            "SELECT id, url, domain, date_crawled FROM targets WHERE id = ?", (target_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "url": row[1], "domain": row[2], "date_crawled": row[3]}
+
     def log_http_request(self, target_id: int, endpoint: str, meta: Dict[str, Any]) -> Optional[int]:
         if not self.conn:
             raise RuntimeError("Database not connected")
@@ -111,27 +151,96 @@ class DatabaseManager:
             """
             INSERT INTO http_requests (
                 target_id, endpoint, method, url, params, request_headers, response_headers,
-                status_code, error, started_at, completed_at, remote_host
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                status_code, error, started_at, completed_at, remote_host,
+                content_encoding, bytes_received, bytes_decoded
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 target_id,
                 endpoint,
                 meta.get("method"),
                 meta.get("url"),
-                json.dumps(meta.get("params")) if meta.get("params") is not None else None,
-                json.dumps(meta.get("request_headers")) if meta.get("request_headers") is not None else None,
-                json.dumps(meta.get("response_headers")) if meta.get("response_headers") is not None else None,
+                dumps(meta.get("params")) if meta.get("params") is not None else None,
+                dumps(meta.get("request_headers")) if meta.get("request_headers") is not None else None,
+                dumps(meta.get("response_headers")) if meta.get("response_headers") is not None else None,
                 meta.get("status_code"),
                 meta.get("error"),
                 meta.get("started_at"),
                 meta.get("completed_at"),
-                meta.get("remote_host")
+                meta.get("remote_host"),
+                meta.get("content_encoding"),
+                meta.get("bytes_received"),
+                meta.get("bytes_decoded")
+            )
+        )
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def log_endpoint_run(self, target_id: int, endpoint: str, run: Dict[str, Any]) -> Optional[int]:
+        """Records how an endpoint crawl ended (complete, budget_exhausted, skipped, failed) and what it used."""
+        if not self.conn:
+            raise RuntimeError("Database not connected")
+
+        cursor = self.conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO endpoint_runs (target_id, endpoint, status, reason, requests, items, bytes_received, started_at, completed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                target_id,
+                endpoint,
+                run.get("status"),
+                run.get("reason"),
+                run.get("requests"),
+                run.get("items"),
+                run.get("bytes_received"),
+                run.get("started_at"),
+                run.get("completed_at")
             )
         )
         self.conn.commit()
         return cursor.lastrowid
 
+    def get_endpoint_runs(self, target_id: int) -> List[Dict[str, Any]]:
+        """Returns the endpoint_runs rows of a target as dicts, oldest first."""
+        if not self.conn:
+            raise RuntimeError("Database not connected")
+
+        cursor = self.conn.execute(
+            """
+            SELECT endpoint, status, reason, requests, items, bytes_received, started_at, completed_at
+            FROM endpoint_runs WHERE target_id = ? ORDER BY id
+            """,
+            (target_id,)
+        )
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def table_name(endpoint: str) -> str:
+        """Table name for an endpoint: only alphanumerics and underscores are kept."""
+        return "".join(c for c in endpoint if c.isalnum() or c == '_')
+
+    def existing_table(self, endpoint: str) -> Optional[str]:
+        """Returns the table name for an endpoint if that table exists, otherwise None."""
+        if not self.conn:
+            raise RuntimeError("Database not connected")
+
+        table = self.table_name(endpoint)
+        if not table:
+            return None
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        return table if exists else None
+
+    @staticmethod
+    def target_filter(target: Any) -> Tuple[str, List[Any]]:
+        """SQL clause and parameters restricting target_id to a target id, or to every crawl of a domain or URL."""
+        if isinstance(target, int) or str(target).isdigit():
+            return "target_id = ?", [int(target)]
+        domain = urlparse(target).netloc or target
+        return "target_id IN (SELECT id FROM targets WHERE domain = ? OR url = ?)", [domain, target]
+
     def ensure_endpoint_table(self, endpoint: str):
         """
         Ensures a table exists for the given endpoint using the generic schema.
@@ -139,8 +248,7 @@ class DatabaseManager:
         if not self.conn:
             raise RuntimeError("Database not connected")
         
-        # Basic sanitization: keep only alphanumeric and underscores
-        sanitized_table = "".join(c for c in endpoint if c.isalnum() or c == '_')
+        sanitized_table = self.table_name(endpoint)
         if not sanitized_table:
             logger.warning(f"Skipping table creation for invalid endpoint name: {endpoint}")
             return
@@ -208,6 +316,26 @@ class DatabaseManager:
             
         return None
 
+    def stored_wp_ids(self, endpoint: str, target_id: int, wp_ids: List[int]) -> Set[int]:
+        """Returns the wp_ids among wp_ids already stored for target_id in the endpoint table."""
+        if not self.conn:
+            raise RuntimeError("Database not connected")
+
+        table = self.existing_table(endpoint)
+        if not table or not wp_ids:
+            return set()
+        stored: Set[int] = set()
+        # Stay below SQLite's host parameter limit
+        for start in range(0, len(wp_ids), 500):
+            chunk = wp_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = self.conn.execute(
+                f"SELECT DISTINCT wp_id FROM {table} WHERE target_id = ? AND wp_id IN ({placeholders})",
+                (target_id, *chunk)
+            )
+            stored.update(row[0] for row in cursor)
+        return stored
+
     def save_batch(self, endpoint: str, data_items: List[Dict[str, Any]], target_id: Optional[int] = None, request_id: Optional[int] = None):
         """
         Saves a batch of data items to the endpoint table.
@@ -218,7 +346,7 @@ class DatabaseManager:
         if not data_items:
             return
 
-        sanitized_table = "".join(c for c in endpoint if c.isalnum() or c == '_')
+        sanitized_table = self.table_name(endpoint)
         if not sanitized_table:
             logger.warning(f"Invalid endpoint name '{endpoint}', skipping save.")
             return
@@ -246,7 +374,7 @@ class DatabaseManager:
                 # Date extraction logic (try date_gmt, then date, else None)
                 date_val = item.get('date_gmt') or item.get('date')
 
-                json_data = json.dumps(item)
+                json_data = dumps(item)
                 rows.append((target_id, request_id, wp_id, slug, link, title, date_val, json_data, now))
                 
             cursor.executemany(f"""
@@ -255,7 +383,7 @@ class DatabaseManager:
             """, rows)
             
             self.conn.commit()
-            logger.info(f"Saved {len(rows)} items to table '{sanitized_table}'")
+            logger.debug(f"Saved {len(rows)} items to table '{sanitized_table}'")
             
         except sqlite3.Error as e:
             logger.error(f"Failed to save batch to {sanitized_table}: {e}")
@@ -0,0 +1,167 @@
+import csv
+import json
+import logging
+import os
+import sys
+from typing import List, Dict, Any, Optional, Tuple, Iterator, IO
+
+from wpspider.codec import loads
+from wpspider.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+# Columns holding JSON text; NDJSON output embeds them as objects rather than strings
+JSON_COLUMNS = {"data", "params", "request_headers", "response_headers"}
+
+# Column used for --since/--until filtering
+DATE_COLUMNS = {"http_requests": "started_at"}
+
+
+def infer_format(out_path: str) -> Optional[str]:
+    """Guesses the export format from the output file extension."""
+    ext = os.path.splitext(out_path)[1].lower()
+    return {
+        ".ndjson": "ndjson",
+        ".jsonl": "ndjson",
+        ".csv": "csv",
+        ".parquet": "parquet",
+    }.get(ext)
+
+
+class TableExporter:
+    """
+    Streams an endpoint table (or http_requests) out of a crawl database.
+    Rows are read with fetchmany() in chunks, so memory use does not grow with table size.
+    """
+    def __init__(self, db: DatabaseManager, table: str, chunk_size: int = 1000, include_data: bool = True):
+        if not db.conn:
+            raise RuntimeError("Database not connected")
+
+        self.db = db
+        existing = db.existing_table(table)
+        if not existing:
+            raise ValueError(f"Table '{table}' does not exist in {db.db_path}")
+        self.table = existing
+        self.chunk_size = max(1, chunk_size)
+
+        table_info = db.conn.execute(f"PRAGMA table_info({self.table})").fetchall()
+        self.column_types: Dict[str, str] = {row[1]: (row[2] or "TEXT").upper() for row in table_info}
+        self.columns: List[str] = [
+            name for name in self.column_types
+            if include_data or name not in JSON_COLUMNS
+        ]
+
+    def _build_query(self, target: Optional[str], since: Optional[str], until: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+
+        if target:
+            if "target_id" not in self.column_types:
+                raise ValueError(f"Table '{self.table}' cannot be filtered by target")
+            clause, target_params = self.db.target_filter(target)
+            clauses.append(clause)
+            params.extend(target_params)
+
+        date_column = DATE_COLUMNS.get(self.table, "date")
+        if (since or until) and date_column not in self.column_types:
+            raise ValueError(f"Table '{self.table}' cannot be filtered by date")
+        if since:
+            clauses.append(f"{date_column} >= ?")
+            params.append(since)
+        if until:
+            clauses.append(f"{date_column} < ?")
+            params.append(until)
+
+        sql = f"SELECT {', '.join(self.columns)} FROM {self.table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+        return sql, params
+
+    def iter_chunks(self, target: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None) -> Iterator[List[tuple]]:
+        """Yields lists of at most chunk_size rows matching the filters."""
+        assert self.db.conn is not None
+        sql, params = self._build_query(target, since, until)
+        cursor = self.db.conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    def export(self, out_path: str, fmt: str, target: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None) -> int:
+        """Writes matching rows to out_path ('-' for stdout, text formats only). Returns rows written."""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format '{fmt}'. Choose one of: {', '.join(EXPORT_FORMATS)}")
+
+        chunks = self.iter_chunks(target, since, until)
+        if fmt == "parquet":
+            if out_path == "-":
+                raise ValueError("Parquet export requires an output file")
+            count = self._write_parquet(out_path, chunks)
+        elif out_path == "-":
+            count = self._write_text(sys.stdout, fmt, chunks)
+        else:
+            with open(out_path, "w", encoding="utf-8", newline="") as f:
+                count = self._write_text(f, fmt, chunks)
+
+        logger.info(f"Exported {count} rows from '{self.table}' to {out_path} ({fmt})")
+        return count
+
+    def _write_text(self, f: IO[str], fmt: str, chunks: Iterator[List[tuple]]) -> int:
+        count = 0
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for rows in chunks:
+                writer.writerows(rows)
+                count += len(rows)
+            return count
+
+        json_indexes = [i for i, name in enumerate(self.columns) if name in JSON_COLUMNS]
+        for rows in chunks:
+            for row in rows:
+                record = dict(zip(self.columns, row))
+                for i in json_indexes:
+                    value = row[i]
+                    if value is not None:
+                        try:
+                            record[self.columns[i]] = loads(value)
+                        except ValueError:
+                            pass
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write("\n")
+            count += len(rows)
+        return count
+
+    def _write_parquet(self, out_path: str, chunks: Iterator[List[tuple]]) -> int:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow. Install it with: pip install pyarrow")
+
+        def arrow_type(sql_type: str):
+            if "INT" in sql_type:
+                return pa.int64()
+            if "REAL" in sql_type or "FLOA" in sql_type or "DOUB" in sql_type:
+                return pa.float64()
+            return pa.string()
+
+        # Extracted columns (wp_id, slug, title, date, ...) become typed Parquet columns
+        schema = pa.schema([(name, arrow_type(self.column_types[name])) for name in self.columns])
+        count = 0
+        writer = pq.ParquetWriter(out_path, schema)
+        try:
+            for rows in chunks:
+                arrays = [
+                    pa.array([row[i] for row in rows], type=field.type)
+                    for i, field in enumerate(schema)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                count += len(rows)
+        finally:
+            writer.close()
+        return count
@@ -0,0 +1,334 @@
+import os
+import socket
+import sqlite3
+import time
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from wpspider.budget import RUN_FAILED
+from wpspider.crawler import WPCrawler
+from wpspider.database import DatabaseManager
+from wpspider.logger import ProgressLogger
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_LEASED = "leased"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def default_worker_id() -> str:
+    """Returns an identifier that is unique per process across hosts sharing a filesystem."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Lease-based crawl work queue stored in the shared SQLite crawl database.
+
+    Each job is a (target, endpoint, page range) work unit. Workers claim jobs by
+    taking a time-limited lease and extend it with heartbeats while crawling; a
+    job whose lease expires is handed to the next worker that asks for work.
+    The last page stored is kept in page_done, so a retried job resumes after it
+    instead of storing its first pages again.
+    """
+    def __init__(self, db: DatabaseManager, lease_seconds: float = 300.0, max_attempts: int = 3):
+        self.db = db
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._init_jobs_table()
+
+    def _conn(self) -> sqlite3.Connection:
+        if not self.db.conn:
+            raise RuntimeError("Database not connected")
+        return self.db.conn
+
+    def _init_jobs_table(self):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                target_id INTEGER NOT NULL,
+                target_url TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                page_start INTEGER NOT NULL,
+                page_end INTEGER,
+                status TEXT NOT NULL,
+                worker_id TEXT,
+                lease_expires_at REAL,
+                heartbeat_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                items INTEGER,
+                page_done INTEGER,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                completed_at TEXT,
+                FOREIGN KEY(target_id) REFERENCES targets(id)
+            )
+        """)
+        # Job databases created before resumable jobs
+        self.db._ensure_columns("crawl_jobs", {"page_done": "INTEGER"})
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_crawl_jobs_status ON crawl_jobs (status, lease_expires_at)")
+        conn.commit()
+
+    def enqueue(self, target_id: int, target_url: str, endpoint: str, page_start: int = 1, page_end: Optional[int] = None) -> Optional[int]:
+        """Adds a single work unit. A page_end of None means 'crawl until the endpoint runs out'."""
+        conn = self._conn()
+        cursor = conn.execute(
+            """
+            INSERT INTO crawl_jobs (target_id, target_url, endpoint, page_start, page_end, status, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (target_id, target_url, endpoint, page_start, page_end, JOB_PENDING, datetime.now().astimezone().isoformat())
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+    def plan_target(self, target_id: int, target_url: str, endpoints: List[str], crawler: WPCrawler, pages_per_job: int = 10) -> int:
+        """
+        Splits every endpoint of a target into page-range jobs using X-WP-TotalPages.
+        The last range of each endpoint is left open-ended so items published mid-crawl are not lost.
+        Returns the number of jobs enqueued.
+        """
+        pages_per_job = max(1, pages_per_job)
+        count = 0
+        for endpoint in endpoints:
+            total_pages = crawler.probe_total_pages(endpoint)
+            if not total_pages:
+                # Unknown size: a single open-ended job
+                self.enqueue(target_id, target_url, endpoint, 1, None)
+                count += 1
+                continue
+
+            for page_start in range(1, total_pages + 1, pages_per_job):
+                page_end = page_start + pages_per_job - 1
+                self.enqueue(target_id, target_url, endpoint, page_start, page_end if page_end < total_pages else None)
+                count += 1
+
+            logger.info(f"Planned {endpoint}: {total_pages} pages in jobs of {pages_per_job}")
+        return count
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically leases the next available job to worker_id.
+        Pending jobs and jobs with expired leases are both eligible; jobs that have
+        exhausted max_attempts are marked failed instead of being handed out again.
+        """
+        conn = self._conn()
+        now = time.time()
+        if conn.in_transaction:
+            conn.commit()
+
+        # Take the write lock up front so two workers cannot select the same row
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """
+                UPDATE crawl_jobs SET status = ?, error = ?, worker_id = NULL, lease_expires_at = NULL
+                WHERE status = ? AND lease_expires_at < ? AND attempts >= ?
+                """,
+                (JOB_FAILED, "Lease expired after maximum attempts", JOB_LEASED, now, self.max_attempts)
+            )
+            row = conn.execute(
+                """
+                SELECT id, target_id, target_url, endpoint, page_start, page_end, page_done, attempts, worker_id
+                FROM crawl_jobs
+                WHERE status = ? OR (status = ? AND lease_expires_at < ?)
+                ORDER BY id
+                LIMIT 1
+                """,
+                (JOB_PENDING, JOB_LEASED, now)
+            ).fetchone()
+
+            if row is None:
+                conn.commit()
+                return None
+
+            job_id, target_id, target_url, endpoint, page_start, page_end, page_done, attempts, previous_worker = row
+            conn.execute(
+                """
+                UPDATE crawl_jobs
+                SET status = ?, worker_id = ?, lease_expires_at = ?, heartbeat_at = ?, attempts = attempts + 1
+                WHERE id = ?
+                """,
+                (JOB_LEASED, worker_id, now + self.lease_seconds, now, job_id)
+            )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+        if previous_worker:
+            logger.warning(f"Reassigning job {job_id} from {previous_worker} (lease expired) to {worker_id}")
+
+        return {
+            "id": job_id,
+            "target_id": target_id,
+            "target_url": target_url,
+            "endpoint": endpoint,
+            "page_start": page_start,
+            "page_end": page_end,
+            "page_done": page_done,
+            "attempts": attempts + 1,
+        }
+
+    def heartbeat(self, job_id: int, worker_id: str, page_done: Optional[int] = None) -> bool:
+        """
+        Extends the lease on a job and records page_done (the last page stored) if given.
+        Returns False if the worker no longer holds the lease (it expired and the job was
+        reassigned), in which case the worker should stop.
+        """
+        conn = self._conn()
+        now = time.time()
+        cursor = conn.execute(
+            """
+            UPDATE crawl_jobs SET lease_expires_at = ?, heartbeat_at = ?, page_done = COALESCE(?, page_done)
+            WHERE id = ? AND worker_id = ? AND status = ?
+            """,
+            (now + self.lease_seconds, now, page_done, job_id, worker_id, JOB_LEASED)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, items: int) -> bool:
+        return self._finish(job_id, worker_id, JOB_DONE, items=items)
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Marks a job failed, or returns it to the queue if it has attempts left."""
+        conn = self._conn()
+        row = conn.execute("SELECT attempts FROM crawl_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row and row[0] < self.max_attempts:
+            cursor = conn.execute(
+                """
+                UPDATE crawl_jobs SET status = ?, worker_id = NULL, lease_expires_at = NULL, error = ?
+                WHERE id = ? AND worker_id = ? AND status = ?
+                """,
+                (JOB_PENDING, error, job_id, worker_id, JOB_LEASED)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+        return self._finish(job_id, worker_id, JOB_FAILED, error=error)
+
+    def _finish(self, job_id: int, worker_id: str, status: str, items: Optional[int] = None, error: Optional[str] = None) -> bool:
+        conn = self._conn()
+        cursor = conn.execute(
+            """
+            UPDATE crawl_jobs
+            SET status = ?, items = ?, error = ?, lease_expires_at = NULL, completed_at = ?
+            WHERE id = ? AND worker_id = ? AND status = ?
+            """,
+            (status, items, error, datetime.now().astimezone().isoformat(), job_id, worker_id, JOB_LEASED)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of jobs per status."""
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM crawl_jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+class CrawlWorker:
+    """
+    Pulls jobs from a JobQueue and crawls them into the same shared database.
+    Any number of workers (processes or hosts) can run against one job database.
+    With output_db set, crawled data goes to that (shard) database instead, so
+    workers never contend for the shared file except to claim and renew leases.
+    """
+    def __init__(self, queue: JobQueue, worker_id: Optional[str] = None, crawler_options: Optional[Dict[str, Any]] = None,
+                 poll_interval: float = 5.0, output_db: Optional[DatabaseManager] = None):
+        self.queue = queue
+        self.db = output_db or queue.db
+        self.worker_id = worker_id or default_worker_id()
+        self.crawler_options = crawler_options or {}
+        self.poll_interval = poll_interval
+        self._crawlers: Dict[str, WPCrawler] = {}
+        self._target_ids: Dict[int, Optional[int]] = {}
+
+    def _output_target_id(self, target_id: int) -> Optional[int]:
+        """Maps a job database target id to the output database, mirroring the targets row if needed."""
+        if self.db is self.queue.db:
+            return target_id
+        if target_id not in self._target_ids:
+            target = self.queue.db.get_target(target_id)
+            if target is None:
+                raise RuntimeError(f"Target {target_id} not found in job database")
+            # Same (url, date_crawled) lets merge_shards fold it back into one row
+            self._target_ids[target_id] = self.db.log_target(target["url"], date_crawled=target["date_crawled"])
+        return self._target_ids[target_id]
+
+    def _crawler_for(self, target_url: str) -> WPCrawler:
+        # Reuse one session per target so consecutive jobs keep their connections
+        if target_url not in self._crawlers:
+            self._crawlers[target_url] = WPCrawler(target_url, **self.crawler_options)
+        return self._crawlers[target_url]
+
+    def run(self, exit_when_idle: bool = False) -> int:
+        """Processes jobs until interrupted (or until the queue is drained if exit_when_idle). Returns jobs processed."""
+        processed = 0
+        logger.info(f"Worker {self.worker_id} started")
+        while True:
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                if exit_when_idle:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+
+            self.run_job(job)
+            processed += 1
+
+        logger.info(f"Worker {self.worker_id} finished after {processed} jobs")
+        return processed
+
+    def run_job(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        endpoint = job["endpoint"]
+        # A retried job resumes after the last page an earlier attempt stored
+        start_page = max(job["page_start"], (job.get("page_done") or 0) + 1)
+        page_range = f"{start_page}-{job['page_end'] or 'end'}"
+        logger.info(f"Worker {self.worker_id}: job {job_id} {endpoint} pages {page_range} ({job['target_url']})")
+        if job["page_end"] is not None and start_page > job["page_end"]:
+            self.queue.complete(job_id, self.worker_id, 0)
+            return
+
+        crawler = self._crawler_for(job["target_url"])
+        total_items = 0
+        progress = ProgressLogger(logger, f"Worker {self.worker_id}: job {job_id} {endpoint}", endpoint=endpoint)
+        try:
+            target_id = self._output_target_id(job["target_id"])
+            for batch, request_meta in crawler.crawl_endpoint(endpoint, start_page=start_page, end_page=job["page_end"]):
+                # Renew the lease before writing: once it is lost, the next worker owns these pages
+                if not self.queue.heartbeat(job_id, self.worker_id):
+                    logger.warning(f"Worker {self.worker_id}: lost lease on job {job_id}. Abandoning.")
+                    return
+                request_id = self.db.log_http_request(target_id, endpoint, request_meta)
+                if batch:
+                    embedded = crawler.extract_embedded(endpoint, batch) if crawler.embed else {}
+                    self.db.save_batch(endpoint, batch, target_id=target_id, request_id=request_id)
+                    for embedded_endpoint, objects in embedded.items():
+                        # Other workers writing to this database may have stored them already
+                        stored = self.db.stored_wp_ids(embedded_endpoint, target_id, [obj['id'] for obj in objects])
+                        objects = [obj for obj in objects if obj['id'] not in stored]
+                        self.db.save_batch(embedded_endpoint, objects, target_id=target_id, request_id=request_id)
+                    total_items += len(batch)
+                    progress.update(len(batch))
+                    self.queue.heartbeat(job_id, self.worker_id, page_done=request_meta.get("params", {}).get("page"))
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id}: job {job_id} failed: {e}")
+            self.queue.fail(job_id, self.worker_id, str(e))
+            return
+
+        progress.finish()
+        run = crawler.endpoint_runs.get(endpoint)
+        if run:
+            self.db.log_endpoint_run(target_id, endpoint, run)
+        if run and run["status"] == RUN_FAILED:
+            # crawl_endpoint() handles request errors itself; retry the page range like any other failure
+            logger.error(f"Worker {self.worker_id}: job {job_id} failed: {run['reason']}")
+            self.queue.fail(job_id, self.worker_id, run["reason"] or "crawl failed")
+            return
+        self.queue.complete(job_id, self.worker_id, total_items)
+        logger.info(f"Worker {self.worker_id}: job {job_id} done ({total_items} items)")
@@ -1,7 +1,24 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
 import os
+import threading
+import time
 from datetime import datetime, timezone
+from typing import Optional
+
+LOG_FORMATS = ("text", "json")
+
+# Extra record attributes copied into JSON-lines output (logger.info(..., extra={...}))
+STRUCTURED_FIELDS = ("target", "endpoint", "page", "items", "total_items", "latency", "rate", "bytes")
+
+# Minimum seconds between two progress lines of one ProgressLogger
+PROGRESS_INTERVAL = 5.0
+
+_listener: Optional[logging.handlers.QueueListener] = None
 
 
 class Iso8601Formatter(logging.Formatter):
@@ -9,20 +26,49 @@ class Iso8601Formatter(logging.Formatter):
         dt = datetime.fromtimestamp(record.created, tz=timezone.utc).astimezone()
         return dt.isoformat(timespec="seconds")
 
-def setup_logging(log_file_path: str = "wpspider.log") -> logging.Logger:
+class JsonLinesFormatter(Iso8601Formatter):
+    """Formats each record as one JSON object, including any STRUCTURED_FIELDS passed as extra."""
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def setup_logging(log_file_path: str = "wpspider.log", log_format: str = "text", log_level: str = "INFO") -> logging.Logger:
     """
     Sets up the logging configuration for wpspider.
     Logs are written to the specified file and echoed to the console.
+
+    Records are handed to a QueueHandler; a QueueListener thread does the formatting and
+    the file/console writes, so logging calls in crawl threads never wait on I/O.
+    log_format 'json' writes JSON lines to the log file (the console stays human-readable).
+    log_level applies to the log file; the console always shows INFO and above.
     """
-    
+    global _listener
+
     # Create logger
     logger = logging.getLogger("wpspider")
-    logger.setLevel(logging.INFO)
-    
+    level = logging.getLevelName(log_level.upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level '{log_level}'")
+    logger.setLevel(min(level, logging.INFO))
+
     # Prevent adding handlers multiple times if function is called repeatedly
     if logger.handlers:
         return logger
 
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Unsupported log format '{log_format}'. Choose one of: {', '.join(LOG_FORMATS)}")
+
     # Formatter
     formatter = Iso8601Formatter(
         '%(asctime)s - %(levelname)s - %(message)s'
@@ -35,14 +81,66 @@ def setup_logging(log_file_path: str = "wpspider.log") -> logging.Logger:
         os.makedirs(log_dir)
 
     file_handler = logging.FileHandler(log_file_path, encoding='utf-8')
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(JsonLinesFormatter() if log_format == "json" else formatter)
 
     # Console Handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
 
     return logger
+
+def shutdown_logging():
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+class ProgressLogger:
+    """
+    Aggregates per-batch progress and logs it at most once per interval, instead of a
+    line per batch. Safe to update from several threads.
+    """
+    def __init__(self, logger: logging.Logger, label: str, interval: float = PROGRESS_INTERVAL, **fields):
+        self.logger = logger
+        self.label = label
+        self.interval = interval
+        self.fields = fields
+        self.items = 0
+        self.pages = 0
+        self._started = time.monotonic()
+        self._last_logged = self._started
+        self._lock = threading.Lock()
+
+    def update(self, items: int, pages: int = 1):
+        with self._lock:
+            self.items += items
+            self.pages += pages
+            now = time.monotonic()
+            if now - self._last_logged < self.interval:
+                return
+            self._last_logged = now
+            items_total, pages_total = self.items, self.pages
+        self._log(items_total, pages_total, now, "progress")
+
+    def finish(self):
+        """Logs the final totals."""
+        self._log(self.items, self.pages, time.monotonic(), "done")
+
+    def _log(self, items: int, pages: int, now: float, state: str):
+        elapsed = now - self._started
+        rate = items / elapsed if elapsed > 0 else 0.0
+        self.logger.info(
+            f"{self.label}: {state}, {items} items in {pages} pages ({rate:.1f} items/s)",
+            extra=dict(self.fields, total_items=items, rate=round(rate, 1))
+        )
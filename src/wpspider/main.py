@@ -1,14 +1,26 @@
 import argparse
+import os
 import sys
 import logging
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from wpspider.config import Config
-from wpspider.logger import setup_logging
+from wpspider.logger import setup_logging, ProgressLogger, LOG_FORMATS
 from wpspider.database import DatabaseManager
-from wpspider.crawler import WPCrawler
+from wpspider.crawler import SeenObjects, WPCrawler
+from wpspider.budget import CrawlBudget, RUN_COMPLETE
+from wpspider.memory import shared_memory_watchdog
+from wpspider.jobs import JobQueue, CrawlWorker
+from wpspider.shards import shard_directory, shard_path, expand_shard_paths, merge_shards
+from wpspider.export import TableExporter, EXPORT_FORMATS, infer_format
+from wpspider.media import MediaDownloader, default_media_directory
+from wpspider.sitemap import SitemapRefresher, sitemap_url
+from wpspider.scheduler import CrawlScheduler, read_targets_file
 
-def parse_args():
-    parser = argparse.ArgumentParser(description="WPSpider: WordPress Content Crawler")
+logger = logging.getLogger("wpspider")
+
+def _add_common_args(parser: argparse.ArgumentParser):
     parser.add_argument("--target", "-t", "--url", "--site", "--domain", type=str, help="Target WordPress URL or domain")
 
     output_group = parser.add_mutually_exclusive_group()
@@ -16,13 +28,353 @@ def parse_args():
     output_group.add_argument("--directory", "-d", "--outdirectory", "--outputdirectory", type=str, help="Output directory (used only when --output is not provided)")
 
     parser.add_argument("--useragent", "--user-agent", "-u", dest="user_agent", type=str, help="Custom User-Agent string")
-    return parser.parse_args()
 
-def main():
-    logger = None
+def _add_logging_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--log-format", choices=LOG_FORMATS, help="Log file format: text or json lines (default: text)")
+    parser.add_argument("--log-level", type=str, help="Log file level, e.g. DEBUG for per-page events (default: INFO)")
+
+def _add_http_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--connect-timeout", type=float, help="Seconds to wait for a connection (default: 10)")
+    parser.add_argument("--read-timeout", type=float, help="Seconds to wait for response data (default: 10)")
+    parser.add_argument("--dns-ttl", type=float, help="Seconds host lookups are cached in-process; 0 disables the cache (default: 300)")
+    parser.add_argument("--prewarm", type=int, help="Open this many connections to the target before crawling (default: 0)")
+
+def _add_budget_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--max-requests", type=int, help="Stop a target after this many requests")
+    parser.add_argument("--max-bytes", type=int, help="Stop a target after this many bytes transferred")
+    parser.add_argument("--max-items", type=int, help="Stop a target after this many items")
+    parser.add_argument("--max-seconds", type=float, help="Stop a target after this many seconds")
+    parser.add_argument("--max-bytes-per-second", type=float, help="Bandwidth cap shared by all crawl threads of this process")
+    parser.add_argument("--max-rss", type=float, help="Memory-bounded mode: RSS ceiling in MB for this process")
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="WPSpider: WordPress Content Crawler")
+    _add_common_args(parser)
+    _add_http_args(parser)
+    _add_budget_args(parser)
+    parser.add_argument("--shards", dest="shard_output", action="store_true", help="Write each endpoint to its own shard database and merge at the end")
+    parser.add_argument("--workers", "-w", type=int, help="Number of endpoints crawled in parallel in shard mode")
+    parser.add_argument("--download-media", action="store_true", help="Download media files after the crawl")
+    parser.add_argument("--embed", action="store_true", help="Request _embed and store embedded authors, media and terms in their own tables")
+    parser.add_argument("--partitions", type=int, help="Split each dated endpoint into about this many date ranges crawled in parallel")
+    parser.add_argument("--partition-workers", type=int, help="Threads crawling the date ranges of an endpoint (default: 4)")
+    _add_media_args(parser)
+    _add_logging_args(parser)
+    return parser.parse_args(argv)
+
+def _add_media_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--media-directory", "--media-dir", dest="media_directory", type=str, help="Directory for downloaded media files")
+    parser.add_argument("--media-workers", type=int, help="Parallel media downloads (default: 4)")
+    parser.add_argument("--media-per-host", type=int, help="Parallel media downloads per host (default: 2)")
+    parser.add_argument("--media-sizes", type=str, help="Comma-separated image sizes to download, e.g. full,medium (default: full)")
+
+def download_media(config: Config, db: DatabaseManager, target_id: Optional[int] = None):
+    """Downloads media files referenced by the media table."""
+    assert config.db_name
+    downloader = MediaDownloader(
+        db,
+        config.media_directory or default_media_directory(config.db_name),
+        workers=config.media_workers,
+        per_host=config.media_per_host,
+        sizes=config.media_sizes,
+        user_agent=config.user_agent,
+        connect_timeout=config.connect_timeout,
+    )
+    return downloader.run(target_id=target_id)
+
+def prewarm_connections(config: Config, crawler: WPCrawler):
+    """Opens the configured number of connections to the target before the first request."""
+    if config.prewarm_connections:
+        opened = crawler.prewarm(config.prewarm_connections)
+        logger.info(f"Pre-warmed {opened} connections to {config.target}")
+
+def crawl_endpoint_into_db(crawler: WPCrawler, db: DatabaseManager, target_id: int, endpoint: str) -> int:
+    """Crawls one endpoint into db. Errors are logged so one failed endpoint doesn't crash the run."""
+    logger.info(f"--- Starting Endpoint: {endpoint} ---")
+    total_items = 0
+    progress = ProgressLogger(logger, f"Endpoint {endpoint}", endpoint=endpoint)
+    try:
+        # Iterate through batches yielded by the crawler
+        batches = crawler.crawl_partitioned(endpoint) if crawler.date_partitions > 1 else crawler.crawl_endpoint(endpoint)
+        for batch, request_meta in batches:
+            request_id = db.log_http_request(target_id, endpoint, request_meta)
+            if batch:
+                embedded = crawler.extract_embedded(endpoint, batch) if crawler.embed else {}
+                db.save_batch(endpoint, batch, target_id=target_id, request_id=request_id)
+                for embedded_endpoint, objects in embedded.items():
+                    db.save_batch(embedded_endpoint, objects, target_id=target_id, request_id=request_id)
+                total_items += len(batch)
+                progress.update(len(batch))
+
+        progress.finish()
+        run = crawler.endpoint_runs.get(endpoint)
+        if run:
+            db.log_endpoint_run(target_id, endpoint, run)
+        logger.info(f"--- Finished Endpoint: {endpoint}. Total items: {total_items} ---")
+
+    except Exception as ep_err:
+        logger.error(f"Failed to crawl endpoint '{endpoint}': {ep_err}")
+        logger.debug(traceback.format_exc())
+
+    return total_items
+
+def report_partial_endpoints(db: DatabaseManager, target_id: int):
+    """Warns about endpoints that stopped early (budget, errors) in a crawl."""
+    partial = [run for run in db.get_endpoint_runs(target_id) if run["status"] != RUN_COMPLETE]
+    if partial:
+        details = ", ".join(f"{run['endpoint']} ({run['status']}: {run['reason']})" for run in partial)
+        logger.warning(f"Crawl {target_id} is incomplete: {details}")
+
+def crawl_sharded(config: Config) -> Optional[int]:
+    """
+    Crawls endpoints in parallel, each into its own shard database, then merges
+    the shards into the output database. No two threads share a SQLite writer.
+    Returns the target id in the output database.
+    """
+    assert config.db_name and config.target
+
+    with DatabaseManager(config.db_name) as db:
+        target_id = db.log_target(config.target)
+        target = db.get_target(target_id) if target_id else None
+    date_crawled = target["date_crawled"] if target else None
+
+    os.makedirs(shard_directory(config.db_name), exist_ok=True)
+    # One target budget and one set of stored embedded objects for all shard threads
+    budget = CrawlBudget.from_limits(config.budget)
+    seen_objects = SeenObjects()
+    if config.prewarm_connections:
+        # Shard crawlers share the process-wide connection pool, so one warm-up serves all
+        prewarm_connections(config, WPCrawler(config.target, **config.crawler_options()))
+
+    def crawl_shard(endpoint: str) -> str:
+        path = shard_path(config.db_name, endpoint)
+        if os.path.exists(path):
+            # Stale shard from an interrupted run
+            os.remove(path)
+        with DatabaseManager(path) as shard_db:
+            shard_target_id = shard_db.log_target(config.target, date_crawled=date_crawled)
+            crawler = WPCrawler(config.target, budget=budget, seen_objects=seen_objects, **config.crawler_options())
+            crawl_endpoint_into_db(crawler, shard_db, shard_target_id, endpoint)
+        return path
+
+    with ThreadPoolExecutor(max_workers=config.workers) as pool:
+        paths = list(pool.map(crawl_shard, config.endpoints))
+
+    with DatabaseManager(config.db_name) as db:
+        totals = merge_shards(db, paths)
+    logger.info(f"Merged {len(paths)} shards into {config.db_name}: {totals}")
+
+    for path in paths:
+        os.remove(path)
+    try:
+        os.rmdir(shard_directory(config.db_name))
+    except OSError:
+        pass
+    return target_id
+
+def run_merge(argv: List[str]):
+    """Merges shard databases (files or directories of .sqlite files) into one output database."""
+    parser = argparse.ArgumentParser(prog="wpspider merge", description="Merge shard databases into one output database")
+    parser.add_argument("--output", "-o", "--db", "--database", "--db-name", type=str, help="Destination SQLite database file")
+    parser.add_argument("shards", nargs="+", help="Shard database files or directories containing them")
+    _add_logging_args(parser)
+    args = parser.parse_args(argv)
+
+    config = Config(args=args, require_target=False)
+    setup_logging(config.log_file, config.log_format, config.log_level)
+
+    paths = expand_shard_paths(args.shards)
+    if not paths:
+        raise ValueError("No shard databases found.")
+
+    with DatabaseManager(config.db_name) as db:
+        totals = merge_shards(db, paths)
+    logger.info(f"Merged {len(paths)} shards into {config.db_name}: {totals}")
+
+def run_queue(argv: List[str]):
+    """Splits a target into page-range jobs in a shared job database."""
+    parser = argparse.ArgumentParser(prog="wpspider queue", description="Enqueue crawl jobs for distributed workers")
+    _add_common_args(parser)
+    parser.add_argument("--pages-per-job", type=int, default=10, help="Number of pages per work unit (default: 10)")
+    _add_logging_args(parser)
+    args = parser.parse_args(argv)
+
+    config = Config(args=args)
+    setup_logging(config.log_file, config.log_format, config.log_level)
+
+    with DatabaseManager(config.db_name, timeout=30.0) as db:
+        queue = JobQueue(db)
+        target_id = db.log_target(config.target)
+        crawler = WPCrawler(config.target, **config.crawler_options())
+        count = queue.plan_target(target_id, config.target, config.endpoints, crawler, pages_per_job=args.pages_per_job)
+        logger.info(f"Enqueued {count} jobs for {config.target} in {config.db_name}")
+
+def run_worker(argv: List[str]):
+    """Claims and crawls jobs from a shared job database until stopped."""
+    parser = argparse.ArgumentParser(prog="wpspider worker", description="Process crawl jobs from a shared job database")
+    parser.add_argument("--output", "-o", "--db", "--database", "--db-name", type=str, help="Shared job/output SQLite database file")
+    parser.add_argument("--useragent", "--user-agent", "-u", dest="user_agent", type=str, help="Custom User-Agent string")
+    parser.add_argument("--worker-id", type=str, help="Worker identifier (default: hostname-pid)")
+    parser.add_argument("--lease-seconds", type=float, default=300.0, help="Job lease duration, renewed by each heartbeat (default: 300)")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts before a job is marked failed (default: 3)")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="Seconds to wait when the queue is empty (default: 5)")
+    parser.add_argument("--exit-when-idle", action="store_true", help="Exit once no jobs are available instead of polling")
+    _add_http_args(parser)
+    _add_budget_args(parser)
+    parser.add_argument("--shard", type=str, help="Write crawled data to this shard database instead of the shared one (combine later with 'merge')")
+    _add_logging_args(parser)
+    args = parser.parse_args(argv)
+
+    config = Config(args=args, require_target=False)
+    setup_logging(config.log_file, config.log_format, config.log_level)
+
+    with DatabaseManager(config.db_name, timeout=30.0) as db:
+        queue = JobQueue(db, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+        output_db = DatabaseManager(args.shard) if args.shard else None
+        if output_db:
+            output_db.connect()
+        try:
+            worker = CrawlWorker(queue, worker_id=args.worker_id, crawler_options=config.crawler_options(), poll_interval=args.poll_interval, output_db=output_db)
+            worker.run(exit_when_idle=args.exit_when_idle)
+        finally:
+            if output_db:
+                output_db.close()
+        logger.info(f"Job status: {queue.counts()}")
+
+def run_export(argv: List[str]):
+    """Streams a crawled table to NDJSON, CSV or Parquet."""
+    parser = argparse.ArgumentParser(prog="wpspider export", description="Export a crawled table to NDJSON, CSV or Parquet")
+    parser.add_argument("--output", "-o", "--db", "--database", "--db-name", type=str, help="Source SQLite database file")
+    parser.add_argument("--table", required=True, help="Endpoint table (e.g. posts) or http_requests")
+    parser.add_argument("--out", required=True, help="Destination file, or '-' for stdout (NDJSON/CSV only)")
+    parser.add_argument("--format", "-f", choices=EXPORT_FORMATS, help="Export format (default: inferred from --out extension)")
+    parser.add_argument("--target", dest="target_filter", type=str, help="Only rows for this target id, domain or URL")
+    parser.add_argument("--since", type=str, help="Only rows dated on or after this ISO 8601 date")
+    parser.add_argument("--until", type=str, help="Only rows dated before this ISO 8601 date")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows fetched per chunk (default: 1000)")
+    parser.add_argument("--no-data", dest="include_data", action="store_false", help="Omit the raw JSON columns")
+    _add_logging_args(parser)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("ndjson" if args.out == "-" else infer_format(args.out))
+    if not fmt:
+        raise ValueError("Could not infer export format from --out; pass --format.")
+
+    config = Config(args=args, require_target=False)
+    if args.out != "-":
+        setup_logging(config.log_file, config.log_format, config.log_level)
+
+    with DatabaseManager(config.db_name) as db:
+        exporter = TableExporter(db, args.table, chunk_size=args.chunk_size, include_data=args.include_data)
+        exporter.export(args.out, fmt, target=args.target_filter, since=args.since, until=args.until)
+
+def run_media(argv: List[str]):
+    """Downloads media files for an existing crawl database."""
+    parser = argparse.ArgumentParser(prog="wpspider media", description="Download media files listed in a crawl database")
+    parser.add_argument("--output", "-o", "--db", "--database", "--db-name", type=str, help="Crawl SQLite database file")
+    parser.add_argument("--target-id", type=int, help="Only media from this crawl (targets.id)")
+    _add_media_args(parser)
+    _add_logging_args(parser)
+    args = parser.parse_args(argv)
+
+    config = Config(args=args, require_target=False)
+    setup_logging(config.log_file, config.log_format, config.log_level)
+
+    with DatabaseManager(config.db_name) as db:
+        download_media(config, db, target_id=args.target_id)
+
+def run_refresh(argv: List[str]):
+    """Refetches only objects the sitemap reports as new or changed since the last crawl."""
+    parser = argparse.ArgumentParser(prog="wpspider refresh", description="Refresh a crawl using the WordPress sitemap as a change feed")
+    _add_common_args(parser)
+    _add_http_args(parser)
+    _add_budget_args(parser)
+    parser.add_argument("--sitemap", type=str, help="Sitemap index URL (default: <target>/wp-sitemap.xml)")
+    _add_logging_args(parser)
+    args = parser.parse_args(argv)
+
+    config = Config(args=args)
+    setup_logging(config.log_file, config.log_format, config.log_level)
+    assert config.target
+
+    with DatabaseManager(config.db_name) as db:
+        target_id = db.log_target(config.target)
+        # Refetched items are stored as-is, so _embed would only add raw _embedded blobs
+        crawler = WPCrawler(config.target, **{**config.crawler_options(), "embed": False})
+        prewarm_connections(config, crawler)
+        refresher = SitemapRefresher(crawler, db, target_id, config.target)
+        totals = refresher.run(args.sitemap or sitemap_url(config.target), endpoints=config.endpoints)
+    logger.info(f"Refresh complete. Items refetched: {totals}")
+
+def run_serve(argv: List[str]):
+    """Runs the recrawl scheduler for many targets until interrupted."""
+    parser = argparse.ArgumentParser(prog="wpspider serve", description="Recrawl many targets on a change-rate-aware schedule")
+    parser.add_argument("--targets-file", type=str, help="File listing target URLs (one per line, or a JSON list); defaults to 'targets' in config.json")
+    output_group = parser.add_mutually_exclusive_group()
+    output_group.add_argument("--output", "-o", "--db", "--database", "--db-name", type=str, help="Single database for all targets (default: one per target)")
+    output_group.add_argument("--directory", "-d", "--outdirectory", "--outputdirectory", type=str, help="Directory for per-target databases")
+    parser.add_argument("--useragent", "--user-agent", "-u", dest="user_agent", type=str, help="Custom User-Agent string")
+    _add_http_args(parser)
+    _add_budget_args(parser)
+    parser.add_argument("--workers", "-w", type=int, help="Crawls run in parallel (default: 4)")
+    parser.add_argument("--min-interval", type=float, default=900.0, help="Shortest recrawl interval in seconds (default: 900)")
+    parser.add_argument("--max-interval", type=float, default=7 * 86400.0, help="Longest recrawl interval in seconds (default: 604800)")
+    parser.add_argument("--initial-interval", type=float, default=86400.0, help="Interval for jobs without history in seconds (default: 86400)")
+    _add_logging_args(parser)
+    args = parser.parse_args(argv)
+    if args.targets_file:
+        args.targets = read_targets_file(args.targets_file)
+
+    config = Config(args=args, require_target=False)
+    setup_logging(config.log_file, config.log_format, config.log_level)
+    if not config.targets:
+        raise ValueError("No targets to serve. Provide --targets-file or 'targets' in config.json.")
+
+    scheduler = CrawlScheduler(
+        config,
+        config.targets,
+        workers=args.workers or 4,
+        min_interval=args.min_interval,
+        max_interval=args.max_interval,
+        initial_interval=args.initial_interval,
+    )
+    try:
+        scheduler.serve()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        logger.info("Scheduler interrupted")
+
+COMMANDS = {
+    "queue": run_queue,
+    "worker": run_worker,
+    "merge": run_merge,
+    "export": run_export,
+    "media": run_media,
+    "refresh": run_refresh,
+    "serve": run_serve,
+}
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        try:
+            COMMANDS[argv[0]](argv[1:])
+        except Exception as e:
+            if logger.handlers:
+                logger.critical(f"Unexpected error: {e}")
+                logger.debug(traceback.format_exc())
+            else:
+                print(f"Error: {e}")
+            sys.exit(1)
+        return
+
+    run_crawl(argv)
+
+def run_crawl(argv: List[str]):
+    configured = False
     try:
         # 1. Parse Args
-        args = parse_args()
+        args = parse_args(argv)
         
         # 2. Init Config
         config = Config(args=args)
@@ -32,7 +384,8 @@ def main():
             raise ValueError("Target URL is missing")
         
         # 3. Init Logging
-        logger = setup_logging(config.log_file)
+        setup_logging(config.log_file, config.log_format, config.log_level)
+        configured = True
         
         logger.info("WPSpider Phase 1 Initialization Complete")
         logger.info(f"Target: {config.target}")
@@ -41,44 +394,44 @@ def main():
         
         # 4. Integrate Database & Crawler
         try:
-            with DatabaseManager(config.db_name) as db:
-                # Log the crawl target session
-                target_id = db.log_target(config.target)
-                
-                # Initialize Crawler
-                crawler = WPCrawler(config.target, user_agent=config.user_agent)
-                
-                # 5. Pipeline Orchestration
-                for endpoint in config.endpoints:
-                    logger.info(f"--- Starting Endpoint: {endpoint} ---")
-                    try:
-                        total_items = 0
-                        # Iterate through batches yielded by the crawler
-                        for batch, request_meta in crawler.crawl_endpoint(endpoint):
-                            request_id = db.log_http_request(target_id, endpoint, request_meta)
-                            if batch:
-                                db.save_batch(endpoint, batch, target_id=target_id, request_id=request_id)
-                                total_items += len(batch)
-                                logger.debug(f"Saved {len(batch)} items for {endpoint}. Total so far: {total_items}")
-                        
-                        logger.info(f"--- Finished Endpoint: {endpoint}. Total items: {total_items} ---")
-                        
-                    except Exception as ep_err:
-                        # Error Handling Polish: One failed endpoint doesn't crash the run
-                        logger.error(f"Failed to crawl endpoint '{endpoint}': {ep_err}")
-                        logger.debug(traceback.format_exc())
-                        continue
+            if config.shard_output:
+                target_id = crawl_sharded(config)
+            else:
+                with DatabaseManager(config.db_name) as db:
+                    # Log the crawl target session
+                    target_id = db.log_target(config.target)
+
+                    # Initialize Crawler
+                    crawler = WPCrawler(config.target, **config.crawler_options())
+                    prewarm_connections(config, crawler)
+
+                    # 5. Pipeline Orchestration
+                    for endpoint in config.endpoints:
+                        crawl_endpoint_into_db(crawler, db, target_id, endpoint)
+
+            if target_id:
+                with DatabaseManager(config.db_name) as db:
+                    report_partial_endpoints(db, target_id)
+
+            # 6. Optional media download stage
+            if config.download_media:
+                with DatabaseManager(config.db_name) as db:
+                    download_media(config, db, target_id=target_id)
 
         except Exception as db_err:
             logger.critical(f"Database error or critical failure: {db_err}")
             logger.debug(traceback.format_exc())
             sys.exit(1)
         
+        watchdog = shared_memory_watchdog(config.max_rss)
+        if watchdog:
+            summary = watchdog.summary()
+            logger.info(f"Memory: peak RSS {summary['peak_rss'] // 2**20} MB of {summary['max_rss'] // 2**20} MB, {summary['throttled_fetches']} fetches throttled")
         logger.info("WPSpider Crawl Complete.")
 
     except Exception as e:
         # Fallback provided logger might not be setup if config failed
-        if logger:
+        if configured:
             logger.critical(f"Unexpected error: {e}")
             logger.debug(traceback.format_exc())
         else:
@@ -0,0 +1,315 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator
+from urllib.parse import urlparse, unquote
+
+import requests
+
+from wpspider.codec import loads
+from wpspider.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_COMPLETE = "complete"
+DOWNLOAD_DUPLICATE = "duplicate"
+DOWNLOAD_FAILED = "failed"
+
+# The original upload; WordPress also lists it as media_details.sizes.full
+FULL_SIZE = "full"
+
+
+def default_media_directory(db_name: str) -> str:
+    """Media directory next to the output database (e.g. example.com_media/)."""
+    stem, _ = os.path.splitext(db_name)
+    return f"{stem}_media"
+
+
+def _safe_segment(segment: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9._-]", "_", unquote(segment))
+    return safe.strip(".") or "_"
+
+
+def media_files(item: Dict[str, Any], sizes: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Returns {size name: url} for a media item.
+    With no sizes given only the original file ('full') is selected.
+    """
+    wanted = sizes or [FULL_SIZE]
+    available: Dict[str, str] = {}
+
+    details = item.get("media_details")
+    if isinstance(details, dict) and isinstance(details.get("sizes"), dict):
+        for name, size in details["sizes"].items():
+            if isinstance(size, dict) and isinstance(size.get("source_url"), str):
+                available[name] = size["source_url"]
+
+    if isinstance(item.get("source_url"), str):
+        available[FULL_SIZE] = item["source_url"]
+
+    return {name: available[name] for name in wanted if name in available}
+
+
+class MediaDownloader:
+    """
+    Downloads media files referenced by the media table.
+
+    Files are streamed to disk by a thread pool with a per-host concurrency limit.
+    Partial downloads are kept as .part files (with the ETag or Last-Modified of the first
+    response) and resumed with HTTP Range + If-Range requests, identical files (by SHA-256) are stored once, and results are recorded in the
+    media_downloads table so completed files are skipped on later runs.
+    """
+    def __init__(self, db: DatabaseManager, output_directory: str, workers: int = 4, per_host: int = 2,
+                 sizes: Optional[List[str]] = None, user_agent: Optional[str] = None,
+                 connect_timeout: float = 10.0, read_timeout: float = 60.0, chunk_size: int = 64 * 1024):
+        self.db = db
+        self.output_directory = output_directory
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.sizes = sizes
+        self.user_agent = user_agent or 'WPSpider/1.0 (Nebula Crawler; +https://wpspider.local)'
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_size = chunk_size
+
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_lock = threading.Lock()
+        self._local = threading.local()
+        self._init_downloads_table()
+
+    def _init_downloads_table(self):
+        if not self.db.conn:
+            raise RuntimeError("Database not connected")
+
+        self.db.conn.execute("""
+            CREATE TABLE IF NOT EXISTS media_downloads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                target_id INTEGER,
+                wp_id INTEGER,
+                size TEXT,
+                url TEXT NOT NULL UNIQUE,
+                path TEXT,
+                status TEXT NOT NULL,
+                bytes INTEGER,
+                sha256 TEXT,
+                error TEXT,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self.db.conn.execute("CREATE INDEX IF NOT EXISTS idx_media_downloads_sha256 ON media_downloads (sha256)")
+        self.db.conn.commit()
+
+    def _session(self) -> requests.Session:
+        # Sessions are not shared between threads
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                'User-Agent': self.user_agent,
+                # Byte offsets for Range resume must refer to the stored bytes
+                'Accept-Encoding': 'identity'
+            })
+            self._local.session = session
+        return session
+
+    def _host_limit(self, host: str) -> threading.BoundedSemaphore:
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def local_path(self, url: str) -> str:
+        """Mirrors the URL layout under the output directory: <dir>/<host>/<path>."""
+        parsed = urlparse(url)
+        segments = [_safe_segment(s) for s in parsed.path.split("/") if s]
+        return os.path.join(self.output_directory, _safe_segment(parsed.netloc), *(segments or ["index"]))
+
+    def pending_files(self, target_id: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yields media files that have not been downloaded yet, one per unique URL."""
+        assert self.db.conn is not None
+        if not self.db.existing_table("media"):
+            return
+
+        done = {
+            url for url, path in self.db.conn.execute(
+                "SELECT url, path FROM media_downloads WHERE status IN (?, ?)", (DOWNLOAD_COMPLETE, DOWNLOAD_DUPLICATE)
+            )
+            if path and os.path.exists(path)
+        }
+
+        sql = "SELECT target_id, wp_id, data FROM media"
+        params: List[Any] = []
+        if target_id is not None:
+            sql += " WHERE target_id = ?"
+            params.append(target_id)
+
+        seen = set(done)
+        for row_target_id, wp_id, data in self.db.conn.execute(sql + " ORDER BY id", params):
+            try:
+                item = loads(data)
+            except (TypeError, ValueError):
+                continue
+            for size, url in media_files(item, self.sizes).items():
+                if url in seen:
+                    continue
+                seen.add(url)
+                yield {"target_id": row_target_id, "wp_id": wp_id, "size": size, "url": url}
+
+    @staticmethod
+    def _validator(response: requests.Response) -> Optional[str]:
+        """If-Range validator of a response: a strong ETag, else Last-Modified."""
+        etag = response.headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return response.headers.get('Last-Modified')
+
+    @staticmethod
+    def _content_range(response: requests.Response) -> Optional[Dict[str, Optional[int]]]:
+        """Parses 'bytes start-end/total' or 'bytes */total' into {start, total} (total None for '*')."""
+        match = re.match(r"bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)", response.headers.get('Content-Range', ''))
+        if not match:
+            return None
+        start, total = match.groups()
+        return {"start": int(start) if start is not None else None, "total": int(total) if total != "*" else None}
+
+    def _fetch(self, url: str, part_path: str) -> bool:
+        """
+        Fetches url into part_path, resuming an existing .part file when its validator is known.
+        Returns False when the partial file turned out to be unusable and was discarded
+        (the caller then fetches again from the start).
+        """
+        validator_path = f"{part_path}.validator"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        validator = None
+        if offset and os.path.exists(validator_path):
+            with open(validator_path, "r", encoding="utf-8") as f:
+                validator = f.read().strip() or None
+
+        headers = {}
+        if offset and validator:
+            # If-Range: the server sends the whole file instead of a range if it has changed since
+            headers = {'Range': f'bytes={offset}-', 'If-Range': validator}
+        elif offset:
+            logger.debug(f"No validator for partial {url}; restarting download")
+            offset = 0
+
+        with self._session().get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            content_range = self._content_range(response)
+            if response.status_code == 416 and offset:
+                if content_range and content_range["total"] == offset:
+                    # The .part file already holds the whole file
+                    return True
+                logger.debug(f"Partial {url} does not match the file on the server; restarting download")
+                self._discard(part_path)
+                return False
+
+            response.raise_for_status()
+            if offset and response.status_code == 206:
+                if not content_range or content_range["start"] != offset:
+                    logger.debug(f"Unexpected Content-Range for {url}; restarting download")
+                    self._discard(part_path)
+                    return False
+            elif offset:
+                logger.debug(f"Server sent the whole file for {url} (changed or Range ignored); restarting download")
+                offset = 0
+
+            if not offset:
+                new_validator = self._validator(response)
+                if new_validator:
+                    with open(validator_path, "w", encoding="utf-8") as f:
+                        f.write(new_validator)
+                elif os.path.exists(validator_path):
+                    os.remove(validator_path)
+
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+        return True
+
+    @staticmethod
+    def _discard(part_path: str):
+        for stale in (part_path, f"{part_path}.validator"):
+            if os.path.exists(stale):
+                os.remove(stale)
+
+    def download(self, file: Dict[str, Any]) -> Dict[str, Any]:
+        """Downloads one file (resuming a .part file if present) and returns path, size and hash."""
+        url = file["url"]
+        path = self.local_path(url)
+        part_path = f"{path}.part"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._host_limit(urlparse(url).netloc):
+            if not self._fetch(url, part_path):
+                self._fetch(url, part_path)
+
+        digest = hashlib.sha256()
+        with open(part_path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                digest.update(chunk)
+
+        os.replace(part_path, path)
+        self._discard(part_path)
+        return {"path": path, "bytes": os.path.getsize(path), "sha256": digest.hexdigest()}
+
+    def _record(self, file: Dict[str, Any], status: str, path: Optional[str] = None, size: Optional[int] = None,
+                sha256: Optional[str] = None, error: Optional[str] = None):
+        assert self.db.conn is not None
+        self.db.conn.execute(
+            """
+            INSERT INTO media_downloads (target_id, wp_id, size, url, path, status, bytes, sha256, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                target_id = excluded.target_id, wp_id = excluded.wp_id, size = excluded.size, path = excluded.path,
+                status = excluded.status, bytes = excluded.bytes, sha256 = excluded.sha256, error = excluded.error,
+                updated_at = excluded.updated_at
+            """,
+            (file["target_id"], file["wp_id"], file["size"], file["url"], path, status, size, sha256, error,
+             datetime.now().astimezone().isoformat())
+        )
+        self.db.conn.commit()
+
+    def _store_result(self, file: Dict[str, Any], result: Dict[str, Any]) -> str:
+        assert self.db.conn is not None
+        existing = self.db.conn.execute(
+            "SELECT path FROM media_downloads WHERE sha256 = ? AND status = ? AND url != ? LIMIT 1",
+            (result["sha256"], DOWNLOAD_COMPLETE, file["url"])
+        ).fetchone()
+
+        if existing and existing[0] and os.path.exists(existing[0]) and existing[0] != result["path"]:
+            # Same content already on disk under another URL: keep one copy
+            os.remove(result["path"])
+            self._record(file, DOWNLOAD_DUPLICATE, existing[0], result["bytes"], result["sha256"])
+            return DOWNLOAD_DUPLICATE
+
+        self._record(file, DOWNLOAD_COMPLETE, result["path"], result["bytes"], result["sha256"])
+        return DOWNLOAD_COMPLETE
+
+    def run(self, target_id: Optional[int] = None) -> Dict[str, int]:
+        """Downloads all pending media files. Returns counts per resulting status."""
+        counts: Dict[str, int] = {}
+        files = list(self.pending_files(target_id))
+        if not files:
+            logger.info("No media files to download")
+            return counts
+
+        logger.info(f"Downloading {len(files)} media files to {self.output_directory} ({self.workers} workers, {self.per_host} per host)")
+
+        # Worker threads only do HTTP and file I/O; the database is written from this thread
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.download, file): file for file in files}
+            for future in as_completed(futures):
+                file = futures[future]
+                try:
+                    status = self._store_result(file, future.result())
+                except Exception as e:
+                    logger.warning(f"Failed to download {file['url']}: {e}")
+                    self._record(file, DOWNLOAD_FAILED, self.local_path(file["url"]), error=str(e))
+                    status = DOWNLOAD_FAILED
+                counts[status] = counts.get(status, 0) + 1
+
+        logger.info(f"Media download finished: {counts}")
+        return counts
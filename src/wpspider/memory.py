@@ -0,0 +1,266 @@
+import collections
+import gc
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from wpspider.codec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Optional, more portable RSS source
+try:
+    import psutil
+except ImportError:  # pragma: no cover - depends on the installation
+    psutil = None
+
+# Decoded JSON takes several times the memory of its text
+DECODE_OVERHEAD = 4
+
+# New fetches wait once RSS plus the next page would pass this share of the ceiling
+THROTTLE_RATIO = 0.8
+
+# Share of the ceiling pending batches may hold in memory before they are spilled to disk
+SPILL_RATIO = 0.1
+
+_shared_watchdogs: Dict[int, "MemoryWatchdog"] = {}
+_shared_lock = threading.Lock()
+
+
+def _windows_rss() -> Optional[int]:
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    get_info = ctypes.windll.psapi.GetProcessMemoryInfo
+    get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    if not get_info(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process (psutil, /proc, or the Win32 API), or None if unavailable."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        try:
+            return _windows_rss()
+        except Exception:
+            return None
+    return None
+
+
+class MemorySlot:
+    """One admitted page fetch and the bytes it is holding."""
+    __slots__ = ("bytes",)
+
+    def __init__(self, nbytes: int):
+        self.bytes = nbytes
+
+
+class MemoryWatchdog:
+    """
+    Keeps page fetches of all threads within an RSS ceiling.
+
+    Every fetch holds a slot from acquire() until its batch has been handed on. A new slot is
+    only granted while RSS plus the expected cost of one more page stays below THROTTLE_RATIO
+    of the ceiling, so fetch concurrency shrinks as memory fills up. One fetch is always
+    admitted, so a crawl slows down instead of stalling. Without an RSS source, the bytes of
+    pages in flight are counted instead.
+    """
+    def __init__(self, max_rss: int, sample_interval: float = 0.2, rss: Callable[[], Optional[int]] = rss_bytes):
+        if max_rss <= 0:
+            raise ValueError("max_rss must be positive")
+        self.max_rss = max_rss
+        self.sample_interval = sample_interval
+        self._rss = rss
+        self._sampled: Tuple[float, Optional[int]] = (0.0, None)
+        self.inflight = 0
+        self.inflight_bytes = 0
+        self.average_page_bytes = 0.0
+        self.peak_rss = 0
+        self.throttled = 0
+        self._over_ceiling = False
+        self._cond = threading.Condition()
+
+    def rss(self) -> Optional[int]:
+        """RSS, sampled at most every sample_interval seconds."""
+        now = time.monotonic()
+        sampled_at, value = self._sampled
+        if value is None or now - sampled_at >= self.sample_interval:
+            value = self._rss()
+            self._sampled = (now, value)
+            if value is not None:
+                self.peak_rss = max(self.peak_rss, value)
+        return value
+
+    def usage(self) -> int:
+        rss = self.rss()
+        return rss if rss is not None else self.inflight_bytes
+
+    def under_pressure(self) -> bool:
+        """True when one more page would pass the throttle threshold."""
+        next_page = int(self.average_page_bytes * DECODE_OVERHEAD)
+        return self.usage() + next_page >= self.max_rss * THROTTLE_RATIO
+
+    def acquire(self) -> MemorySlot:
+        """Waits until a page fetch fits in memory and returns its slot."""
+        with self._cond:
+            waited = False
+            while self.inflight and self.under_pressure():
+                waited = True
+                self._cond.wait(self.sample_interval)
+            if waited:
+                self.throttled += 1
+            self._check_ceiling()
+            slot = MemorySlot(int(self.average_page_bytes * DECODE_OVERHEAD))
+            self.inflight += 1
+            self.inflight_bytes += slot.bytes
+            return slot
+
+    def track(self, slot: MemorySlot, nbytes: int):
+        """Replaces a slot's estimate with the decoded size of the page it fetched."""
+        with self._cond:
+            actual = nbytes * DECODE_OVERHEAD
+            self.inflight_bytes += actual - slot.bytes
+            slot.bytes = actual
+            self.average_page_bytes = nbytes if not self.average_page_bytes else 0.8 * self.average_page_bytes + 0.2 * nbytes
+
+    def release(self, slot: MemorySlot):
+        with self._cond:
+            self.inflight -= 1
+            self.inflight_bytes -= slot.bytes
+            self._cond.notify_all()
+
+    def _check_ceiling(self):
+        rss = self.rss()
+        over = rss is not None and rss >= self.max_rss
+        if over and not self._over_ceiling:
+            logger.warning(f"RSS {rss // 2**20} MB is at the {self.max_rss // 2**20} MB ceiling; fetching one page at a time")
+            gc.collect()
+        self._over_ceiling = over
+
+    def summary(self) -> Dict[str, Any]:
+        return {"max_rss": self.max_rss, "peak_rss": self.peak_rss, "throttled_fetches": self.throttled}
+
+
+def shared_memory_watchdog(max_rss: Optional[int]) -> Optional[MemoryWatchdog]:
+    """Process-wide watchdog for a ceiling, so all crawl threads count against one RSS limit."""
+    if not max_rss:
+        return None
+    with _shared_lock:
+        watchdog = _shared_watchdogs.get(max_rss)
+        if watchdog is None:
+            watchdog = _shared_watchdogs[max_rss] = MemoryWatchdog(max_rss)
+        return watchdog
+
+
+class SpillQueue:
+    """
+    Unbounded FIFO for JSON-serializable items that holds at most memory_limit bytes
+    (as measured by size_of) in memory, or less while the watchdog reports pressure.
+    Items beyond that are appended to a temporary file and read back in order, so
+    producers never wait for a slow consumer and never grow memory for it either.
+    """
+    def __init__(self, memory_limit: int, size_of: Callable[[Any], int] = lambda item: 0,
+                 watchdog: Optional[MemoryWatchdog] = None, directory: Optional[str] = None):
+        self.memory_limit = memory_limit
+        self.size_of = size_of
+        self.watchdog = watchdog
+        self.directory = directory
+        self._memory: Deque[Tuple[Any, int]] = collections.deque()
+        self._memory_bytes = 0
+        self._file = None
+        self._read_pos = 0
+        self._write_pos = 0
+        self._spilled = 0
+        self.spilled_total = 0
+        self.spilled_bytes = 0
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._memory) + self._spilled
+
+    def put(self, item: Any, block: bool = True, timeout: Optional[float] = None):
+        """Never blocks; block and timeout exist for queue.Queue compatibility."""
+        size = self.size_of(item)
+        with self._cond:
+            # Once spilling starts, later items follow the earlier ones to disk
+            if self._spilled or (self._memory and (
+                    self._memory_bytes + size > self.memory_limit
+                    or (self.watchdog is not None and self.watchdog.under_pressure()))):
+                self._spill(item)
+            else:
+                self._memory.append((item, size))
+                self._memory_bytes += size
+            self._cond.notify()
+
+    def _spill(self, item: Any):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix="wpspider-spill-", dir=self.directory)
+            logger.info(f"Writer is behind; spilling pending batches to a temporary file in {self.directory or tempfile.gettempdir()}")
+        line = (dumps(item) + "\n").encode("utf-8")
+        self._file.seek(self._write_pos)
+        self._file.write(line)
+        self._write_pos += len(line)
+        self._spilled += 1
+        self.spilled_total += 1
+        self.spilled_bytes += len(line)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._memory or self._spilled, timeout if block else 0):
+                raise queue.Empty
+            if self._memory:
+                item, size = self._memory.popleft()
+                self._memory_bytes -= size
+                return item
+
+            assert self._file is not None
+            self._file.seek(self._read_pos)
+            line = self._file.readline()
+            self._read_pos += len(line)
+            self._spilled -= 1
+            if not self._spilled:
+                # Drained: reuse the file from the start
+                self._file.truncate(0)
+                self._read_pos = self._write_pos = 0
+            return loads(line)
+
+    def close(self):
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._spilled = 0
@@ -0,0 +1,223 @@
+import logging
+import re
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from wpspider.codec import loads
+from wpspider.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Extracted columns of every endpoint table, in Record order
+RECORD_COLUMNS = ("id", "target_id", "request_id", "wp_id", "slug", "link", "title", "date", "crawled_at")
+
+QUERY_OPERATORS = {"=", "!=", "<", "<=", ">", ">=", "like", "in"}
+
+_PATH_PART = re.compile(r"^[A-Za-z_][\w-]*$")
+
+_MISSING = object()
+
+
+def json_path(path: str) -> str:
+    """Converts a dotted field path ('title.rendered', 'meta.0') to an SQLite JSON path ('$.title.rendered', '$.meta[0]')."""
+    if path.startswith("$"):
+        return path
+    parts = []
+    for part in path.split("."):
+        if part.isdigit():
+            parts.append(f"[{part}]")
+        elif _PATH_PART.match(part):
+            parts.append(f".{part}")
+        else:
+            parts.append(f'."{part}"')
+    return "$" + "".join(parts)
+
+
+class Record:
+    """
+    One row of an endpoint table.
+
+    The extracted columns are plain attributes. The JSON in `data` is decoded on first
+    access and cached; `get()` reads selected JSON fields without decoding it at all.
+    """
+    __slots__ = RECORD_COLUMNS + ("_raw", "_data", "_fields")
+
+    def __init__(self, row: tuple, fields: Optional[Tuple[str, ...]] = None):
+        (self.id, self.target_id, self.request_id, self.wp_id, self.slug,
+         self.link, self.title, self.date, self.crawled_at, self._raw) = row[:10]
+        self._data = None
+        self._fields = dict(zip(fields, row[10:])) if fields else None
+
+    @property
+    def data(self) -> Optional[Dict[str, Any]]:
+        """The full stored item, or None when the query did not read `data`."""
+        if self._data is None and self._raw is not None:
+            self._data = loads(self._raw)
+            # The decoded dict replaces the text
+            self._raw = None
+        return self._data
+
+    def get(self, path: str, default: Any = None) -> Any:
+        """
+        Returns a field by dotted path. Fields selected in the query and extracted columns
+        are returned without decoding `data`; other paths are looked up in the decoded item.
+        Note that `title` is the extracted column; use `title.rendered` for the raw object.
+        """
+        if self._fields is not None and path in self._fields:
+            return self._fields[path]
+        if path in RECORD_COLUMNS:
+            return getattr(self, path)
+
+        value: Any = self.data
+        if value is None:
+            return default
+        for part in path.split("."):
+            if isinstance(value, list) and part.isdigit() and int(part) < len(value):
+                value = value[int(part)]
+            elif isinstance(value, dict) and part in value:
+                value = value[part]
+            else:
+                return default
+        return value
+
+    def __getitem__(self, path: str) -> Any:
+        value = self.get(path, _MISSING)
+        if value is _MISSING:
+            raise KeyError(path)
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {name: getattr(self, name) for name in RECORD_COLUMNS}
+        if self._fields:
+            record.update(self._fields)
+        if self._raw is not None or self._data is not None:
+            record["data"] = self.data
+        return record
+
+    def __repr__(self) -> str:
+        return f"Record(table_id={self.id}, wp_id={self.wp_id}, slug={self.slug!r})"
+
+
+class Query:
+    """
+    Lazily iterates an endpoint table as Records.
+
+    Filters on JSON fields are pushed down to SQLite with json_extract(), and select()
+    reads only the named JSON fields instead of the whole `data` column, so scans over
+    large tables neither transfer nor decode JSON the caller never looks at.
+
+        posts = Query(db, "posts").where("status", "publish").where("author", 3).select("categories")
+        for post in posts:
+            print(post.slug, post.get("categories"))
+    """
+    def __init__(self, db: DatabaseManager, endpoint: str, chunk_size: int = 1000):
+        if not db.conn:
+            raise RuntimeError("Database not connected")
+
+        self.db = db
+        table = db.existing_table(endpoint)
+        if not table:
+            raise ValueError(f"Table '{endpoint}' does not exist in {db.db_path}")
+        self.table = table
+        self.chunk_size = max(1, chunk_size)
+        self.columns = {row[1] for row in db.conn.execute(f"PRAGMA table_info({self.table})")}
+
+        self._clauses: List[str] = []
+        self._params: List[Any] = []
+        self._fields: Tuple[str, ...] = ()
+        self._include_data = True
+        self._limit: Optional[int] = None
+
+    def _expression(self, path: str) -> Tuple[str, List[Any]]:
+        """SQL expression for an extracted column or a JSON field of `data`."""
+        if path in RECORD_COLUMNS:
+            return (path if path in self.columns else "NULL"), []
+        return "json_extract(data, ?)", [json_path(path)]
+
+    def where(self, path: str, value: Any, op: str = "=") -> "Query":
+        """
+        Adds a filter on an extracted column or JSON field. `op` is one of =, !=, <, <=, >, >=,
+        like, in (with a list value). `None` with = / != tests for a missing or null field.
+        """
+        op = op.lower()
+        if op not in QUERY_OPERATORS:
+            raise ValueError(f"Unsupported operator '{op}'. Choose one of: {', '.join(sorted(QUERY_OPERATORS))}")
+
+        expr, params = self._expression(path)
+        if value is None and op in ("=", "!="):
+            self._clauses.append(f"{expr} IS {'NOT ' if op == '!=' else ''}NULL")
+        elif op == "in":
+            values = list(value)
+            if not values:
+                self._clauses.append("0")
+                return self
+            self._clauses.append(f"{expr} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        else:
+            self._clauses.append(f"{expr} {op.upper()} ?")
+            params.append(value)
+        self._params.extend(params)
+        return self
+
+    def target(self, target: Any) -> "Query":
+        """Restricts rows to a target id, or to every crawl of a domain or URL."""
+        clause, params = self.db.target_filter(target)
+        self._clauses.append(clause)
+        self._params.extend(params)
+        return self
+
+    def select(self, *paths: str, data: bool = False) -> "Query":
+        """
+        Reads only these JSON fields (available through Record.get) instead of `data`.
+        Objects and arrays come back as JSON text. Pass data=True to read `data` as well.
+        """
+        self._fields = tuple(paths)
+        self._include_data = data
+        return self
+
+    def limit(self, count: int) -> "Query":
+        self._limit = count
+        return self
+
+    def _build(self) -> Tuple[str, List[Any]]:
+        select = [name if name in self.columns else "NULL" for name in RECORD_COLUMNS]
+        select.append("data" if self._include_data else "NULL")
+        params: List[Any] = []
+        for path in self._fields:
+            expr, expr_params = self._expression(path)
+            select.append(expr)
+            params.extend(expr_params)
+
+        sql = f"SELECT {', '.join(select)} FROM {self.table}"
+        if self._clauses:
+            sql += " WHERE " + " AND ".join(self._clauses)
+        sql += " ORDER BY id"
+        params.extend(self._params)
+        if self._limit is not None:
+            sql += " LIMIT ?"
+            params.append(self._limit)
+        return sql, params
+
+    def __iter__(self) -> Iterator[Record]:
+        assert self.db.conn is not None
+        sql, params = self._build()
+        logger.debug(f"Query: {sql} {params}")
+        fields = self._fields or None
+        cursor = self.db.conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield Record(row, fields)
+
+    def count(self) -> int:
+        """Number of matching rows, counted in SQLite."""
+        assert self.db.conn is not None
+        sql = f"SELECT COUNT(*) FROM {self.table}"
+        if self._clauses:
+            sql += " WHERE " + " AND ".join(self._clauses)
+        count = self.db.conn.execute(sql, self._params).fetchone()[0]
+        return min(count, self._limit) if self._limit is not None else count
+
+    def first(self) -> Optional[Record]:
+        return next(iter(self), None)
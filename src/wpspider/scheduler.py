@@ -0,0 +1,284 @@
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import List, Dict, Any, Set, Tuple
+from urllib.parse import urlparse
+
+from wpspider.budget import RUN_COMPLETE
+from wpspider.config import Config
+from wpspider.crawler import WPCrawler
+from wpspider.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Weight of the latest run in the smoothed change rate
+CHANGE_RATE_SMOOTHING = 0.3
+
+# Interval growth factor while a job keeps finding nothing new
+IDLE_BACKOFF = 1.5
+
+
+def next_interval(change_rate: float, previous_interval: float, changes: int, min_interval: float, max_interval: float) -> float:
+    """
+    Picks the recrawl interval for a job from its smoothed change rate (changes per hour).
+    Jobs are revisited about once per expected change; jobs that found nothing back off
+    gradually so one quiet run doesn't throw away what was learned.
+    """
+    if changes == 0:
+        interval = previous_interval * IDLE_BACKOFF
+        if change_rate > 0:
+            interval = min(interval, 3600.0 / change_rate)
+    elif change_rate > 0:
+        interval = 3600.0 / change_rate
+    else:
+        interval = previous_interval
+    return max(min_interval, min(max_interval, interval))
+
+
+class CrawlScheduler:
+    """
+    Long-running scheduler for recurring crawls of many (target, endpoint) jobs.
+
+    Jobs sit in a priority queue ordered by their next due time. After each run the
+    number of new or changed items is folded into a smoothed change rate, stored in
+    the crawl_schedule table of the target's database, which sets the next interval.
+    When more jobs are due than there are workers, the fastest-changing jobs run first.
+    """
+    def __init__(self, config: Config, targets: List[str], workers: int = 4, min_interval: float = 900.0,
+                 max_interval: float = 7 * 86400.0, initial_interval: float = 86400.0):
+        self.config = config
+        self.targets = [Config._normalize_target(t) for t in targets if t.strip()]
+        self.workers = max(1, workers)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+
+        self._queue: List[Tuple[float, float, int, str, str]] = []
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+
+    def db_path_for(self, target: str) -> str:
+        """All targets share --output when given, otherwise each gets its own database."""
+        if self.config.db_name:
+            return self.config.db_name
+        return Config._derive_output_path(target, self.config.output_directory)
+
+    @staticmethod
+    def _init_schedule_table(db: DatabaseManager):
+        assert db.conn is not None
+        db.conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_schedule (
+                target_url TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                interval_seconds REAL NOT NULL,
+                change_rate REAL NOT NULL DEFAULT 0,
+                last_run_at REAL,
+                next_run_at REAL NOT NULL,
+                last_items INTEGER,
+                last_changes INTEGER,
+                runs INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (target_url, endpoint)
+            )
+        """)
+        db.conn.commit()
+
+    def load_state(self, db: DatabaseManager, target: str, endpoint: str) -> Dict[str, Any]:
+        """
+        Returns the stored schedule for a job, or a fresh one due now.
+        A fresh job whose endpoint was crawled before (per targets/http_requests) treats
+        that crawl as its previous run, so its first scheduled run already yields a change rate.
+        """
+        assert db.conn is not None
+        self._init_schedule_table(db)
+        row = db.conn.execute(
+            """
+            SELECT interval_seconds, change_rate, last_run_at, next_run_at, runs
+            FROM crawl_schedule WHERE target_url = ? AND endpoint = ?
+            """,
+            (target, endpoint)
+        ).fetchone()
+        if row is None:
+            previous = db.conn.execute(
+                """
+                SELECT MAX(t.date_crawled) FROM http_requests r
+                JOIN targets t ON t.id = r.target_id
+                WHERE t.domain = ? AND r.endpoint = ?
+                """,
+                (urlparse(target).netloc, endpoint)
+            ).fetchone()[0]
+            last_run_at = None
+            if previous:
+                try:
+                    last_run_at = datetime.fromisoformat(previous).timestamp()
+                except ValueError:
+                    pass
+            return {
+                "interval": self.initial_interval,
+                "change_rate": 0.0,
+                "last_run_at": last_run_at,
+                "next_run_at": time.time(),
+                "runs": 1 if last_run_at is not None else 0,
+            }
+        return {"interval": row[0], "change_rate": row[1], "last_run_at": row[2], "next_run_at": row[3], "runs": row[4]}
+
+    def _save_state(self, db: DatabaseManager, target: str, endpoint: str, state: Dict[str, Any], items: int, changes: int):
+        assert db.conn is not None
+        db.conn.execute(
+            """
+            INSERT INTO crawl_schedule (target_url, endpoint, interval_seconds, change_rate, last_run_at, next_run_at, last_items, last_changes, runs)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(target_url, endpoint) DO UPDATE SET
+                interval_seconds = excluded.interval_seconds, change_rate = excluded.change_rate,
+                last_run_at = excluded.last_run_at, next_run_at = excluded.next_run_at,
+                last_items = excluded.last_items, last_changes = excluded.last_changes, runs = excluded.runs
+            """,
+            (target, endpoint, state["interval"], state["change_rate"], state["last_run_at"], state["next_run_at"], items, changes, state["runs"])
+        )
+        db.conn.commit()
+
+    @staticmethod
+    def _version(item: Dict[str, Any]) -> Tuple[Any, Any]:
+        return item.get('id'), item.get('modified_gmt') or item.get('date_gmt') or item.get('date')
+
+    @staticmethod
+    def known_versions(db: DatabaseManager, endpoint: str, domain: str) -> Set[Tuple[Any, Any]]:
+        """(wp_id, modified) pairs already stored for this domain, to tell new or changed items apart."""
+        assert db.conn is not None
+        table = db.existing_table(endpoint)
+        if not table:
+            return set()
+        cursor = db.conn.execute(
+            f"""
+            SELECT DISTINCT wp_id, COALESCE(json_extract(data, '$.modified_gmt'), json_extract(data, '$.date_gmt'), date)
+            FROM {table}
+            WHERE target_id IN (SELECT id FROM targets WHERE domain = ?)
+            """,
+            (domain,)
+        )
+        return {(wp_id, modified) for wp_id, modified in cursor}
+
+    def run_job(self, target: str, endpoint: str) -> Dict[str, Any]:
+        """Crawls one endpoint of one target, updates its learned schedule and returns the new state."""
+        with DatabaseManager(self.db_path_for(target), timeout=30.0) as db:
+            state = self.load_state(db, target, endpoint)
+            known = self.known_versions(db, endpoint, urlparse(target).netloc)
+
+            target_id = db.log_target(target)
+            # Recrawled items are stored as-is, so _embed would only add raw _embedded blobs
+            crawler = WPCrawler(target, **{**self.config.crawler_options(), "embed": False})
+            items = 0
+            changes = 0
+            for batch, request_meta in crawler.crawl_endpoint(endpoint):
+                request_id = db.log_http_request(target_id, endpoint, request_meta)
+                if batch:
+                    # Only new versions are stored, so the table holds one row per (wp_id, modified)
+                    changed = [item for item in batch if self._version(item) not in known]
+                    known.update(self._version(item) for item in changed)
+                    db.save_batch(endpoint, changed, target_id=target_id, request_id=request_id)
+                    changes += len(changed)
+                    items += len(batch)
+
+            run = crawler.endpoint_runs.get(endpoint)
+            if run:
+                db.log_endpoint_run(target_id, endpoint, run)
+            # A run cut short by its budget or an error that found nothing proves nothing about the rest
+            partial = bool(run) and run["status"] != RUN_COMPLETE and changes == 0
+
+            now = time.time()
+            if partial:
+                logger.warning(f"Scheduled crawl {target} {endpoint} ended early ({run['status']}: {run['reason']}); keeping its schedule")
+                state["next_run_at"] = now + state["interval"]
+                self._save_state(db, target, endpoint, state, items, changes)
+                return state
+
+            if state["last_run_at"] is not None and state["runs"] > 0:
+                hours = max((now - state["last_run_at"]) / 3600.0, 1e-6)
+                observed = changes / hours
+                state["change_rate"] = CHANGE_RATE_SMOOTHING * observed + (1 - CHANGE_RATE_SMOOTHING) * state["change_rate"]
+                state["interval"] = next_interval(state["change_rate"], state["interval"], changes, self.min_interval, self.max_interval)
+            # The first run only establishes a baseline; every item is 'new'
+
+            state["last_run_at"] = now
+            state["next_run_at"] = now + state["interval"]
+            state["runs"] += 1
+            self._save_state(db, target, endpoint, state, items, changes)
+
+        logger.info(
+            f"Scheduled crawl {target} {endpoint}: {items} items, {changes} new or changed, "
+            f"rate {state['change_rate']:.2f}/h, next in {state['interval'] / 60:.0f} min"
+        )
+        return state
+
+    def _push(self, next_run_at: float, change_rate: float, target: str, endpoint: str):
+        heapq.heappush(self._queue, (next_run_at, -change_rate, next(self._counter), target, endpoint))
+
+    def load_jobs(self):
+        """Fills the queue from the stored schedules of every configured (target, endpoint) job."""
+        self._queue = []
+        for target in self.targets:
+            with DatabaseManager(self.db_path_for(target), timeout=30.0) as db:
+                for endpoint in self.config.endpoints:
+                    state = self.load_state(db, target, endpoint)
+                    self._push(state["next_run_at"], state["change_rate"], target, endpoint)
+        logger.info(f"Scheduler loaded {len(self._queue)} jobs for {len(self.targets)} targets")
+
+    def stop(self):
+        self._stop.set()
+
+    def serve(self, poll_interval: float = 30.0):
+        """Runs due jobs on a worker pool until stop() is called."""
+        self.load_jobs()
+        running: Dict[Future, Tuple[str, str, float]] = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while not self._stop.is_set():
+                now = time.time()
+
+                # Collect every due job; the busiest ones get the free workers first
+                due: List[Tuple[float, float, int, str, str]] = []
+                while self._queue and self._queue[0][0] <= now:
+                    due.append(heapq.heappop(self._queue))
+                due.sort(key=lambda entry: entry[1])
+
+                for entry in due:
+                    _, negative_rate, _, target, endpoint = entry
+                    if len(running) < self.workers:
+                        future = pool.submit(self.run_job, target, endpoint)
+                        running[future] = (target, endpoint, -negative_rate)
+                    else:
+                        heapq.heappush(self._queue, entry)
+
+                timeout = poll_interval
+                if self._queue and len(running) < self.workers:
+                    timeout = max(0.0, min(poll_interval, self._queue[0][0] - now))
+
+                if running:
+                    finished, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    finished = set()
+                    self._stop.wait(timeout)
+
+                for future in finished:
+                    target, endpoint, change_rate = running.pop(future)
+                    try:
+                        state = future.result()
+                        self._push(state["next_run_at"], state["change_rate"], target, endpoint)
+                    except Exception as e:
+                        logger.error(f"Scheduled crawl {target} {endpoint} failed: {e}")
+                        self._push(time.time() + self.min_interval, change_rate, target, endpoint)
+
+            logger.info("Scheduler stopping; waiting for running crawls to finish")
+
+
+def read_targets_file(path: str) -> List[str]:
+    """Reads targets from a text file (one per line, # comments) or a JSON list."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if content.lstrip().startswith("["):
+        return [str(t) for t in json.loads(content)]
+    return [line.strip() for line in content.splitlines() if line.strip() and not line.strip().startswith("#")]
@@ -0,0 +1,158 @@
+import os
+import glob
+import logging
+from typing import List, Dict, Iterable
+
+from wpspider.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Tables that are bookkeeping rather than endpoint data
+# (media_downloads records files on this machine's disk, so it is not merged either)
+METADATA_TABLES = {"targets", "http_requests", "endpoint_runs", "crawl_jobs", "crawl_schedule", "media_downloads", "sqlite_sequence"}
+
+
+def shard_directory(db_name: str) -> str:
+    """Directory holding the shard files for an output database (e.g. site.sqlite.shards/)."""
+    return f"{db_name}.shards"
+
+
+def shard_path(db_name: str, name: str) -> str:
+    """Path of the shard file for one endpoint or worker."""
+    safe_name = "".join(c for c in name if c.isalnum() or c in "_-.") or "shard"
+    return os.path.join(shard_directory(db_name), f"{safe_name}.sqlite")
+
+
+def expand_shard_paths(paths: Iterable[str]) -> List[str]:
+    """Expands directories into the .sqlite files they contain."""
+    expanded: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(sorted(glob.glob(os.path.join(path, "*.sqlite"))))
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def _columns(db: DatabaseManager, schema: str, table: str) -> List[str]:
+    assert db.conn is not None
+    return [row[1] for row in db.conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+
+def merge_shards(db: DatabaseManager, shard_paths: Iterable[str]) -> Dict[str, int]:
+    """
+    Merges shard databases into db using ATTACH and bulk INSERT ... SELECT.
+
+    Targets are matched on (url, date_crawled) so shards of the same crawl share one
+    targets row; http_requests ids are offset past the existing rows, and target_id /
+    request_id in every table are rewritten to the merged ids.
+    Returns the number of rows merged per table.
+    """
+    if not db.conn:
+        raise RuntimeError("Database not connected")
+
+    conn = db.conn
+    totals: Dict[str, int] = {}
+
+    for path in shard_paths:
+        if os.path.abspath(path) == os.path.abspath(db.db_path):
+            logger.warning(f"Skipping shard {path}: it is the merge destination")
+            continue
+
+        conn.commit()
+        conn.execute("ATTACH DATABASE ? AS shard", (path,))
+        try:
+            shard_tables = [row[0] for row in conn.execute(
+                "SELECT name FROM shard.sqlite_master WHERE type = 'table'"
+            ).fetchall()]
+            endpoint_tables = [t for t in shard_tables if t not in METADATA_TABLES and not t.startswith("sqlite_")]
+
+            # Create destination tables up front; ensure_endpoint_table commits
+            for table in endpoint_tables:
+                db.ensure_endpoint_table(table)
+
+            # 1. Targets: reuse rows of the same crawl, otherwise insert
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS target_map (old_id INTEGER PRIMARY KEY, new_id INTEGER)")
+            conn.execute("DELETE FROM target_map")
+            if "targets" in shard_tables:
+                for old_id, url, domain, date_crawled in conn.execute(
+                    "SELECT id, url, domain, date_crawled FROM shard.targets"
+                ).fetchall():
+                    existing = conn.execute(
+                        "SELECT id FROM main.targets WHERE url = ? AND date_crawled = ? ORDER BY id LIMIT 1",
+                        (url, date_crawled)
+                    ).fetchone()
+                    if existing:
+                        new_id = existing[0]
+                    else:
+                        new_id = conn.execute(
+                            "INSERT INTO main.targets (url, domain, date_crawled) VALUES (?, ?, ?)",
+                            (url, domain, date_crawled)
+                        ).lastrowid
+                    conn.execute("INSERT INTO target_map (old_id, new_id) VALUES (?, ?)", (old_id, new_id))
+
+            # 2. HTTP requests: shift ids past the current maximum
+            offset = conn.execute("SELECT COALESCE(MAX(id), 0) FROM main.http_requests").fetchone()[0]
+            if "http_requests" in shard_tables:
+                shard_cols = set(_columns(db, "shard", "http_requests"))
+                cols = [c for c in _columns(db, "main", "http_requests") if c in shard_cols]
+                select = [
+                    "s.id + ?" if c == "id" else "m.new_id" if c == "target_id" else f"s.{c}"
+                    for c in cols
+                ]
+                cursor = conn.execute(
+                    f"""
+                    INSERT INTO main.http_requests ({', '.join(cols)})
+                    SELECT {', '.join(select)} FROM shard.http_requests s
+                    LEFT JOIN target_map m ON m.old_id = s.target_id
+                    ORDER BY s.id
+                    """,
+                    (offset,)
+                )
+                totals["http_requests"] = totals.get("http_requests", 0) + cursor.rowcount
+
+            # 3. Endpoint run outcomes
+            if "endpoint_runs" in shard_tables:
+                shard_cols = set(_columns(db, "shard", "endpoint_runs"))
+                cols = [c for c in _columns(db, "main", "endpoint_runs") if c in shard_cols and c != "id"]
+                select = ["m.new_id" if c == "target_id" else f"s.{c}" for c in cols]
+                cursor = conn.execute(
+                    f"""
+                    INSERT INTO main.endpoint_runs ({', '.join(cols)})
+                    SELECT {', '.join(select)} FROM shard.endpoint_runs s
+                    LEFT JOIN target_map m ON m.old_id = s.target_id
+                    ORDER BY s.id
+                    """
+                )
+                if cursor.rowcount:
+                    totals["endpoint_runs"] = totals.get("endpoint_runs", 0) + cursor.rowcount
+
+            # 4. Endpoint tables
+            for table in endpoint_tables:
+                shard_cols = set(_columns(db, "shard", table))
+                cols = [c for c in _columns(db, "main", table) if c in shard_cols and c != "id"]
+                select = [
+                    "m.new_id" if c == "target_id" else "s.request_id + ?" if c == "request_id" else f"s.{c}"
+                    for c in cols
+                ]
+                params = (offset,) if "request_id" in cols else ()
+                cursor = conn.execute(
+                    f"""
+                    INSERT INTO main.{table} ({', '.join(cols)})
+                    SELECT {', '.join(select)} FROM shard.{table} s
+                    LEFT JOIN target_map m ON m.old_id = s.target_id
+                    ORDER BY s.id
+                    """,
+                    params
+                )
+                totals[table] = totals.get(table, 0) + cursor.rowcount
+
+            conn.commit()
+            logger.info(f"Merged shard {path}")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE shard")
+
+    return totals
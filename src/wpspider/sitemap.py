@@ -0,0 +1,212 @@
+import logging
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from urllib.parse import urlparse, parse_qs, unquote
+
+import requests
+
+from wpspider.crawler import WPCrawler, TAXONOMY_ENDPOINTS, TYPE_ENDPOINTS
+from wpspider.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+# REST include= and slug= accept at most per_page (100) values per request
+REFETCH_BATCH_SIZE = 100
+
+# wp-sitemap-posts-post-1.xml, wp-sitemap-taxonomies-category-1.xml, wp-sitemap-users-1.xml
+_SITEMAP_NAME = re.compile(r"wp-sitemap-(?:posts-(?P<type>[\w-]+?)|taxonomies-(?P<taxonomy>[\w-]+?)|(?P<users>users))-\d+\.xml$")
+
+# Query-string permalinks (?p=123) carry the object id directly
+_ID_QUERY_PARAMS = ("p", "page_id", "attachment_id")
+
+
+def sitemap_url(target: str) -> str:
+    """Core sitemap index for a target URL or API root."""
+    root = target.split("/wp-json")[0].rstrip("/")
+    return f"{root}/wp-sitemap.xml"
+
+
+def sitemap_endpoint(url: str) -> Optional[str]:
+    """Maps a WordPress core sub-sitemap URL to the endpoint table holding its objects."""
+    match = _SITEMAP_NAME.search(urlparse(url).path)
+    if not match:
+        return None
+    if match.group("users"):
+        return "users"
+    if match.group("type"):
+        return TYPE_ENDPOINTS.get(match.group("type"), match.group("type"))
+    taxonomy = match.group("taxonomy")
+    return TAXONOMY_ENDPOINTS.get(taxonomy, taxonomy)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parses a W3C / WordPress GMT timestamp; naive values are taken as UTC."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _normalize_link(link: str) -> str:
+    return link.strip().rstrip("/")
+
+
+def iter_sitemap(session: requests.Session, url: str, timeout: Any = 10, endpoint: Optional[str] = None,
+                 endpoints: Optional[List[str]] = None) -> Iterator[Tuple[Optional[str], str, Optional[str]]]:
+    """
+    Stream-parses a sitemap or sitemap index, yielding (endpoint, loc, lastmod) for every URL.
+    Sub-sitemaps of an index are fetched one after another, and only for the given endpoints;
+    elements are cleared as they are consumed so memory does not grow with sitemap size.
+    The endpoint of a core sub-sitemap passed directly is taken from its name.
+    """
+    if endpoint is None:
+        endpoint = sitemap_endpoint(url)
+    children: List[str] = []
+    unmapped_urls = 0
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+
+        for _, elem in ET.iterparse(response.raw, events=("end",)):
+            if elem.tag == f"{SITEMAP_NS}url":
+                loc = elem.findtext(f"{SITEMAP_NS}loc")
+                if loc:
+                    if endpoint is None:
+                        unmapped_urls += 1
+                    yield endpoint, loc.strip(), elem.findtext(f"{SITEMAP_NS}lastmod")
+                elem.clear()
+            elif elem.tag == f"{SITEMAP_NS}sitemap":
+                loc = elem.findtext(f"{SITEMAP_NS}loc")
+                if loc:
+                    children.append(loc.strip())
+                elem.clear()
+
+    if unmapped_urls:
+        logger.warning(f"Sitemap {url} is not a WordPress core sub-sitemap; its {unmapped_urls} URLs cannot be mapped to endpoints")
+
+    recognized = [child for child in children if sitemap_endpoint(child) is not None]
+    if children and not recognized:
+        logger.warning(
+            f"Sitemap index {url} lists no WordPress core sub-sitemaps (wp-sitemap-*.xml); "
+            f"plugin sitemaps such as Yoast's post-sitemap.xml are not supported"
+        )
+
+    for child in children:
+        child_endpoint = sitemap_endpoint(child)
+        if child_endpoint is None:
+            logger.debug(f"Skipping sitemap with unknown object type: {child}")
+            continue
+        if endpoints and child_endpoint not in endpoints:
+            logger.debug(f"Skipping sitemap of unselected endpoint {child_endpoint}: {child}")
+            continue
+        yield from iter_sitemap(session, child, timeout=timeout, endpoint=child_endpoint, endpoints=endpoints)
+
+
+class SitemapRefresher:
+    """
+    Refreshes a previously crawled target using the core sitemap as a change feed.
+
+    Sitemap URLs are compared with the stored link and modified date of each object.
+    Changed objects are refetched by id with include=, and new ones by slug with slug=,
+    in batches of up to 100, so a refresh costs a few requests per hundred changes
+    instead of paging every endpoint.
+    """
+    def __init__(self, crawler: WPCrawler, db: DatabaseManager, target_id: int, target_url: str):
+        self.crawler = crawler
+        self.db = db
+        self.target_id = target_id
+        self.domain = urlparse(target_url).netloc
+
+    def stored_objects(self, endpoint: str) -> Dict[str, Tuple[Optional[int], Optional[datetime]]]:
+        """Returns {link: (wp_id, modified)} of the latest stored copy of each object for this domain."""
+        assert self.db.conn is not None
+        table = self.db.existing_table(endpoint)
+        if not table:
+            return {}
+
+        stored: Dict[str, Tuple[Optional[int], Optional[datetime]]] = {}
+        cursor = self.db.conn.execute(
+            f"""
+            SELECT link, wp_id, COALESCE(json_extract(data, '$.modified_gmt'), date)
+            FROM {table}
+            WHERE link IS NOT NULL AND target_id IN (SELECT id FROM targets WHERE domain = ?)
+            ORDER BY id
+            """,
+            (self.domain,)
+        )
+        # Later rows are newer crawls and overwrite older ones
+        for link, wp_id, modified in cursor:
+            stored[_normalize_link(link)] = (wp_id, parse_timestamp(modified))
+        return stored
+
+    def find_changes(self, sitemap: str, endpoints: Optional[List[str]] = None) -> Dict[str, Dict[str, List[Any]]]:
+        """Returns {endpoint: {'ids': [...], 'slugs': [...]}} of objects to refetch, limited to endpoints if given."""
+        changes: Dict[str, Dict[str, List[Any]]] = {}
+        stored_by_endpoint: Dict[str, Dict[str, Tuple[Optional[int], Optional[datetime]]]] = {}
+        counts: Dict[str, int] = {}
+
+        for endpoint, loc, lastmod in iter_sitemap(self.crawler.session, sitemap, timeout=self.crawler.timeout, endpoints=endpoints):
+            if endpoint is None or (endpoints and endpoint not in endpoints):
+                continue
+            if endpoint not in stored_by_endpoint:
+                stored_by_endpoint[endpoint] = self.stored_objects(endpoint)
+            counts[endpoint] = counts.get(endpoint, 0) + 1
+
+            bucket = changes.setdefault(endpoint, {"ids": [], "slugs": []})
+            existing = stored_by_endpoint[endpoint].get(_normalize_link(loc))
+            if existing is not None:
+                wp_id, stored_modified = existing
+                modified = parse_timestamp(lastmod)
+                if modified and wp_id is not None and (stored_modified is None or modified > stored_modified):
+                    bucket["ids"].append(wp_id)
+                continue
+
+            # Not stored yet: identify it by id (?p=123) or by the permalink slug
+            parsed = urlparse(loc)
+            query = parse_qs(parsed.query)
+            query_id = next((query[p][0] for p in _ID_QUERY_PARAMS if p in query and query[p][0].isdigit()), None)
+            if query_id:
+                bucket["ids"].append(int(query_id))
+                continue
+            segments = [s for s in parsed.path.split("/") if s]
+            if segments:
+                bucket["slugs"].append(unquote(segments[-1]))
+
+        for endpoint, bucket in changes.items():
+            logger.info(f"Sitemap {endpoint}: {counts.get(endpoint, 0)} URLs, {len(bucket['ids'])} changed, {len(bucket['slugs'])} new")
+        return changes
+
+    def refetch(self, endpoint: str, param: str, values: List[Any]) -> int:
+        """Fetches objects in batches of REFETCH_BATCH_SIZE using include= or slug=, and saves them."""
+        total_items = 0
+        unique = list(dict.fromkeys(values))
+        for start in range(0, len(unique), REFETCH_BATCH_SIZE):
+            chunk = unique[start:start + REFETCH_BATCH_SIZE]
+            extra_params = {param: ",".join(str(v) for v in chunk)}
+            for batch, request_meta in self.crawler.crawl_endpoint(endpoint, extra_params=extra_params):
+                request_id = self.db.log_http_request(self.target_id, endpoint, request_meta)
+                if batch:
+                    self.db.save_batch(endpoint, batch, target_id=self.target_id, request_id=request_id)
+                    total_items += len(batch)
+        return total_items
+
+    def run(self, sitemap: str, endpoints: Optional[List[str]] = None) -> Dict[str, int]:
+        """Refreshes changed and new objects. Returns items refetched per endpoint."""
+        totals: Dict[str, int] = {}
+        for endpoint, bucket in self.find_changes(sitemap, endpoints).items():
+            items = 0
+            if bucket["ids"]:
+                items += self.refetch(endpoint, "include", bucket["ids"])
+            if bucket["slugs"]:
+                items += self.refetch(endpoint, "slug", bucket["slugs"])
+            totals[endpoint] = items
+        return totals
@@ -0,0 +1,211 @@
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import DEFAULT_POOLBLOCK, HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util import connection as urllib3_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DNS_TTL = 300.0
+
+_adapters: Dict[Tuple[int, int, float], "CachedDnsAdapter"] = {}
+_adapters_lock = threading.Lock()
+
+
+class DnsCache:
+    """
+    In-process cache of getaddrinfo() results with a fixed TTL.
+    Only successful lookups are cached; an address that refuses connections is evicted.
+    """
+    def __init__(self, ttl: float = DEFAULT_DNS_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[Any]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host: str, port: int) -> List[Any]:
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        family = urllib3_connection.allowed_gai_family()
+        results = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, results)
+        return results
+
+    def evict(self, host: str, port: int):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _CachedDnsConnectionMixin:
+    """Resolves the connection's host through its pool's DnsCache instead of getaddrinfo()."""
+    dns_cache: Optional[DnsCache] = None
+
+    def _new_conn(self):
+        cache = self.dns_cache
+        dns_host = self._dns_host
+        host = dns_host.strip("[]") if dns_host else dns_host
+        if cache is None or not host:
+            return super()._new_conn()
+        try:
+            results = cache.resolve(host, self.port)
+        except socket.gaierror:
+            return super()._new_conn()
+
+        error: Optional[Exception] = None
+        try:
+            for _family, _type, _proto, _name, sockaddr in results:
+                # An IP literal needs no further resolution. _dns_host is restored before
+                # connect() reads self.host, so TLS still uses the original host name.
+                self._dns_host = sockaddr[0]
+                try:
+                    return super()._new_conn()
+                except ConnectTimeoutError as e:  # Also NewConnectionError
+                    error = e
+        finally:
+            self._dns_host = dns_host
+        cache.evict(host, self.port)
+        if error is not None:
+            raise error
+        raise OSError(f"getaddrinfo returned no addresses for {host}")
+
+
+class CachedHTTPConnection(_CachedDnsConnectionMixin, HTTPConnection):
+    pass
+
+
+class CachedHTTPSConnection(_CachedDnsConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CachedDnsPoolMixin:
+    dns_cache: Optional[DnsCache] = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.dns_cache = self.dns_cache
+        return conn
+
+
+class CachedHTTPConnectionPool(_CachedDnsPoolMixin, HTTPConnectionPool):
+    ConnectionCls = CachedHTTPConnection
+
+
+class CachedHTTPSConnectionPool(_CachedDnsPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = CachedHTTPSConnection
+
+
+class CachedDnsPoolManager(PoolManager):
+    """PoolManager whose pools resolve hosts through one DnsCache; nothing outside it is affected."""
+    def __init__(self, *args, dns_cache: Optional[DnsCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+        self.pool_classes_by_scheme = {"http": CachedHTTPConnectionPool, "https": CachedHTTPSConnectionPool}
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.dns_cache = self.dns_cache
+        return pool
+
+
+class CachedDnsAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools share a DnsCache (None disables it)."""
+    def __init__(self, dns_cache: Optional[DnsCache] = None, **kwargs):
+        # Set before HTTPAdapter.__init__, which builds the pool manager
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = CachedDnsPoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, dns_cache=self.dns_cache, **pool_kwargs
+        )
+
+
+def shared_adapter(pool_connections: int = 10, pool_maxsize: int = 10, dns_cache_ttl: float = DEFAULT_DNS_TTL) -> CachedDnsAdapter:
+    """
+    Process-wide HTTPAdapter for a pool size and DNS TTL. Sessions that mount it share its
+    keep-alive pools and host lookups, so later crawlers (other endpoints, shards, scheduled
+    jobs) reuse connections whose TCP and TLS handshakes are already done. Lookups are cached
+    for dns_cache_ttl seconds (<= 0 disables the cache). Sessions using it must not be closed.
+    """
+    key = (pool_connections, pool_maxsize, dns_cache_ttl)
+    with _adapters_lock:
+        adapter = _adapters.get(key)
+        if adapter is None:
+            # Retries are handled by the crawl loop
+            adapter = CachedDnsAdapter(
+                dns_cache=DnsCache(dns_cache_ttl) if dns_cache_ttl > 0 else None,
+                pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0
+            )
+            _adapters[key] = adapter
+        return adapter
+
+
+def _connection_pool(session: requests.Session, url: str):
+    """
+    The pool session requests to url go through. The pool key includes the effective
+    TLS settings (e.g. a CA bundle from REQUESTS_CA_BUNDLE), so they are merged the same way.
+    """
+    settings = session.merge_environment_settings(url, {}, None, session.verify, session.cert)
+    adapter = session.get_adapter(url)
+    if hasattr(adapter, "get_connection_with_tls_context"):
+        request = requests.Request("GET", url).prepare()
+        return adapter.get_connection_with_tls_context(request, settings["verify"], settings["proxies"], settings["cert"])
+    return adapter.get_connection(url, settings["proxies"])
+
+
+def prewarm(session: requests.Session, url: str, connections: int = 1) -> int:
+    """
+    Opens up to `connections` keep-alive connections (DNS, TCP and TLS) to the host of url
+    in parallel and parks them in the pool session requests will use. Connections the shared
+    pool already holds open are kept and counted. Returns the number of open connections.
+    """
+    if connections < 1:
+        return 0
+    pool = _connection_pool(session, url)
+    count = min(connections, pool.pool.maxsize if pool.pool is not None else connections)
+    conns = [pool._get_conn() for _ in range(count)]
+    # Reconnecting an open connection would replace its socket without closing it
+    idle = [conn for conn in conns if not conn.is_connected]
+    already_open = count - len(idle)
+
+    def connect(conn) -> bool:
+        try:
+            conn.connect()
+            return True
+        except Exception as e:
+            logger.debug(f"Pre-warm connection to {url} failed: {e}")
+            return False
+
+    opened = 0
+    if idle:
+        with ThreadPoolExecutor(max_workers=len(idle)) as executor:
+            opened = sum(executor.map(connect, idle))
+    for conn in conns:
+        pool._put_conn(conn)
+    logger.debug(f"Pre-warmed {opened} connections to {pool.host} ({already_open} already open)")
+    return opened + already_open
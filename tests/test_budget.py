@@ -0,0 +1,58 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.budget import CrawlBudget, BandwidthLimiter, shared_bandwidth_limiter, validate_limits
+
+class TestCrawlBudget(unittest.TestCase):
+    def test_endpoint_budget_counts_into_target(self):
+        target = CrawlBudget(max_bytes=1000)
+        endpoint = CrawlBudget.from_limits({"max_requests": 2}, name="endpoint posts", parent=target)
+        assert endpoint is not None
+
+        endpoint.record(requests=1, bytes_received=400)
+        self.assertIsNone(endpoint.exhausted())
+        endpoint.record(requests=1, bytes_received=100)
+        self.assertEqual(endpoint.exhausted(), "endpoint posts max_requests 2")
+        self.assertEqual(target.usage()["bytes"], 500)
+
+        other = CrawlBudget.from_limits({}, name="endpoint pages", parent=target)
+        self.assertIs(other, target)
+        target.record(bytes_received=500)
+        self.assertEqual(target.exhausted(), "target max_bytes 1000")
+
+    def test_wall_time_limit(self):
+        with patch('wpspider.budget.time.monotonic', side_effect=[100.0, 105.0, 131.0]):
+            budget = CrawlBudget(max_seconds=30)
+            self.assertIsNone(budget.exhausted())
+            self.assertEqual(budget.exhausted(), "target max_seconds 30")
+
+    def test_validate_limits(self):
+        validate_limits({"max_items": 10, "max_seconds": None})
+        with self.assertRaises(ValueError):
+            validate_limits({"max_pages": 10})
+        with self.assertRaises(ValueError):
+            validate_limits({"max_items": -1})
+
+class TestBandwidthLimiter(unittest.TestCase):
+    @patch('wpspider.budget.time.sleep')
+    def test_overdraft_sleeps(self, mock_sleep):
+        with patch('wpspider.budget.time.monotonic', side_effect=[0.0, 0.0, 0.0, 1.0]):
+            limiter = BandwidthLimiter(1000)
+            self.assertEqual(limiter.consume(800), 0.0)
+            # 600 bytes over budget at 1000 B/s
+            self.assertAlmostEqual(limiter.consume(800), 0.6)
+            # One second later the debt is repaid and 400 bytes are available
+            self.assertEqual(limiter.consume(400), 0.0)
+        mock_sleep.assert_called_once()
+
+    def test_shared_limiter(self):
+        self.assertIsNone(shared_bandwidth_limiter(None))
+        self.assertIs(shared_bandwidth_limiter(5000), shared_bandwidth_limiter(5000))
+
+if __name__ == '__main__':
+    unittest.main()
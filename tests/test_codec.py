@@ -0,0 +1,47 @@
+import unittest
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider import codec
+from wpspider.codec import loads, dumps, VALIDATION_SAMPLES
+
+class TestCodec(unittest.TestCase):
+    def test_dumps_matches_stdlib(self):
+        for sample in VALIDATION_SAMPLES:
+            self.assertEqual(dumps(sample), json.dumps(sample))
+
+    def test_loads_round_trip(self):
+        for sample in VALIDATION_SAMPLES:
+            self.assertEqual(loads(json.dumps(sample).encode("utf-8")), sample)
+            self.assertEqual(loads(json.dumps(sample)), sample)
+
+    def test_loads_falls_back_to_stdlib(self):
+        # A BOM and integers beyond 64 bits are rejected by some fast decoders
+        self.assertEqual(loads(b'\xef\xbb\xbf[1]'), [1])
+        self.assertEqual(loads(b'[123456789012345678901234567890]'), [123456789012345678901234567890])
+        with self.assertRaises(ValueError):
+            loads(b'<html>not json</html>')
+
+    def test_incompatible_decoder_is_rejected(self):
+        broken = ("broken", lambda data: [])
+        with patch('wpspider.codec._decoder_candidates', return_value=[broken, ("json", codec._stdlib_loads)]):
+            self.assertEqual(codec._select_decoder()[0], "json")
+
+    def test_lossy_big_integers_are_decoded_again(self):
+        # A fast decoder that turns big integers into floats is still used for other payloads
+        lossy = MagicMock(side_effect=lambda data: json.loads(data, parse_int=float))
+        with patch('wpspider.codec._decode', lossy):
+            self.assertEqual(loads(b'[123456789012345678901234567890]'), [123456789012345678901234567890])
+            self.assertEqual(loads('{"id": -123456789012345678901}'), {"id": -123456789012345678901})
+            self.assertEqual(loads(b'{"views": 1e21}'), {"views": 1e21})
+            self.assertEqual(loads(b'[9223372036854775807, 12]'), [9223372036854775807, 12])
+            self.assertEqual(loads(b'[12]'), [12.0])
+            self.assertEqual(lossy.call_count, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
+import json
 from unittest.mock import MagicMock, patch
-from wpspider.crawler import UrlBuilder, WPCrawler
+from datetime import datetime, timedelta
+from wpspider.crawler import SeenObjects, UrlBuilder, WPCrawler, unpack_embedded, date_range_params, merge_endpoint_runs
 import requests
 
 class TestUrlBuilder(unittest.TestCase):
@@ -54,14 +56,16 @@ class TestWPCrawler(unittest.TestCase):
         # Setup mock responses
         # Page 1: returns 2 items
         mock_resp_1 = MagicMock()
+        mock_resp_1.url = "http://mock.com/wp-json/wp/v2/posts"
         mock_resp_1.status_code = 200
-        mock_resp_1.json.return_value = [{"id": 1}, {"id": 2}]
+        mock_resp_1.content = json.dumps([{"id": 1}, {"id": 2}]).encode()
         mock_resp_1.headers = {}
         
         # Page 2: returns empty list (done)
         mock_resp_2 = MagicMock()
+        mock_resp_2.url = "http://mock.com/wp-json/wp/v2/posts"
         mock_resp_2.status_code = 200
-        mock_resp_2.json.return_value = []
+        mock_resp_2.content = json.dumps([]).encode()
         mock_resp_2.headers = {}
 
         mock_get.side_effect = [mock_resp_1, mock_resp_2]
@@ -76,12 +80,14 @@ class TestWPCrawler(unittest.TestCase):
     def test_crawl_endpoint_400_termination(self, mock_get):
         # Page 1: 1 item
         mock_resp_1 = MagicMock()
+        mock_resp_1.url = "http://mock.com/wp-json/wp/v2/posts"
         mock_resp_1.status_code = 200
-        mock_resp_1.json.return_value = [{"id": 1}]
+        mock_resp_1.content = json.dumps([{"id": 1}]).encode()
         mock_resp_1.headers = {}
         
         # Page 2: 400 Bad Request
         mock_resp_2 = MagicMock()
+        mock_resp_2.url = "http://mock.com/wp-json/wp/v2/posts"
         mock_resp_2.status_code = 400
         mock_resp_2.headers = {}
         mock_resp_2.raise_for_status.side_effect = requests.exceptions.HTTPError(response=mock_resp_2)
@@ -99,14 +105,16 @@ class TestWPCrawler(unittest.TestCase):
         
         # Page 1: 1 item
         mock_resp_1 = MagicMock()
+        mock_resp_1.url = "http://mock.com/wp-json/wp/v2/posts"
         mock_resp_1.status_code = 200
-        mock_resp_1.json.return_value = [{"id": 1}]
+        mock_resp_1.content = json.dumps([{"id": 1}]).encode()
         mock_resp_1.headers = {}
 
         # Page 2: Error object
         mock_resp_2 = MagicMock()
+        mock_resp_2.url = "http://mock.com/wp-json/wp/v2/posts"
         mock_resp_2.status_code = 200 # Sometimes returns 200 even with error body? Or 400. Let's assume 200 but body is error.
-        mock_resp_2.json.return_value = {'code': 'rest_post_invalid_page_number', 'message': '...'}
+        mock_resp_2.content = json.dumps({'code': 'rest_post_invalid_page_number', 'message': '...'}).encode()
         mock_resp_2.headers = {}
         
         mock_get.side_effect = [mock_resp_1, mock_resp_2]
@@ -116,5 +124,208 @@ class TestWPCrawler(unittest.TestCase):
         self.assertEqual(len(batches), 2)
         self.assertEqual(mock_get.call_count, 2)
 
+    def test_session_pool_and_encoding(self):
+        crawler = WPCrawler("http://mock.com", pool_connections=4, pool_maxsize=16, connect_timeout=3, read_timeout=30)
+        adapter = crawler.session.get_adapter("https://mock.com")
+        self.assertEqual(adapter._pool_maxsize, 16)
+        self.assertEqual(adapter._pool_connections, 4)
+        self.assertEqual(crawler.timeout, (3, 30))
+        self.assertIn("gzip", crawler.session.headers["Accept-Encoding"])
+
+    @patch('wpspider.crawler.requests.Session.get')
+    def test_transfer_sizes_recorded(self, mock_get):
+        mock_resp = MagicMock()
+        mock_resp.url = "http://mock.com/wp-json/wp/v2/posts?page=1"
+        mock_resp.status_code = 200
+        mock_resp.content = json.dumps([{"id": 1}] * 10).encode()
+        mock_resp.raw.tell.return_value = 30
+        mock_resp.headers = {"Content-Encoding": "gzip", "X-WP-TotalPages": "1"}
+        mock_get.return_value = mock_resp
+
+        batches = list(self.crawler.crawl_endpoint("posts"))
+
+        meta = batches[0][1]
+        self.assertEqual(meta["bytes_received"], 30)
+        self.assertEqual(meta["bytes_decoded"], 110)
+        self.assertEqual(meta["content_encoding"], "gzip")
+        self.assertEqual(mock_get.call_args.kwargs["timeout"], (10.0, 10.0))
+
+    @patch('wpspider.crawler.time.sleep')
+    @patch('wpspider.crawler.requests.Session.get')
+    def test_budget_stops_endpoint(self, mock_get, mock_sleep):
+        mock_resp = MagicMock()
+        mock_resp.url = "http://mock.com/wp-json/wp/v2/comments"
+        mock_resp.status_code = 200
+        mock_resp.content = b'[{"id": 1}, {"id": 2}]'
+        mock_resp.raw.tell.return_value = 22
+        mock_resp.headers = {}
+        mock_get.return_value = mock_resp
+
+        crawler = WPCrawler("http://mock.com", budget_limits={"max_items": 5}, endpoint_limits={"max_requests": 10})
+        batches = list(crawler.crawl_endpoint("comments"))
+
+        # Endless pagination is cut off once the target item budget is spent
+        self.assertEqual(len(batches), 3)
+        run = crawler.endpoint_runs["comments"]
+        self.assertEqual(run["status"], "budget_exhausted")
+        self.assertEqual(run["reason"], "target max_items 5")
+        self.assertEqual((run["requests"], run["items"], run["bytes_received"]), (3, 6, 66))
+
+        # The target budget is spent, so the next endpoint stops before any request
+        self.assertEqual(list(crawler.crawl_endpoint("posts")), [])
+        self.assertEqual(crawler.endpoint_runs["posts"]["requests"], 0)
+
+class FakeDatedEndpoint:
+    """Serves a dated WordPress endpoint, honouring per_page, page, orderby/order, after and before."""
+    def __init__(self, count: int):
+        start = datetime(2024, 1, 1)
+        # Skewed: most items are recent
+        self.items = [{"id": i, "date_gmt": (start + timedelta(hours=i * i // 50)).strftime("%Y-%m-%dT%H:%M:%S")} for i in range(1, count + 1)]
+
+    def get(self, url, params=None, timeout=None):
+        items = list(self.items)
+        if "after" in params:
+            items = [item for item in items if item["date_gmt"] > params["after"]]
+        if "before" in params:
+            items = [item for item in items if item["date_gmt"] < params["before"]]
+        if params.get("orderby") == "date":
+            items.sort(key=lambda item: item["date_gmt"], reverse=params.get("order", "desc") == "desc")
+        per_page, page = params["per_page"], params.get("page", 1)
+        response = MagicMock()
+        response.url = url
+        response.status_code = 200
+        response.content = json.dumps(items[(page - 1) * per_page:page * per_page]).encode()
+        response.headers = {"X-WP-Total": str(len(items)), "X-WP-TotalPages": str(max(1, -(-len(items) // per_page)))}
+        return response
+
+class TestDatePartitions(unittest.TestCase):
+    def test_date_range_params(self):
+        params = date_range_params(datetime(2024, 1, 1), datetime(2024, 2, 1))
+        self.assertEqual(params, {"dates_are_gmt": "true", "after": "2023-12-31T23:59:59", "before": "2024-02-01T00:00:00"})
+        self.assertEqual(date_range_params(None, None), {"dates_are_gmt": "true"})
+
+    def test_merge_endpoint_runs(self):
+        runs = [
+            {"status": "complete", "reason": None, "requests": 3, "items": 250, "bytes_received": 10, "started_at": "b", "completed_at": "c"},
+            {"status": "budget_exhausted", "reason": "target max_items 5", "requests": 1, "items": 5, "bytes_received": 2, "started_at": "a", "completed_at": "d"},
+        ]
+        merged = merge_endpoint_runs(runs)
+        self.assertEqual((merged["status"], merged["reason"]), ("budget_exhausted", "target max_items 5"))
+        self.assertEqual((merged["requests"], merged["items"], merged["started_at"], merged["completed_at"]), (4, 255, "a", "d"))
+
+    @patch('wpspider.crawler.time.sleep')
+    def test_partitions_cover_endpoint_once(self, mock_sleep):
+        server = FakeDatedEndpoint(1000)
+        crawler = WPCrawler("http://mock.com", date_partitions=5, partition_workers=3)
+        with patch.object(crawler.session, 'get', side_effect=server.get):
+            plan = crawler.plan_date_partitions("comments", 5)
+            self.assertGreaterEqual(len(plan), 5)
+            self.assertIsNone(plan[0]["after"])
+            self.assertIsNone(plan[-1]["before"])
+            self.assertTrue(all(partition["total"] <= 200 for partition in plan))
+            self.assertEqual(sum(partition["total"] for partition in plan), 1000)
+
+            ids = [item["id"] for batch, _ in crawler.crawl_partitioned("comments") for item in batch]
+        self.assertEqual(sorted(ids), list(range(1, 1001)))
+        run = crawler.endpoint_runs["comments"]
+        self.assertEqual((run["status"], run["items"]), ("complete", 1000))
+        self.assertEqual(list(crawler.endpoint_runs), ["comments"])
+
+    @patch('wpspider.crawler.time.sleep')
+    def test_memory_bounded_partitions_spill(self, mock_sleep):
+        server = FakeDatedEndpoint(600)
+        # A ceiling far below the process RSS: one fetch at a time, pending batches go to disk
+        crawler = WPCrawler("http://mock.com", date_partitions=4, partition_workers=3, max_rss=1024 * 1024)
+        with patch.object(crawler.session, 'get', side_effect=server.get):
+            batches = list(crawler.crawl_partitioned("comments"))
+        ids = [item["id"] for batch, _ in batches for item in batch]
+        self.assertEqual(sorted(ids), list(range(1, 601)))
+        self.assertTrue(all(isinstance(meta, dict) for _, meta in batches))
+        self.assertEqual(crawler.memory.inflight, 0)
+
+    @patch('wpspider.crawler.time.sleep')
+    def test_undated_endpoint_falls_back(self, mock_sleep):
+        server = FakeDatedEndpoint(30)
+        crawler = WPCrawler("http://mock.com", date_partitions=4)
+        with patch.object(crawler.session, 'get', side_effect=server.get):
+            # Too small to split
+            self.assertEqual(crawler.plan_date_partitions("users", 4), [])
+            batches = list(crawler.crawl_partitioned("users"))
+        self.assertEqual(sum(len(batch) for batch, _ in batches), 30)
+        self.assertEqual(crawler.endpoint_runs["users"]["status"], "complete")
+
+class TestEmbedded(unittest.TestCase):
+    def _post(self, post_id, author_id):
+        return {
+            "id": post_id,
+            "_embedded": {
+                "author": [{"id": author_id, "name": "Admin"}],
+                "wp:featuredmedia": [{"code": "rest_forbidden", "message": "..."}],
+                "wp:term": [
+                    [{"id": 3, "taxonomy": "category", "name": "News"}],
+                    [{"id": 9, "taxonomy": "post_tag", "name": "tag"}, {"id": 11, "taxonomy": "genre", "name": "Jazz"}]
+                ]
+            }
+        }
+
+    def test_unpack_embedded(self):
+        post = self._post(1, 5)
+        grouped = unpack_embedded([post])
+
+        self.assertNotIn("_embedded", post)
+        self.assertEqual([u["id"] for u in grouped["users"]], [5])
+        self.assertEqual([c["id"] for c in grouped["categories"]], [3])
+        self.assertEqual([t["id"] for t in grouped["tags"]], [9])
+        self.assertEqual([g["id"] for g in grouped["genre"]], [11])
+        self.assertNotIn("media", grouped)  # Error objects are dropped
+
+    @patch('wpspider.crawler.requests.Session.get')
+    def test_embed_param_and_dedupe(self, mock_get):
+        crawler = WPCrawler("http://mock.com", embed=True)
+        mock_resp = MagicMock()
+        mock_resp.url = "http://mock.com/wp-json/wp/v2/posts"
+        mock_resp.content = json.dumps([self._post(1, 5), self._post(2, 5)]).encode()
+        mock_resp.headers = {"X-WP-TotalPages": "1"}
+        mock_get.return_value = mock_resp
+
+        batch, _ = next(crawler.crawl_endpoint("posts"))
+        self.assertIn("_embed", mock_get.call_args.kwargs["params"])
+
+        embedded = crawler.extract_embedded("posts", batch)
+        self.assertEqual(len(embedded["users"]), 1)
+        self.assertEqual(crawler.extract_embedded("posts", [self._post(3, 5)]).get("users"), None)
+
+    @patch('wpspider.crawler.requests.Session.get')
+    def test_embedded_copies_of_full_endpoints_are_dropped(self, mock_get):
+        crawler = WPCrawler("http://mock.com", embed=True, full_endpoints=["posts", "users"])
+        posts = MagicMock(url="http://mock.com/wp-json/wp/v2/posts", headers={"X-WP-TotalPages": "1"})
+        posts.content = json.dumps([self._post(1, 5)]).encode()
+        users = MagicMock(url="http://mock.com/wp-json/wp/v2/users", headers={"X-WP-TotalPages": "1"})
+        users.content = json.dumps([{"id": 5, "name": "Admin"}, {"id": 6, "name": "Editor"}]).encode()
+        mock_get.side_effect = [posts, users]
+
+        # users is crawled in full, so the embedded author is not stored; terms still are
+        batch, _ = next(crawler.crawl_endpoint("posts"))
+        embedded = crawler.extract_embedded("posts", batch)
+        self.assertNotIn("users", embedded)
+        self.assertEqual([c["id"] for c in embedded["categories"]], [3])
+
+        batch, _ = next(crawler.crawl_endpoint("users"))
+        self.assertNotIn("_embed", mock_get.call_args.kwargs["params"])
+        self.assertEqual(crawler.extract_embedded("users", batch), {})
+
+    def test_shard_crawlers_share_seen_objects(self):
+        seen = SeenObjects()
+        posts = WPCrawler("http://mock.com", embed=True, seen_objects=seen)
+        pages = WPCrawler("http://mock.com", embed=True, seen_objects=seen)
+        self.assertEqual(len(posts.extract_embedded("posts", [self._post(1, 5)])["users"]), 1)
+        self.assertNotIn("users", pages.extract_embedded("pages", [self._post(2, 5)]))
+
+    def test_parent_pages_are_not_embedded(self):
+        crawler = WPCrawler("http://mock.com", embed=True)
+        child = {"id": 7, "type": "page", "_embedded": {"up": [{"id": 5, "type": "page", "title": {"rendered": "Parent"}}]}}
+        self.assertEqual(crawler.extract_embedded("pages", [child]), {})
+        self.assertNotIn("_embedded", child)
+
 if __name__ == '__main__':
     unittest.main()
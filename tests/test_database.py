@@ -87,6 +87,25 @@ class TestDatabaseManager(unittest.TestCase):
         self.assertEqual(rows[1][1], "Post 2")
         self.assertIsNone(rows[1][3]) # link is missing
 
+    def test_stored_wp_ids(self):
+        self.assertEqual(self.db.stored_wp_ids("users", 1, [5]), set())
+        self.db.save_batch("users", [{"id": 5, "name": "Admin"}, {"id": 6, "name": "Editor"}], target_id=1)
+        self.assertEqual(self.db.stored_wp_ids("users", 1, [5, 7]), {5})
+        self.assertEqual(self.db.stored_wp_ids("users", 2, [5]), set())
+
+    def test_existing_table(self):
+        self.assertIsNone(self.db.existing_table("users"))
+        self.assertIsNone(self.db.existing_table("!!"))
+        self.db.ensure_endpoint_table("block-types")
+        self.assertEqual(self.db.existing_table("block-types"), "blocktypes")
+
+    def test_target_filter(self):
+        self.assertEqual(DatabaseManager.target_filter(3), ("target_id = ?", [3]))
+        self.assertEqual(DatabaseManager.target_filter("3"), ("target_id = ?", [3]))
+        clause, params = DatabaseManager.target_filter("https://example.com/blog")
+        self.assertIn("domain = ? OR url = ?", clause)
+        self.assertEqual(params, ["example.com", "https://example.com/blog"])
+
     def test_save_batch_users_extraction(self):
         # Test extraction for User/Term like objects (using 'name' instead of title.rendered)
         assert self.db.conn is not None
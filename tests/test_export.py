@@ -0,0 +1,78 @@
+import unittest
+import os
+import sys
+import csv
+import json
+import shutil
+import tempfile
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.database import DatabaseManager
+from wpspider.export import TableExporter, infer_format
+
+class TestTableExporter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, "crawl.sqlite"))
+        self.db.connect()
+
+        first = self.db.log_target("https://example.com")
+        second = self.db.log_target("https://other.com")
+        self.db.save_batch("posts", [
+            {"id": 1, "slug": "a", "title": {"rendered": "A"}, "date_gmt": "2024-01-05T00:00:00"},
+            {"id": 2, "slug": "b", "title": {"rendered": "B"}, "date_gmt": "2024-02-05T00:00:00"},
+        ], target_id=first)
+        self.db.save_batch("posts", [
+            {"id": 3, "slug": "c", "title": {"rendered": "C"}, "date_gmt": "2024-01-10T00:00:00"},
+        ], target_id=second)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_ndjson_embeds_json(self):
+        out = os.path.join(self.temp_dir, "posts.ndjson")
+        count = TableExporter(self.db, "posts", chunk_size=1).export(out, "ndjson")
+        self.assertEqual(count, 3)
+
+        with open(out, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["wp_id"] for r in records], [1, 2, 3])
+        self.assertEqual(records[0]["data"]["slug"], "a")
+
+    def test_csv_with_filters(self):
+        out = os.path.join(self.temp_dir, "posts.csv")
+        exporter = TableExporter(self.db, "posts", include_data=False)
+        count = exporter.export(out, "csv", target="example.com", since="2024-01-01", until="2024-02-01")
+        self.assertEqual(count, 1)
+
+        with open(out, encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(rows[0]["slug"], "a")
+        self.assertNotIn("data", rows[0])
+
+    def test_unknown_table(self):
+        with self.assertRaises(ValueError):
+            TableExporter(self.db, "nope")
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+
+        out = os.path.join(self.temp_dir, "posts.parquet")
+        TableExporter(self.db, "posts", chunk_size=2).export(out, "parquet")
+        table = pq.read_table(out)
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column("wp_id").to_pylist(), [1, 2, 3])
+
+    def test_infer_format(self):
+        self.assertEqual(infer_format("out.jsonl"), "ndjson")
+        self.assertEqual(infer_format("out.parquet"), "parquet")
+        self.assertIsNone(infer_format("out.txt"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import MagicMock, patch
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.database import DatabaseManager
+from wpspider.jobs import JobQueue, CrawlWorker, JOB_DONE, JOB_FAILED, JOB_LEASED, JOB_PENDING
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.temp_db_fd, self.temp_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(self.temp_db_fd)
+
+        self.db = DatabaseManager(self.temp_db_path)
+        self.db.connect()
+        self.queue = JobQueue(self.db, lease_seconds=60)
+        self.target_id = self.db.log_target("https://example.com")
+
+    def tearDown(self):
+        self.db.close()
+        if os.path.exists(self.temp_db_path):
+            os.remove(self.temp_db_path)
+
+    def test_plan_target_splits_page_ranges(self):
+        crawler = MagicMock()
+        crawler.probe_total_pages.side_effect = [25, None]
+
+        count = self.queue.plan_target(self.target_id, "https://example.com", ["posts", "users"], crawler, pages_per_job=10)
+        self.assertEqual(count, 4)
+
+        assert self.db.conn is not None
+        rows = self.db.conn.execute("SELECT endpoint, page_start, page_end FROM crawl_jobs ORDER BY id").fetchall()
+        self.assertEqual(rows, [
+            ("posts", 1, 10),
+            ("posts", 11, 20),
+            ("posts", 21, None),  # Last range is open-ended
+            ("users", 1, None),   # Unknown size
+        ])
+
+    def test_claim_is_exclusive(self):
+        self.queue.enqueue(self.target_id, "https://example.com", "posts")
+
+        job = self.queue.claim("worker-a")
+        assert job is not None
+        self.assertEqual(job["endpoint"], "posts")
+        self.assertEqual(job["attempts"], 1)
+
+        # Leased job is not handed out again while the lease is valid
+        self.assertIsNone(self.queue.claim("worker-b"))
+        self.assertTrue(self.queue.heartbeat(job["id"], "worker-a"))
+        self.assertFalse(self.queue.heartbeat(job["id"], "worker-b"))
+
+    def test_expired_lease_is_reassigned(self):
+        job_id = self.queue.enqueue(self.target_id, "https://example.com", "posts")
+
+        with patch('wpspider.jobs.time.time', return_value=1000.0):
+            self.queue.claim("worker-a")
+
+        # After the lease runs out another worker picks it up
+        with patch('wpspider.jobs.time.time', return_value=1000.0 + 61):
+            job = self.queue.claim("worker-b")
+        assert job is not None
+        self.assertEqual(job["id"], job_id)
+        self.assertEqual(job["attempts"], 2)
+
+        # The original worker can no longer heartbeat or complete it
+        self.assertFalse(self.queue.heartbeat(job_id, "worker-a"))
+        self.assertFalse(self.queue.complete(job_id, "worker-a", 5))
+        self.assertTrue(self.queue.complete(job_id, "worker-b", 5))
+        self.assertEqual(self.queue.counts(), {JOB_DONE: 1})
+
+    def test_expired_lease_fails_after_max_attempts(self):
+        queue = JobQueue(self.db, lease_seconds=60, max_attempts=1)
+        queue.enqueue(self.target_id, "https://example.com", "posts")
+
+        with patch('wpspider.jobs.time.time', return_value=1000.0):
+            queue.claim("worker-a")
+        with patch('wpspider.jobs.time.time', return_value=1100.0):
+            self.assertIsNone(queue.claim("worker-b"))
+
+        self.assertEqual(queue.counts(), {JOB_FAILED: 1})
+
+    def test_worker_runs_job(self):
+        self.queue.enqueue(self.target_id, "https://example.com", "posts", 1, 2)
+
+        crawler = MagicMock()
+        crawler.embed = False
+        crawler.endpoint_runs = {"posts": {"status": "budget_exhausted", "reason": "target max_items 3", "items": 3}}
+        meta = {"method": "GET", "url": "https://example.com/wp-json/wp/v2/posts", "started_at": "now"}
+        crawler.crawl_endpoint.return_value = iter([([{"id": 1}, {"id": 2}], meta), ([{"id": 3}], meta)])
+
+        worker = CrawlWorker(self.queue, worker_id="worker-a")
+        with patch.object(worker, '_crawler_for', return_value=crawler), self.assertLogs('wpspider.jobs', level='INFO') as logs:
+            processed = worker.run(exit_when_idle=True)
+        self.assertTrue(any("posts: done, 3 items in 2 pages" in line for line in logs.output))
+
+        self.assertEqual(processed, 1)
+        crawler.crawl_endpoint.assert_called_once_with("posts", start_page=1, end_page=2)
+
+        assert self.db.conn is not None
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0], 3)
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM http_requests").fetchone()[0], 2)
+        self.assertEqual(self.db.conn.execute("SELECT status, items FROM crawl_jobs").fetchone(), (JOB_DONE, 3))
+        self.assertEqual(self.db.get_endpoint_runs(self.target_id)[0]["status"], "budget_exhausted")
+        self.assertNotIn(JOB_LEASED, self.queue.counts())
+
+    def test_workers_store_embedded_objects_once(self):
+        self.queue.enqueue(self.target_id, "https://example.com", "posts", 1, 1)
+        self.queue.enqueue(self.target_id, "https://example.com", "posts", 2, None)
+        meta = {"method": "GET", "url": "https://example.com/wp-json/wp/v2/posts", "started_at": "now"}
+
+        # Each worker has its own crawler, so both see author 5 as new
+        for worker_id, post_id in (("worker-a", 1), ("worker-b", 2)):
+            crawler = MagicMock()
+            crawler.embed = True
+            crawler.endpoint_runs = {}
+            crawler.crawl_endpoint.return_value = iter([([{"id": post_id}], meta)])
+            crawler.extract_embedded.return_value = {"users": [{"id": 5, "name": "Admin"}]}
+            worker = CrawlWorker(self.queue, worker_id=worker_id)
+            with patch.object(worker, '_crawler_for', return_value=crawler):
+                job = self.queue.claim(worker_id)
+                assert job is not None
+                worker.run_job(job)
+
+        assert self.db.conn is not None
+        self.assertEqual(self.db.conn.execute("SELECT wp_id FROM users").fetchall(), [(5,)])
+        self.assertEqual(self.db.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0], 2)
+
+    def _page(self, items, page):
+        meta = {"method": "GET", "url": "https://example.com/wp-json/wp/v2/posts", "params": {"page": page}, "started_at": "now"}
+        return items, meta
+
+    def test_retried_job_resumes_after_stored_pages(self):
+        self.queue.enqueue(self.target_id, "https://example.com", "posts", 1, 2)
+
+        # The first attempt stores page 1, then the connection drops
+        crawler = MagicMock()
+        crawler.embed = False
+        crawler.endpoint_runs = {"posts": {"status": "failed", "reason": "Connection reset", "items": 2}}
+        crawler.crawl_endpoint.return_value = iter([self._page([{"id": 1}, {"id": 2}], 1)])
+        worker = CrawlWorker(self.queue, worker_id="worker-a")
+        with patch.object(worker, '_crawler_for', return_value=crawler):
+            worker.run_job(self.queue.claim("worker-a"))
+
+        crawler = MagicMock()
+        crawler.embed = False
+        crawler.endpoint_runs = {}
+        crawler.crawl_endpoint.return_value = iter([self._page([{"id": 3}], 2)])
+        worker = CrawlWorker(self.queue, worker_id="worker-b")
+        with patch.object(worker, '_crawler_for', return_value=crawler):
+            job = self.queue.claim("worker-b")
+            self.assertEqual(job["page_done"], 1)
+            worker.run_job(job)
+        crawler.crawl_endpoint.assert_called_once_with("posts", start_page=2, end_page=2)
+
+        assert self.db.conn is not None
+        self.assertEqual(self.db.conn.execute("SELECT wp_id FROM posts ORDER BY id").fetchall(), [(1,), (2,), (3,)])
+        self.assertEqual(self.db.conn.execute("SELECT status, page_done FROM crawl_jobs").fetchone(), (JOB_DONE, 2))
+
+    def test_worker_without_lease_stores_nothing(self):
+        self.queue.enqueue(self.target_id, "https://example.com", "posts", 1, 1)
+        job = self.queue.claim("worker-a")
+        assert self.db.conn is not None
+
+        def reassigned_crawl(endpoint, start_page, end_page):
+            # The lease expired during the request and another worker took the job
+            self.db.conn.execute("UPDATE crawl_jobs SET worker_id = 'worker-b'")
+            self.db.conn.commit()
+            yield self._page([{"id": 1}], 1)
+
+        crawler = MagicMock()
+        crawler.embed = False
+        crawler.endpoint_runs = {}
+        crawler.crawl_endpoint.side_effect = reassigned_crawl
+        worker = CrawlWorker(self.queue, worker_id="worker-a")
+        with patch.object(worker, '_crawler_for', return_value=crawler):
+            worker.run_job(job)
+
+        self.assertIsNone(self.db.conn.execute("SELECT name FROM sqlite_master WHERE name = 'posts'").fetchone())
+        self.assertEqual(self.db.conn.execute("SELECT worker_id, status, page_done FROM crawl_jobs").fetchone(), ("worker-b", JOB_LEASED, None))
+
+    def test_failed_crawl_returns_job_to_queue(self):
+        self.queue.enqueue(self.target_id, "https://example.com", "posts", 1, 2)
+
+        crawler = MagicMock()
+        crawler.embed = False
+        crawler.endpoint_runs = {"posts": {"status": "failed", "reason": "Connection refused", "items": 0}}
+        meta = {"method": "GET", "url": "https://example.com/wp-json/wp/v2/posts", "started_at": "now", "error": "Connection refused"}
+        crawler.crawl_endpoint.return_value = iter([([], meta)])
+
+        worker = CrawlWorker(self.queue, worker_id="worker-a")
+        with patch.object(worker, '_crawler_for', return_value=crawler):
+            job = self.queue.claim("worker-a")
+            assert job is not None
+            worker.run_job(job)
+
+        assert self.db.conn is not None
+        self.assertEqual(
+            self.db.conn.execute("SELECT status, attempts, error FROM crawl_jobs").fetchone(),
+            (JOB_PENDING, 1, "Connection refused")
+        )
+        self.assertEqual(self.db.get_endpoint_runs(self.target_id)[0]["status"], "failed")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.logger import JsonLinesFormatter, ProgressLogger, setup_logging, shutdown_logging
+
+class TestJsonLinesFormatter(unittest.TestCase):
+    def test_structured_fields(self):
+        record = logging.LogRecord("wpspider.crawler", logging.DEBUG, __file__, 1, "Endpoint %s page %d", ("posts", 2), None)
+        record.endpoint = "posts"
+        record.page = 2
+        record.latency = 0.125
+
+        entry = json.loads(JsonLinesFormatter().format(record))
+        self.assertEqual(entry["message"], "Endpoint posts page 2")
+        self.assertEqual(entry["level"], "DEBUG")
+        self.assertEqual((entry["endpoint"], entry["page"], entry["latency"]), ("posts", 2, 0.125))
+        self.assertNotIn("items", entry)
+
+class TestProgressLogger(unittest.TestCase):
+    def test_progress_is_rate_limited(self):
+        logger = MagicMock()
+        with patch('wpspider.logger.time.monotonic', side_effect=[0.0, 1.0, 2.0, 6.0, 7.0]):
+            progress = ProgressLogger(logger, "Endpoint posts", interval=5.0, endpoint="posts")
+            progress.update(100)
+            progress.update(100)
+            progress.update(100)
+            progress.finish()
+
+        self.assertEqual(logger.info.call_count, 2)
+        message = logger.info.call_args_list[0].args[0]
+        self.assertIn("300 items in 3 pages", message)
+        self.assertEqual(logger.info.call_args_list[1].kwargs["extra"], {"endpoint": "posts", "total_items": 300, "rate": 42.9})
+
+class TestSetupLogging(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.logger = logging.getLogger("wpspider")
+        self.saved_handlers = self.logger.handlers[:]
+        self.saved_level = self.logger.level
+        self.logger.handlers = []
+
+    def tearDown(self):
+        shutdown_logging()
+        self.logger.handlers = self.saved_handlers
+        self.logger.setLevel(self.saved_level)
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_json_lines_through_queue(self):
+        path = os.path.join(self.temp_dir, "crawl.log")
+        with patch('sys.stdout'):
+            logger = setup_logging(path, log_format="json", log_level="DEBUG")
+            self.assertIsInstance(logger.handlers[0], logging.handlers.QueueHandler)
+            logging.getLogger("wpspider.crawler").debug("page done", extra={"endpoint": "posts", "items": 100})
+            shutdown_logging()
+
+        with open(path, encoding="utf-8") as f:
+            entry = json.loads(f.readline())
+        self.assertEqual((entry["message"], entry["endpoint"], entry["items"]), ("page done", "posts", 100))
+
+if __name__ == '__main__':
+    unittest.main()
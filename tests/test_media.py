@@ -0,0 +1,165 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.database import DatabaseManager
+from wpspider.media import MediaDownloader, media_files, DOWNLOAD_COMPLETE, DOWNLOAD_DUPLICATE
+
+def mock_response(status_code, body, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.return_value = [body]
+    response.__enter__.return_value = response
+    return response
+
+class TestMediaFiles(unittest.TestCase):
+    def test_select_sizes(self):
+        item = {
+            "source_url": "https://example.com/a.jpg",
+            "media_details": {"sizes": {"medium": {"source_url": "https://example.com/a-300.jpg"}}}
+        }
+        self.assertEqual(media_files(item), {"full": "https://example.com/a.jpg"})
+        self.assertEqual(media_files(item, ["medium", "large"]), {"medium": "https://example.com/a-300.jpg"})
+
+class TestMediaDownloader(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, "crawl.sqlite"))
+        self.db.connect()
+        self.target_id = self.db.log_target("https://example.com")
+        self.db.save_batch("media", [
+            {"id": 1, "source_url": "https://example.com/uploads/a.jpg"},
+            {"id": 2, "source_url": "https://example.com/uploads/b.jpg"},
+        ], target_id=self.target_id)
+        self.downloader = MediaDownloader(self.db, os.path.join(self.temp_dir, "media"), workers=2)
+        self.session = MagicMock()
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_download_dedupe_and_skip(self):
+        self.session.get.side_effect = lambda url, **kwargs: mock_response(200, b"same bytes")
+
+        with patch.object(self.downloader, '_session', return_value=self.session):
+            counts = self.downloader.run()
+            self.assertEqual(counts, {DOWNLOAD_COMPLETE: 1, DOWNLOAD_DUPLICATE: 1})
+
+            # Only one copy of identical content is kept on disk
+            assert self.db.conn is not None
+            paths = {row[0] for row in self.db.conn.execute("SELECT path FROM media_downloads")}
+            self.assertEqual(len(paths), 1)
+            self.assertTrue(os.path.exists(paths.pop()))
+
+            # Completed files are skipped on the next run
+            self.session.get.reset_mock()
+            self.assertEqual(self.downloader.run(), {})
+            self.session.get.assert_not_called()
+
+    def _partial(self, url, data, validator=None):
+        path = self.downloader.local_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.part", "wb") as f:
+            f.write(data)
+        if validator:
+            with open(f"{path}.part.validator", "w") as f:
+                f.write(validator)
+        return path
+
+    def test_first_download_stores_validator(self):
+        url = "https://example.com/uploads/a.jpg"
+        path = self.downloader.local_path(url)
+        response = mock_response(200, b"hello world", {"ETag": '"v1"'})
+        response.iter_content.side_effect = RuntimeError("connection reset")
+        self.session.get.return_value = response
+        with patch.object(self.downloader, '_session', return_value=self.session):
+            with self.assertRaises(RuntimeError):
+                self.downloader.download({"url": url})
+
+        with open(f"{path}.part.validator") as f:
+            self.assertEqual(f.read(), '"v1"')
+
+    def test_resume_partial_file(self):
+        url = "https://example.com/uploads/a.jpg"
+        path = self._partial(url, b"hello ", '"v1"')
+
+        self.session.get.return_value = mock_response(206, b"world", {"Content-Range": "bytes 6-10/11"})
+        with patch.object(self.downloader, '_session', return_value=self.session):
+            result = self.downloader.download({"url": url})
+
+        self.assertEqual(self.session.get.call_args.kwargs["headers"], {"Range": "bytes=6-", "If-Range": '"v1"'})
+        with open(result["path"], "rb") as f:
+            self.assertEqual(f.read(), b"hello world")
+        self.assertFalse(os.path.exists(f"{path}.part"))
+        self.assertFalse(os.path.exists(f"{path}.part.validator"))
+
+    def test_partial_without_validator_restarts(self):
+        url = "https://example.com/uploads/a.jpg"
+        self._partial(url, b"hello ")
+
+        self.session.get.return_value = mock_response(200, b"new file")
+        with patch.object(self.downloader, '_session', return_value=self.session):
+            result = self.downloader.download({"url": url})
+
+        self.assertEqual(self.session.get.call_args.kwargs["headers"], {})
+        with open(result["path"], "rb") as f:
+            self.assertEqual(f.read(), b"new file")
+
+    def test_range_ignored_restarts(self):
+        url = "https://example.com/uploads/a.jpg"
+        self._partial(url, b"stale", '"v1"')
+
+        # A changed file (If-Range mismatch) or a server without Range support sends 200
+        self.session.get.return_value = mock_response(200, b"fresh file")
+        with patch.object(self.downloader, '_session', return_value=self.session):
+            result = self.downloader.download({"url": url})
+
+        with open(result["path"], "rb") as f:
+            self.assertEqual(f.read(), b"fresh file")
+
+    def test_wrong_content_range_restarts(self):
+        url = "https://example.com/uploads/a.jpg"
+        self._partial(url, b"hello ", '"v1"')
+
+        self.session.get.side_effect = [
+            mock_response(206, b"llo world", {"Content-Range": "bytes 2-10/11"}),
+            mock_response(200, b"hello world", {"ETag": '"v1"'}),
+        ]
+        with patch.object(self.downloader, '_session', return_value=self.session):
+            result = self.downloader.download({"url": url})
+
+        self.assertEqual(self.session.get.call_args.kwargs["headers"], {})
+        with open(result["path"], "rb") as f:
+            self.assertEqual(f.read(), b"hello world")
+
+    def test_416_checks_total_size(self):
+        url = "https://example.com/uploads/a.jpg"
+        self._partial(url, b"hello world", '"v1"')
+        self.session.get.return_value = mock_response(416, b"", {"Content-Range": "bytes */11"})
+        with patch.object(self.downloader, '_session', return_value=self.session):
+            result = self.downloader.download({"url": url})
+        self.assertEqual(self.session.get.call_count, 1)
+        self.assertEqual(result["bytes"], 11)
+
+        # The server's file is larger than the partial one: download again
+        url = "https://example.com/uploads/b.jpg"
+        self._partial(url, b"hello world", '"v1"')
+        self.session.get.reset_mock()
+        self.session.get.side_effect = [
+            mock_response(416, b"", {"Content-Range": "bytes */20"}),
+            mock_response(200, b"hello world, again!!"),
+        ]
+        with patch.object(self.downloader, '_session', return_value=self.session):
+            result = self.downloader.download({"url": url})
+        self.assertEqual(self.session.get.call_count, 2)
+        self.assertEqual(result["bytes"], 20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import sys
+import queue
+import threading
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.memory import MemoryWatchdog, SpillQueue, rss_bytes, shared_memory_watchdog
+
+class TestMemoryWatchdog(unittest.TestCase):
+    def test_rss_bytes(self):
+        rss = rss_bytes()
+        if rss is None:
+            self.skipTest("No RSS source on this platform")
+        self.assertGreater(rss, 1024 * 1024)
+
+    def test_throttles_to_one_fetch_under_pressure(self):
+        usage = {"rss": 100}
+        watchdog = MemoryWatchdog(1000, sample_interval=0.0, rss=lambda: usage["rss"])
+
+        first = watchdog.acquire()
+        watchdog.track(first, 50)
+        second = watchdog.acquire()
+        self.assertEqual(watchdog.inflight, 2)
+        self.assertEqual(watchdog.inflight_bytes, 400)
+
+        # 750 RSS + 4 x 50 for the next page passes 80% of 1000: a third fetch must wait
+        usage["rss"] = 750
+        admitted = threading.Event()
+
+        def third_fetch():
+            slot = watchdog.acquire()
+            admitted.set()
+            watchdog.release(slot)
+
+        thread = threading.Thread(target=third_fetch)
+        thread.start()
+        self.assertFalse(admitted.wait(0.2))
+
+        watchdog.release(first)
+        self.assertFalse(admitted.wait(0.2))
+        # With nothing in flight, one fetch is always admitted
+        watchdog.release(second)
+        self.assertTrue(admitted.wait(2))
+        thread.join()
+        self.assertEqual((watchdog.inflight, watchdog.inflight_bytes), (0, 0))
+        self.assertEqual(watchdog.summary()["throttled_fetches"], 1)
+        self.assertEqual(watchdog.summary()["peak_rss"], 750)
+
+    def test_shared_watchdog(self):
+        self.assertIsNone(shared_memory_watchdog(None))
+        self.assertIs(shared_memory_watchdog(2**30), shared_memory_watchdog(2**30))
+
+class TestSpillQueue(unittest.TestCase):
+    def test_spills_in_order(self):
+        spill = SpillQueue(100, size_of=lambda item: item[1]["size"] if item else 0)
+        items = [[[{"id": i}], {"size": 40}] for i in range(6)]
+        for item in items[:5]:
+            spill.put(item)
+        spill.put(None)
+        self.assertEqual(spill.spilled_total, 4)
+        self.assertEqual(len(spill), 6)
+
+        # Memory first, then the spill file, with new items queued behind the spilled ones
+        self.assertEqual(spill.get(), items[0])
+        self.assertEqual(spill.get(), items[1])
+        spill.put(items[5])
+        self.assertEqual([spill.get() for _ in range(5)], items[2:5] + [None, items[5]])
+        self.assertEqual(len(spill), 0)
+        with self.assertRaises(queue.Empty):
+            spill.get(timeout=0.01)
+
+        # A drained queue keeps items in memory again
+        spill.put(items[0])
+        self.assertEqual(spill.spilled_total, 5)
+        spill.close()
+
+    def test_spills_under_memory_pressure(self):
+        watchdog = MemoryWatchdog(1000, sample_interval=0.0, rss=lambda: 900)
+        spill = SpillQueue(10**6, size_of=lambda item: 1, watchdog=watchdog)
+        spill.put([1])
+        spill.put([2])
+        self.assertEqual(spill.spilled_total, 1)
+        self.assertEqual([spill.get(), spill.get()], [[1], [2]])
+        spill.close()
+
+if __name__ == '__main__':
+    unittest.main()
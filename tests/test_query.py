@@ -0,0 +1,73 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.database import DatabaseManager
+from wpspider.query import Query, Record, json_path
+
+class TestQuery(unittest.TestCase):
+    def setUp(self):
+        self.temp_db_fd, self.temp_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(self.temp_db_fd)
+        self.db = DatabaseManager(self.temp_db_path)
+        self.db.connect()
+
+        self.first = self.db.log_target("https://example.com")
+        second = self.db.log_target("https://other.com")
+        self.db.save_batch("posts", [
+            {"id": 1, "slug": "a", "status": "publish", "author": 3, "title": {"rendered": "A"}, "categories": [5, 7]},
+            {"id": 2, "slug": "b", "status": "draft", "author": 3, "title": {"rendered": "B"}, "categories": []},
+            {"id": 3, "slug": "c", "status": "publish", "author": 4, "title": {"rendered": "C"}},
+        ], target_id=self.first)
+        self.db.save_batch("posts", [
+            {"id": 9, "slug": "z", "status": "publish", "author": 3},
+        ], target_id=second)
+
+    def tearDown(self):
+        self.db.close()
+        if os.path.exists(self.temp_db_path):
+            os.remove(self.temp_db_path)
+
+    def test_json_path(self):
+        self.assertEqual(json_path("title.rendered"), "$.title.rendered")
+        self.assertEqual(json_path("categories.0"), "$.categories[0]")
+        self.assertEqual(json_path("$.acf"), "$.acf")
+
+    def test_filters_are_pushed_down(self):
+        records = list(Query(self.db, "posts").where("status", "publish").where("author", 3))
+        self.assertEqual([r.wp_id for r in records], [1, 9])
+
+        query = Query(self.db, "posts").target("example.com").where("author", [3, 4], op="in")
+        self.assertEqual(query.count(), 3)
+        self.assertEqual([r.slug for r in Query(self.db, "posts").where("wp_id", 2, op=">")], ["c", "z"])
+        self.assertEqual(Query(self.db, "posts").where("categories", None).count(), 2)
+
+    def test_data_is_decoded_lazily(self):
+        record = Query(self.db, "posts").first()
+        assert record is not None
+        self.assertIsInstance(record, Record)
+        self.assertEqual(record.slug, "a")
+        self.assertIsNone(record._data)
+
+        self.assertEqual(record.get("title.rendered"), "A")
+        self.assertEqual(record["categories.1"], 7)
+        self.assertIs(record.data, record.data)
+        with self.assertRaises(KeyError):
+            record["missing"]
+
+    def test_select_skips_data(self):
+        records = list(Query(self.db, "posts").target(self.first).select("author", "title.rendered"))
+        self.assertEqual([(r.get("author"), r.get("title.rendered")) for r in records], [(3, "A"), (3, "B"), (4, "C")])
+        self.assertIsNone(records[0].data)
+        self.assertIsNone(records[0].get("status"))
+
+    def test_unknown_table(self):
+        with self.assertRaises(ValueError):
+            Query(self.db, "nope")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from argparse import Namespace
+from unittest.mock import MagicMock, patch
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.config import Config
+from wpspider.database import DatabaseManager
+from wpspider.scheduler import CrawlScheduler, next_interval, read_targets_file
+
+class TestNextInterval(unittest.TestCase):
+    def test_busy_job_shortens_interval(self):
+        # 4 changes per hour -> every 15 minutes
+        self.assertEqual(next_interval(4.0, 86400.0, 10, 60.0, 86400.0 * 7), 900.0)
+
+    def test_quiet_job_backs_off(self):
+        self.assertEqual(next_interval(0.0, 3600.0, 0, 60.0, 86400.0), 5400.0)
+        self.assertEqual(next_interval(0.0, 80000.0, 0, 60.0, 86400.0), 86400.0)
+
+    def test_interval_clamped(self):
+        self.assertEqual(next_interval(1000.0, 3600.0, 50, 900.0, 86400.0), 900.0)
+
+class TestCrawlScheduler(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        args = Namespace(output=os.path.join(self.temp_dir, "fleet.sqlite"), targets=["example.com"])
+        self.config = Config("non_existent_file.json", args=args, require_target=False)
+        self.config.endpoints = ["posts"]
+        self.scheduler = CrawlScheduler(self.config, self.config.targets, workers=1, min_interval=60.0, initial_interval=3600.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _crawl(self, items, status="complete", reason=None):
+        meta = {"method": "GET", "url": "https://example.com/wp-json/wp/v2/posts", "started_at": "now"}
+        crawler = MagicMock()
+        crawler.crawl_endpoint.return_value = iter([(items, meta)])
+        crawler.endpoint_runs = {"posts": {
+            "status": status, "reason": reason, "requests": 1, "items": len(items),
+            "bytes_received": 0, "started_at": "now", "completed_at": "now",
+        }}
+        return crawler
+
+    def test_run_job_learns_change_rate(self):
+        first = [{"id": 1, "modified_gmt": "2024-01-01T00:00:00"}, {"id": 2, "modified_gmt": "2024-01-01T00:00:00"}]
+        with patch('wpspider.scheduler.WPCrawler', return_value=self._crawl(first)), \
+             patch('wpspider.scheduler.time.time', return_value=1_000_000.0):
+            state = self.scheduler.run_job("https://example.com", "posts")
+
+        # First run of a never-crawled site only sets a baseline
+        self.assertEqual(state["runs"], 1)
+        self.assertEqual(state["change_rate"], 0.0)
+        self.assertEqual(state["next_run_at"], 1_000_000.0 + 3600.0)
+
+        # One hour later one item changed and one is new
+        second = [{"id": 1, "modified_gmt": "2024-01-01T00:00:00"}, {"id": 2, "modified_gmt": "2024-02-01T00:00:00"}, {"id": 3}]
+        with patch('wpspider.scheduler.WPCrawler', return_value=self._crawl(second)), \
+             patch('wpspider.scheduler.time.time', return_value=1_000_000.0 + 3600.0):
+            state = self.scheduler.run_job("https://example.com", "posts")
+
+        self.assertEqual(state["runs"], 2)
+        self.assertAlmostEqual(state["change_rate"], 0.6)  # 0.3 * 2/h
+        self.assertAlmostEqual(state["interval"], 6000.0)
+
+        # Unchanged items are not stored again
+        with DatabaseManager(self.config.db_name) as db:
+            rows = db.conn.execute("SELECT wp_id FROM posts ORDER BY id").fetchall()
+            runs = db.conn.execute("SELECT status FROM endpoint_runs WHERE endpoint = 'posts'").fetchall()
+        self.assertEqual([r[0] for r in rows], [1, 2, 2, 3])
+        self.assertEqual(runs, [("complete",), ("complete",)])
+
+    def test_budget_cut_run_keeps_schedule(self):
+        items = [{"id": 1, "modified_gmt": "2024-01-01T00:00:00"}]
+        with patch('wpspider.scheduler.WPCrawler', return_value=self._crawl(items)), \
+             patch('wpspider.scheduler.time.time', return_value=1_000_000.0):
+            self.scheduler.run_job("https://example.com", "posts")
+
+        crawler = self._crawl(items, status="budget_exhausted", reason="target max_requests 1")
+        with patch('wpspider.scheduler.WPCrawler', return_value=crawler) as scheduler_crawler, \
+             patch('wpspider.scheduler.time.time', return_value=1_000_000.0 + 3600.0):
+            state = self.scheduler.run_job("https://example.com", "posts")
+
+        self.assertFalse(scheduler_crawler.call_args.kwargs["embed"])
+        # Not a quiet run: no backoff, and the next full run measures from the last complete one
+        self.assertEqual((state["runs"], state["interval"], state["last_run_at"]), (1, 3600.0, 1_000_000.0))
+        self.assertEqual(state["next_run_at"], 1_000_000.0 + 7200.0)
+        with DatabaseManager(self.config.db_name) as db:
+            runs = db.conn.execute("SELECT status, reason FROM endpoint_runs").fetchall()
+        self.assertEqual(runs[-1], ("budget_exhausted", "target max_requests 1"))
+
+    def test_load_jobs_orders_by_due_time(self):
+        self.scheduler.load_jobs()
+        self.assertEqual(len(self.scheduler._queue), 1)
+        self.assertEqual(self.scheduler._queue[0][3:], ("https://example.com", "posts"))
+
+    def test_read_targets_file(self):
+        path = os.path.join(self.temp_dir, "targets.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("# fleet\nexample.com\n\nother.org\n")
+        self.assertEqual(read_targets_file(path), ["example.com", "other.org"])
+
+if __name__ == '__main__':
+    unittest.main()
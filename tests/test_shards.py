@@ -0,0 +1,94 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.database import DatabaseManager
+from wpspider.media import MediaDownloader
+from wpspider.scheduler import CrawlScheduler
+from wpspider.shards import merge_shards, shard_path, expand_shard_paths
+
+class TestMergeShards(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.dest_path = os.path.join(self.temp_dir, "final.sqlite")
+        self.date_crawled = "2024-01-01T00:00:00+00:00"
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _make_shard(self, endpoint, items):
+        path = shard_path(self.dest_path, endpoint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with DatabaseManager(path) as db:
+            target_id = db.log_target("https://example.com", date_crawled=self.date_crawled)
+            request_id = db.log_http_request(target_id, endpoint, {
+                "method": "GET",
+                "url": f"https://example.com/wp-json/wp/v2/{endpoint}",
+                "started_at": self.date_crawled,
+            })
+            db.save_batch(endpoint, items, target_id=target_id, request_id=request_id)
+        return path
+
+    def test_merge_rewrites_ids(self):
+        with DatabaseManager(self.dest_path) as db:
+            # Pre-existing crawl data so ids must be shifted
+            old_target = db.log_target("https://other.com")
+            assert old_target is not None
+            db.log_http_request(old_target, "posts", {"method": "GET", "url": "https://other.com", "started_at": "x"})
+            main_target = db.log_target("https://example.com", date_crawled=self.date_crawled)
+
+        paths = [
+            self._make_shard("posts", [{"id": 1, "slug": "a"}, {"id": 2, "slug": "b"}]),
+            self._make_shard("users", [{"id": 7, "name": "Admin"}]),
+        ]
+
+        with DatabaseManager(self.dest_path) as db:
+            totals = merge_shards(db, paths)
+            assert db.conn is not None
+
+            self.assertEqual(totals, {"http_requests": 2, "posts": 2, "users": 1})
+
+            # Shards of the same crawl fold into the existing targets row
+            self.assertEqual(db.conn.execute("SELECT COUNT(*) FROM targets").fetchone()[0], 2)
+
+            requests = db.conn.execute("SELECT id, target_id, endpoint FROM http_requests ORDER BY id").fetchall()
+            self.assertEqual(requests, [(1, old_target, "posts"), (2, main_target, "posts"), (3, main_target, "users")])
+
+            posts = db.conn.execute("SELECT target_id, request_id, wp_id FROM posts ORDER BY wp_id").fetchall()
+            self.assertEqual(posts, [(main_target, 2, 1), (main_target, 2, 2)])
+
+            users = db.conn.execute("SELECT target_id, request_id, title FROM users").fetchall()
+            self.assertEqual(users, [(main_target, 3, "Admin")])
+
+    def test_merge_skips_media_downloads(self):
+        path = self._make_shard("media", [{"id": 3, "source_url": "https://example.com/a.jpg"}])
+        with DatabaseManager(path) as shard:
+            MediaDownloader(shard, os.path.join(self.temp_dir, "files"))
+
+        with DatabaseManager(self.dest_path) as db:
+            self.assertEqual(merge_shards(db, [path]), {"http_requests": 1, "media": 1})
+            # The destination keeps the downloader's own schema
+            downloader = MediaDownloader(db, os.path.join(self.temp_dir, "files"))
+            self.assertEqual(len(list(downloader.pending_files())), 1)
+
+    def test_merge_skips_crawl_schedule(self):
+        path = self._make_shard("posts", [{"id": 1}])
+        with DatabaseManager(path) as shard:
+            CrawlScheduler._init_schedule_table(shard)
+
+        with DatabaseManager(self.dest_path) as db:
+            self.assertEqual(merge_shards(db, [path]), {"http_requests": 1, "posts": 1})
+            assert db.conn is not None
+            self.assertIsNone(db.conn.execute("SELECT name FROM sqlite_master WHERE name = 'crawl_schedule'").fetchone())
+
+    def test_expand_directory(self):
+        path = self._make_shard("posts", [{"id": 1}])
+        self.assertEqual(expand_shard_paths([os.path.dirname(path)]), [path])
+
+if __name__ == '__main__':
+    unittest.main()
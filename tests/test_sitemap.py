@@ -0,0 +1,127 @@
+import unittest
+import io
+import os
+import sys
+import tempfile
+from unittest.mock import MagicMock
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wpspider.database import DatabaseManager
+from wpspider.sitemap import SitemapRefresher, sitemap_endpoint, sitemap_url, iter_sitemap
+
+INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/wp-sitemap-posts-post-1.xml</loc></sitemap>
+  <sitemap><loc>https://example.com/wp-sitemap-custom-1.xml</loc></sitemap>
+</sitemapindex>"""
+
+POSTS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://example.com/unchanged/</loc><lastmod>2024-01-01T00:00:00+00:00</lastmod></url>
+  <url><loc>https://example.com/changed/</loc><lastmod>2024-03-01T00:00:00+00:00</lastmod></url>
+  <url><loc>https://example.com/brand-new/</loc><lastmod>2024-03-01T00:00:00+00:00</lastmod></url>
+  <url><loc>https://example.com/?p=42</loc></url>
+</urlset>"""
+
+def mock_session(documents):
+    session = MagicMock()
+
+    def get(url, **kwargs):
+        response = MagicMock()
+        response.raw = io.BytesIO(documents[url])
+        response.__enter__.return_value = response
+        return response
+
+    session.get.side_effect = get
+    return session
+
+class TestSitemapHelpers(unittest.TestCase):
+    def test_sitemap_endpoint(self):
+        self.assertEqual(sitemap_endpoint("https://example.com/wp-sitemap-posts-post-1.xml"), "posts")
+        self.assertEqual(sitemap_endpoint("https://example.com/wp-sitemap-posts-page-2.xml"), "pages")
+        self.assertEqual(sitemap_endpoint("https://example.com/wp-sitemap-taxonomies-post_tag-1.xml"), "tags")
+        self.assertEqual(sitemap_endpoint("https://example.com/wp-sitemap-users-1.xml"), "users")
+        self.assertIsNone(sitemap_endpoint("https://example.com/sitemap.xml"))
+
+    def test_sitemap_url(self):
+        self.assertEqual(sitemap_url("https://example.com/wp-json/wp/v2"), "https://example.com/wp-sitemap.xml")
+
+    def test_iter_sitemap_index(self):
+        session = mock_session({
+            "https://example.com/wp-sitemap.xml": INDEX,
+            "https://example.com/wp-sitemap-posts-post-1.xml": POSTS,
+        })
+        entries = list(iter_sitemap(session, "https://example.com/wp-sitemap.xml"))
+        self.assertEqual(len(entries), 4)
+        self.assertEqual(entries[0], ("posts", "https://example.com/unchanged/", "2024-01-01T00:00:00+00:00"))
+
+    def test_iter_sitemap_skips_unselected_endpoints(self):
+        index = INDEX.replace(b"</sitemapindex>", b"<sitemap><loc>https://example.com/wp-sitemap-users-1.xml</loc></sitemap></sitemapindex>")
+        users = POSTS.replace(b"/unchanged/", b"/author/admin/")
+        session = mock_session({
+            "https://example.com/wp-sitemap.xml": index,
+            "https://example.com/wp-sitemap-posts-post-1.xml": POSTS,
+            "https://example.com/wp-sitemap-users-1.xml": users,
+        })
+        entries = list(iter_sitemap(session, "https://example.com/wp-sitemap.xml", endpoints=["users"]))
+        self.assertEqual({e[0] for e in entries}, {"users"})
+        # The posts sub-sitemap is skipped before it is fetched
+        fetched = [c.args[0] for c in session.get.call_args_list]
+        self.assertEqual(fetched, ["https://example.com/wp-sitemap.xml", "https://example.com/wp-sitemap-users-1.xml"])
+
+    def test_iter_sub_sitemap_directly(self):
+        session = mock_session({"https://example.com/wp-sitemap-posts-post-1.xml": POSTS})
+        entries = list(iter_sitemap(session, "https://example.com/wp-sitemap-posts-post-1.xml"))
+        self.assertEqual([e[0] for e in entries], ["posts"] * 4)
+
+    def test_plugin_sitemap_index_warns(self):
+        index = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/post-sitemap.xml</loc></sitemap>
+  <sitemap><loc>https://example.com/page-sitemap.xml</loc></sitemap>
+</sitemapindex>"""
+        session = mock_session({"https://example.com/sitemap_index.xml": index})
+        with self.assertLogs('wpspider.sitemap', level='WARNING') as logs:
+            self.assertEqual(list(iter_sitemap(session, "https://example.com/sitemap_index.xml")), [])
+        self.assertIn("no WordPress core sub-sitemaps", logs.output[0])
+
+class TestSitemapRefresher(unittest.TestCase):
+    def setUp(self):
+        self.temp_db_fd, self.temp_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(self.temp_db_fd)
+        self.db = DatabaseManager(self.temp_db_path)
+        self.db.connect()
+
+        first = self.db.log_target("https://example.com")
+        self.db.save_batch("posts", [
+            {"id": 1, "link": "https://example.com/unchanged/", "modified_gmt": "2024-01-01T00:00:00"},
+            {"id": 2, "link": "https://example.com/changed/", "modified_gmt": "2024-01-01T00:00:00"},
+        ], target_id=first)
+        self.target_id = self.db.log_target("https://example.com")
+
+    def tearDown(self):
+        self.db.close()
+        if os.path.exists(self.temp_db_path):
+            os.remove(self.temp_db_path)
+
+    def test_find_changes_and_refetch(self):
+        crawler = MagicMock()
+        crawler.timeout = 10
+        crawler.session = mock_session({
+            "https://example.com/wp-sitemap.xml": INDEX,
+            "https://example.com/wp-sitemap-posts-post-1.xml": POSTS,
+        })
+        meta = {"method": "GET", "url": "https://example.com/wp-json/wp/v2/posts", "started_at": "now"}
+        crawler.crawl_endpoint.side_effect = lambda endpoint, extra_params: iter([([{"id": 99}], meta)])
+
+        refresher = SitemapRefresher(crawler, self.db, self.target_id, "https://example.com")
+        totals = refresher.run("https://example.com/wp-sitemap.xml")
+
+        self.assertEqual(totals, {"posts": 2})
+        calls = [c.kwargs["extra_params"] for c in crawler.crawl_endpoint.call_args_list]
+        self.assertEqual(calls, [{"include": "2,42"}, {"slug": "brand-new"}])
+
+if __name__ == '__main__':
+    unittest.main()
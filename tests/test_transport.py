@@ -0,0 +1,121 @@
+import unittest
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+# Allow importing from src
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import requests
+from urllib3.exceptions import NewConnectionError
+from urllib3.util import connection as urllib3_connection
+from wpspider import transport
+from wpspider.crawler import WPCrawler
+from wpspider.transport import CachedHTTPConnectionPool, CachedHTTPSConnectionPool, DnsCache, shared_adapter
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_GET(self):
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestDnsCache(unittest.TestCase):
+    def test_lookups_are_cached_until_ttl(self):
+        cache = DnsCache(ttl=60)
+        with patch('wpspider.transport.socket.getaddrinfo', return_value=["addr"]) as lookup, \
+             patch('wpspider.transport.time.monotonic', side_effect=[0.0, 30.0, 61.0]):
+            self.assertEqual(cache.resolve("example.com", 443), ["addr"])
+            self.assertEqual(cache.resolve("example.com", 443), ["addr"])
+            self.assertEqual(cache.resolve("example.com", 443), ["addr"])
+        self.assertEqual(lookup.call_count, 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_adapter_scopes_cache_to_its_pools(self):
+        original = urllib3_connection.create_connection
+        adapter = shared_adapter(2, 2, 10)
+        try:
+            self.assertIs(shared_adapter(2, 2, 10), adapter)
+            self.assertEqual(adapter.dns_cache.ttl, 10)
+            self.assertIsNone(shared_adapter(2, 2, 0).dns_cache)
+
+            # Nothing is patched globally; only this adapter's pools use the cache
+            self.assertIs(urllib3_connection.create_connection, original)
+            pool = adapter.poolmanager.connection_from_url("https://example.com")
+            self.assertIsInstance(pool, CachedHTTPSConnectionPool)
+            self.assertIs(pool._new_conn().dns_cache, adapter.dns_cache)
+            self.assertNotIsInstance(requests.adapters.HTTPAdapter().poolmanager.connection_from_url("https://example.com"), CachedHTTPSConnectionPool)
+        finally:
+            for ttl in (10, 0):
+                transport._adapters.pop((2, 2, ttl), None)
+
+    def test_refused_address_is_evicted(self):
+        cache = DnsCache(ttl=60)
+        pool = CachedHTTPConnectionPool("example.com", 80)
+        pool.dns_cache = cache
+        conn = pool._new_conn()
+        refused = ConnectionRefusedError("refused")
+        addresses = [(0, 0, 0, "", ("192.0.2.1", 80)), (0, 0, 0, "", ("192.0.2.2", 80))]
+        with patch('wpspider.transport.socket.getaddrinfo', return_value=addresses), \
+             patch('urllib3.connection.connection.create_connection', side_effect=refused) as connect:
+            with self.assertRaises(NewConnectionError):
+                conn._new_conn()
+        self.assertEqual([c.args[0] for c in connect.call_args_list], [("192.0.2.1", 80), ("192.0.2.2", 80)])
+        self.assertEqual(conn.host, "example.com")
+        self.assertEqual(cache._entries, {})
+
+class TestConnectionReuse(unittest.TestCase):
+    def setUp(self):
+        _Handler.connections = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        # A pool size no other test uses, so the shared adapter starts empty
+        self.adapter = shared_adapter(3, 3, 60)
+
+    def tearDown(self):
+        self.adapter.close()
+        transport._adapters.pop((3, 3, 60), None)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_crawlers_share_connections(self):
+        first = WPCrawler(self.url, pool_connections=3, pool_maxsize=3, dns_cache_ttl=60)
+        second = WPCrawler(self.url, pool_connections=3, pool_maxsize=3, dns_cache_ttl=60)
+        self.assertIs(first.session.get_adapter(self.url), second.session.get_adapter(self.url))
+
+        first.session.get(f"{self.url}/wp-json/wp/v2/posts")
+        second.session.get(f"{self.url}/wp-json/wp/v2/pages")
+        self.assertEqual(_Handler.connections, 1)
+        self.assertEqual((self.adapter.dns_cache.misses, self.adapter.dns_cache.hits), (1, 0))
+
+    def test_prewarm_opens_pooled_connections(self):
+        crawler = WPCrawler(self.url, pool_connections=3, pool_maxsize=3, dns_cache_ttl=60)
+        self.assertEqual(crawler.prewarm(5), 3)
+        self.assertEqual(_Handler.connections, 3)
+
+        for _ in range(3):
+            crawler.session.get(f"{self.url}/wp-json/wp/v2/posts")
+        self.assertEqual(_Handler.connections, 3)
+
+        # A second warm-up of the warm pool reuses the open connections instead of replacing them
+        self.assertEqual(crawler.prewarm(3), 3)
+        self.assertEqual(_Handler.connections, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark of the JSON decoders wpspider can use.
+
+Decodes REST pages (the crawler's hot path) with every installed decoder plus
+wpspider.codec.loads. Encoding always uses json.dumps, so it is not compared.
+Payloads are synthetic WordPress shapes by default, or real rows from a crawl database:
+
+    python tools/bench_codec.py
+    python tools/bench_codec.py --db example.com.sqlite --table posts --limit 500
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from wpspider import codec  # noqa: E402
+
+
+def synthetic_post(i: int) -> Dict[str, Any]:
+    words = ["wordpress", "crawler", "café", "naïve", "“quoted”", "<em>tag</em>", "línea", "データ"]
+    paragraphs = "".join(f"<p>{' '.join(random.choices(words, k=60))}</p>\n" for _ in range(12))
+    return {
+        "id": i,
+        "date": "2024-03-01T10:00:00",
+        "date_gmt": "2024-03-01T09:00:00",
+        "guid": {"rendered": f"https://example.com/?p={i}"},
+        "modified_gmt": "2024-03-02T09:00:00",
+        "slug": f"post-{i}",
+        "status": "publish",
+        "type": "post",
+        "link": f"https://example.com/{i}/post-{i}/",
+        "title": {"rendered": f"Post {i} – {random.choice(words)}"},
+        "content": {"rendered": paragraphs, "protected": False},
+        "excerpt": {"rendered": paragraphs[:300], "protected": False},
+        "author": random.randint(1, 20),
+        "featured_media": random.randint(0, 500),
+        "sticky": False,
+        "format": "standard",
+        "meta": {"footnotes": "", "rating": round(random.random() * 5, 2)},
+        "categories": random.sample(range(1, 50), 3),
+        "tags": random.sample(range(1, 200), 5),
+        "_links": {
+            rel: [{"href": f"https://example.com/wp-json/wp/v2/{rel}/{i}", "embeddable": True}]
+            for rel in ("self", "collection", "about", "author", "replies", "version-history")
+        },
+    }
+
+
+def load_items(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    if not args.db:
+        random.seed(1)
+        return [synthetic_post(i) for i in range(args.limit)]
+    table = "".join(c for c in args.table if c.isalnum() or c == "_")
+    with sqlite3.connect(args.db) as conn:
+        rows = conn.execute(f"SELECT data FROM {table} WHERE data IS NOT NULL LIMIT ?", (args.limit,)).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+
+def decoders() -> List[Tuple[str, Callable[[bytes], Any]]]:
+    found = codec._decoder_candidates()
+    found.append((f"wpspider.codec ({codec.DECODER_NAME})", codec.loads))
+    return found
+
+
+def best_of(func: Callable[[], Any], repeat: int, number: int) -> float:
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON decoders on WordPress payloads")
+    parser.add_argument("--db", type=str, help="Crawl database to take real items from (default: synthetic posts)")
+    parser.add_argument("--table", type=str, default="posts", help="Endpoint table used with --db (default: posts)")
+    parser.add_argument("--limit", type=int, default=300, help="Number of items (default: 300)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions; the best is reported (default: 5)")
+    args = parser.parse_args()
+
+    items = load_items(args)
+    if not items:
+        sys.exit("No items to benchmark.")
+    # REST pages hold up to 100 items
+    pages = [json.dumps(items[i:i + 100]).encode("utf-8") for i in range(0, len(items), 100)]
+    page_bytes = sum(len(p) for p in pages)
+
+    print(f"{len(items)} items in {len(pages)} pages, {page_bytes / 1e6:.2f} MB")
+    print(f"Selected decoder: {codec.DECODER_NAME}\n")
+
+    print(f"{'decode (pages)':32} {'ms':>9} {'MB/s':>9}  usable")
+    for name, decode in decoders():
+        seconds = best_of(lambda: [decode(p) for p in pages], args.repeat, 3)
+        problem = codec.decoder_problem(decode)
+        print(f"{name:32} {seconds * 1000:9.2f} {page_bytes / seconds / 1e6:9.1f}  {problem or 'yes'}")
+
+
+if __name__ == "__main__":
+    main()